@@ -48,12 +48,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'login.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'login.sharding.UserShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -89,6 +91,111 @@ DATABASES = {
     }
 }
 
+# Реплика для чтений (login.routers): аналитика, выгрузка и списки операций читают из неё.
+# DATABASE_REPLICA_NAME - второй файл SQLite; локально его наполняет manage.py sync_replica.
+# Без него чтения остаются в default. В тестах реплика - зеркало default.
+READ_REPLICA_ALIAS = 'replica'
+READ_REPLICA_ENABLED = bool(os.environ.get('DATABASE_REPLICA_NAME'))
+# Сколько секунд после своей записи пользователь читает из default; больше задержки репликации
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+DATABASES[READ_REPLICA_ALIAS] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.environ.get('DATABASE_REPLICA_NAME') or DATABASES['default']['NAME'],
+    'TEST': {'MIRROR': 'default'},
+}
+
+# Финансовые данные пользователей по DATABASE_SHARDS базам (login.sharding): default и shard1...
+# Новый пользователь попадает на шард по хэшу id; перенос - manage.py rebalance_shards.
+# Тесты объявляют shard1 сами (login/tests/__init__.py), bench shards - свои базы на время замера.
+DATABASE_SHARDS = int(os.environ.get('DATABASE_SHARDS', 1))
+USER_SHARDS = ['default'] + [f'shard{number}' for number in range(1, DATABASE_SHARDS)]
+for number in range(1, DATABASE_SHARDS):
+    DATABASES[f'shard{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_shard{number}.sqlite3',
+    }
+
+DATABASE_ROUTERS = ['login.sharding.UserShardRouter', 'login.routers.ReadReplicaRouter']
+
+# Профиль баз (DATABASE_PROFILE): default - настройки Django по умолчанию, production - для
+# нагруженного SQLite: WAL (читатели не ждут писателя), PRAGMA на каждом соединении,
+# постоянные соединения с проверкой перед запросом и BEGIN IMMEDIATE в atomic() (login.sqlite).
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'default')
+SQLITE_PRODUCTION_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    # В WAL NORMAL не теряет согласованность; последние коммиты может потерять только сбой питания
+    'PRAGMA synchronous = NORMAL',
+    # Сколько писатель ждёт чужую блокировку, прежде чем ответить "database is locked"
+    f"PRAGMA busy_timeout = {int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+    f"PRAGMA mmap_size = {int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+    # Отрицательное значение - в килобайтах: 64 МБ страничного кэша на соединение
+    f"PRAGMA cache_size = -{int(os.environ.get('SQLITE_CACHE_KB', 64 * 1024))}",
+    'PRAGMA temp_store = MEMORY',
+]
+SQLITE_PRODUCTION = {
+    'ENGINE': 'login.sqlite',
+    'OPTIONS': {'init_command': '; '.join(SQLITE_PRODUCTION_PRAGMAS), 'transaction_mode': 'IMMEDIATE'},
+    'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+    'CONN_HEALTH_CHECKS': True,
+}
+if DATABASE_PROFILE == 'production':
+    for database in DATABASES.values():
+        database.update(SQLITE_PRODUCTION, OPTIONS=dict(SQLITE_PRODUCTION['OPTIONS']))
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Кэш ответов API (login.cache): locmem по умолчанию, можно переключить на
+# django.core.cache.backends.filebased.FileBasedCache или django.core.cache.backends.redis.RedisCache
+
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1'
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+# Кэш проверенных токенов и паролей (login.authentication). Работает только с общим бэкендом
+# (AUTH_CACHE_BACKEND=...RedisCache): сброс при смене пароля, отзыве токена и изменении данных
+# должен быть виден всем процессам. С LocMemCache по умолчанию кэш выключен;
+# AUTH_CACHE_ALLOW_LOCAL=1 - только для тестов и разработки в одном процессе.
+AUTH_CACHE_ENABLED = os.environ.get('AUTH_CACHE_ENABLED', '1') == '1'
+AUTH_CACHE_ALLOW_LOCAL = os.environ.get('AUTH_CACHE_ALLOW_LOCAL') == '1'
+AUTH_CACHE_ALIAS = 'auth'
+AUTH_CACHE_TIMEOUT = int(os.environ.get('AUTH_CACHE_TIMEOUT', 60))
+AUTH_CACHE_BACKEND = os.environ.get('AUTH_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    AUTH_CACHE_ALIAS: {
+        'BACKEND': AUTH_CACHE_BACKEND,
+        'LOCATION': os.environ.get('AUTH_CACHE_LOCATION', 'auth'),
+        'TIMEOUT': AUTH_CACHE_TIMEOUT,
+        'OPTIONS': {} if AUTH_CACHE_BACKEND.endswith('RedisCache') else {
+            'MAX_ENTRIES': int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+    RESPONSE_CACHE_ALIAS: {
+        'BACKEND': RESPONSE_CACHE_BACKEND,
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {} if RESPONSE_CACHE_BACKEND.endswith('RedisCache') else {
+            'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+}
+
+
+# Метрики запросов (login.middleware, /metrics)
+# SLOW_REQUEST_THRESHOLD_MS - порог в миллисекундах для лога login.slow_requests с SQL запроса
+
+PERFORMANCE_METRICS_ENABLED = os.environ.get('PERFORMANCE_METRICS_ENABLED', '1') == '1'
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ['SLOW_REQUEST_THRESHOLD_MS']) if os.environ.get(
+    'SLOW_REQUEST_THRESHOLD_MS') else None
+# /metrics закрыт по умолчанию: открывают токен (Authorization: Bearer) или адреса сборщика через
+# запятую. За обратным прокси REMOTE_ADDR - адрес прокси, тогда нужен токен.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -140,11 +247,22 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'login.authentication.CachedBasicAuthentication',
+        'login.authentication.CachedTokenAuthentication',
     ],
 }
 
+# Размер страницы списков расходов и доходов (login.pagination) и предел для ?page_size=
+TRANSACTIONS_PAGE_SIZE = 100
+TRANSACTIONS_MAX_PAGE_SIZE = 500
+# Наибольший список операций в одном POST /expenses/ или /incomes/
+TRANSACTIONS_MAX_BATCH_SIZE = 500
+# Списки операций через values_list без ModelSerializer (login.fastread); ?fast=0/1 переопределяет
+TRANSACTIONS_FAST_LIST = os.environ.get('TRANSACTIONS_FAST_LIST', '0') == '1'
+# Async-представления (login.asyncviews): независимые выборки аналитики и главного экрана
+# идут одновременно, каждая в своём потоке и соединении; 0 - по очереди в потоке запроса
+ASYNC_CONCURRENT_READS = os.environ.get('ASYNC_CONCURRENT_READS', '1') == '1'
+
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend'
 ]
@@ -178,6 +296,30 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 SERVER_EMAIL = EMAIL_HOST_USER
 EMAIL_ADMIN = EMAIL_HOST_USER
 
+# Исходящая почта (login.outbox): письма копятся в EmailOutbox и уходят воркером Celery.
+# Без CELERY_BROKER_URL воркер после коммита не запускается: очередь разбирают beat
+# или manage.py drain_outbox по cron, и SMTP никогда не выполняется в потоке запроса.
+# CELERY_TASK_ALWAYS_EAGER=1 отправляет сразу в процессе (тесты включают его через override_settings).
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'memory://')
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER') == '1'
+OUTBOX_KICK_WORKER = CELERY_TASK_ALWAYS_EAGER or 'CELERY_BROKER_URL' in os.environ
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_BEAT_SCHEDULE = {
+    'drain-email-outbox': {'task': 'login.tasks.send_outbox_emails', 'schedule': 60.0},
+    'dispatch-reminders': {'task': 'login.tasks.dispatch_reminders', 'schedule': 60.0},
+}
+
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_RETRY_BASE_SECONDS = 30
+OUTBOX_RETRY_MAX_SECONDS = 3600
+OUTBOX_CLAIM_SECONDS = 300
+
+# Напоминания (login.reminders): manage.py dispatch_reminders или периодическая задача ниже
+REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', 100))
+REMINDER_CLAIM_SECONDS = 300
+REMINDER_POLL_SECONDS = 30
+
 CORS_ORIGIN_ALLOW_ALL = True
 
 CORS_ALLOWED_ORIGINS = [
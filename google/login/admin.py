@@ -3,9 +3,25 @@ from .models import *
 
 admin.site.register(Category)
 admin.site.register(CustomUser)
-admin.site.register(Expense)
-admin.site.register(Income)
-admin.site.register(Budget)
+
+
+# __str__ этих моделей читает category.name / user.email - без select_related список делает запрос на строку
+@admin.register(Expense)
+class ExpenseAdmin(admin.ModelAdmin):
+    list_select_related = ('category', 'user')
+
+
+@admin.register(Income)
+class IncomeAdmin(admin.ModelAdmin):
+    list_select_related = ('category',)
+
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_select_related = ('category',)
+
+
 admin.site.register(Reminder)
 admin.site.register(Finance)
 
+admin.site.register(EmailOutbox)
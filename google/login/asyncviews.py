@@ -0,0 +1,89 @@
+"""Async-представления DRF для тяжёлых чтений (аналитика, главный экран).
+
+Под ASGI-сервером такое представление не держит поток на время запроса: поток
+занят только пока выполняется SQL. Независимые выборки одного ответа
+gather_reads запускает одновременно, каждую в своём потоке со своим
+соединением. Async-методы ORM Django (afirst, aiterator...) сами выполняются
+через sync_to_async(thread_sensitive=True), то есть по очереди в одном потоке,
+поэтому для параллельности выборки отдаются потокам напрямую.
+
+Под WSGI эти представления тоже работают: Django выполняет их через async_to_sync.
+"""
+import asyncio
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, connections
+from rest_framework.views import APIView
+
+
+def in_transaction():
+    return connection.in_atomic_block
+
+
+def close_broken_connections():
+    """Потоки исполнителя живут долго, и их соединения переиспользуются следующими
+    чтениями (не больше одного на поток); закрываются только сломанные"""
+    for conn in connections.all(initialized_only=True):
+        if conn.errors_occurred:
+            if conn.is_usable():
+                conn.errors_occurred = False
+            else:
+                conn.close()
+
+
+def isolated(load):
+    """load() в отдельном потоке исполнителя; SQL учитывается в метриках запроса
+    (sync_to_async передаёт потоку контекст с metrics.current_sample)"""
+    def run():
+        try:
+            return load()
+        finally:
+            close_broken_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def gather_reads(loaders):
+    """{имя: результат} для словаря {имя: функция без аргументов}, читающих базу.
+
+    Внутри открытой транзакции (тесты на TestCase, ATOMIC_REQUESTS) другие соединения
+    её данных не видят, поэтому тогда, как и при ASYNC_CONCURRENT_READS=False,
+    чтения идут по очереди в потоке запроса.
+    """
+    if not getattr(settings, 'ASYNC_CONCURRENT_READS', True) or await sync_to_async(in_transaction)():
+        return await sync_to_async(lambda: {name: load() for name, load in loaders.items()})()
+    results = await asyncio.gather(*(isolated(load)() for load in loaders.values()))
+    return dict(zip(loaders, results))
+
+
+class AsyncAPIView(APIView):
+    """APIView с async-обработчиками (async def get).
+
+    Аутентификация, права и проверки initial() (в том числе 304 из ConditionalGetMixin)
+    синхронные и выполняются одним переходом в поток запроса; дальше обработчик
+    работает в цикле событий.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,169 @@
+"""Аутентификация DRF с кэшем проверенных учётных данных.
+
+TokenAuthentication делает JOIN Token+User на каждый запрос, а BasicAuthentication
+каждый раз считает PBKDF2 (десятки миллисекунд CPU). Здесь результат проверки
+запоминается в кэше settings.AUTH_CACHE_ALIAS (ограниченный размер, TTL):
+
+* auth:token:<digest>  -> id пользователя;
+* auth:basic:<digest>  -> (id пользователя, отпечаток хэша пароля);
+* auth:user:<id>       -> поля пользователя CACHED_USER_FIELDS и отпечаток хэша пароля.
+
+Ключи - HMAC от учётных данных с SECRET_KEY, сами пароли, их хэши и токены в
+кэш не попадают: у пользователя из кэша остальные поля отложены (deferred) и при
+обращении дочитываются из базы. Запись пользователя сбрасывают сигналы (сохранение пользователя,
+смена пароля, выход, изменение данных - см. models.py), после чего отпечаток
+пароля в auth:basic перестаёт совпадать и пароль проверяется заново.
+
+Сброс виден только тем, кто читает тот же кэш. В кэше процесса (LocMemCache)
+другие воркеры продолжали бы принимать отозванный токен и отдавать старую
+data_version (кэш ответов, ETag, выбор реплики), поэтому с ним кэш выключен;
+AUTH_CACHE_ALLOW_LOCAL включает его для тестов и разработки в одном процессе.
+"""
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DatabaseError, router
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+
+from .oncommit import defer_per_user
+
+
+def get_auth_cache():
+    return caches[getattr(settings, 'AUTH_CACHE_ALIAS', 'auth')]
+
+
+def shared_auth_cache():
+    return not isinstance(get_auth_cache(), LocMemCache)
+
+
+def auth_cache_enabled():
+    if not getattr(settings, 'AUTH_CACHE_ENABLED', True):
+        return False
+    return shared_auth_cache() or getattr(settings, 'AUTH_CACHE_ALLOW_LOCAL', False)
+
+
+def credential_digest(kind, *parts):
+    message = '\0'.join(parts).encode()
+    digest = hmac.new(settings.SECRET_KEY.encode(), kind.encode() + b':' + message, hashlib.sha256).hexdigest()
+    return f'auth:{kind}:{digest}'
+
+
+# Всё, что аутентификации и запросу нужно без обращения к базе: активность и права,
+# версия данных (кэш ответов, ETag, выбор реплики) и шард пользователя
+CACHED_USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser', 'data_version', 'data_changed_at', 'shard')
+
+
+def password_fingerprint(user):
+    if 'password' in user.get_deferred_fields():
+        # Пользователь из кэша: хэш пароля не загружен, отпечаток хранится вместе с полями
+        return user.auth_fingerprint
+    return hashlib.sha256(user.password.encode()).hexdigest()[:32]
+
+
+def user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def user_entry(user):
+    return {'db': user._state.db, 'fields': {name: getattr(user, name) for name in CACHED_USER_FIELDS},
+            'fingerprint': password_fingerprint(user)}
+
+
+def restore_user(entry):
+    """Пользователь из записи кэша; поля не из CACHED_USER_FIELDS отложены"""
+    model = get_user_model()
+    fields = entry['fields']
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in fields]
+    user = model.from_db(entry['db'], names, [fields[name] for name in names])
+    user.auth_fingerprint = entry['fingerprint']
+    return user
+
+
+def remember_user(user):
+    get_auth_cache().add(user_key(user.pk), user_entry(user))
+
+
+def get_cached_user(user_id):
+    """Пользователь из кэша или одним запросом по первичному ключу; None - удалён или неактивен"""
+    cache = get_auth_cache()
+    entry = cache.get(user_key(user_id))
+    if entry is not None:
+        user = restore_user(entry)
+    else:
+        user = get_user_model()._default_manager.filter(pk=user_id).first()
+        if user is None:
+            return None
+        cache.add(user_key(user_id), user_entry(user))
+    return user if user.is_active else None
+
+
+def refresh_users(user_ids, using=None):
+    """Перезаписывает кэш свежими строками после коммита: параллельный запрос мог прочитать
+    пользователя до коммита и положить в кэш старую копию, а remember_user() (add) свежую не тронет"""
+    cache = get_auth_cache()
+    try:
+        users = {user.pk: user for user in get_user_model()._default_manager.db_manager(using).filter(
+            pk__in=user_ids).only(*CACHED_USER_FIELDS, 'password')}
+    except DatabaseError:
+        # Транзакция уже закоммичена - ошибка здесь не должна доходить до вызывающего кода
+        users = {}
+    for user_id in user_ids:
+        if user_id in users:
+            cache.set(user_key(user_id), user_entry(users[user_id]))
+        else:
+            cache.delete(user_key(user_id))
+
+
+def forget_user(user_id, using=None):
+    # Кэш выключен - в нём нечего сбрасывать, и лишний SELECT после каждой записи не нужен
+    if not auth_cache_enabled():
+        return
+    get_auth_cache().delete(user_key(user_id))
+    defer_per_user('auth_refresh', user_id, refresh_users, using or router.db_for_write(get_user_model()))
+
+
+def forget_token(key):
+    get_auth_cache().delete(credential_digest('token', key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        if not auth_cache_enabled():
+            return super().authenticate_credentials(key)
+        cache = get_auth_cache()
+        cache_key = credential_digest('token', key)
+        user_id = cache.get(cache_key)
+        if user_id is not None:
+            user = get_cached_user(user_id)
+            if user is not None:
+                return user, self.get_model()(key=key, user=user)
+            cache.delete(cache_key)
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, user.pk, getattr(settings, 'AUTH_CACHE_TIMEOUT', 60))
+        remember_user(user)
+        return user, token
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    def authenticate_credentials(self, userid, password, request=None):
+        if not auth_cache_enabled():
+            return super().authenticate_credentials(userid, password, request)
+        cache = get_auth_cache()
+        cache_key = credential_digest('basic', userid, password)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            user_id, fingerprint = entry
+            user = get_cached_user(user_id)
+            if user is not None and hmac.compare_digest(fingerprint, password_fingerprint(user)):
+                return user, None
+            cache.delete(cache_key)
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        cache.set(cache_key, (user.pk, password_fingerprint(user)), getattr(settings, 'AUTH_CACHE_TIMEOUT', 60))
+        remember_user(user)
+        return user, auth
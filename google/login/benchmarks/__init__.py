@@ -0,0 +1,118 @@
+"""Нагрузочные замеры (manage.py bench <suite>).
+
+Каждый набор - модуль этого пакета с функциями add_arguments(parser) и
+run(command, **options). Замеры идут на отдельной временной базе, рабочая
+база проекта не затрагивается.
+"""
+import math
+import os
+import shutil
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+SUITES = {
+    'api': 'login.benchmarks.api',
+    'asyncreads': 'login.benchmarks.asyncreads',
+    'auth': 'login.benchmarks.auth',
+    'outbox': 'login.benchmarks.outbox',
+    'reads': 'login.benchmarks.reads',
+    'shards': 'login.benchmarks.shards',
+    'sqlite': 'login.benchmarks.sqlite',
+    'trends': 'login.benchmarks.trends',
+}
+
+
+@contextmanager
+def bench_database(path=None, keep=False, aliases=('default',)):
+    """Временная файловая SQLite-база с применёнными миграциями (на время замера).
+
+    Файл, а не :memory:, нужен, чтобы потоки нагрузки видели одни и те же данные
+    через собственные соединения, как в настоящем развёртывании.
+    """
+    temporary = None if path else tempfile.mkdtemp(prefix='bench-')
+    directory = temporary or os.path.dirname(path)
+    previous = {}
+    for alias in aliases:
+        test_settings = settings.DATABASES[alias].setdefault('TEST', {})
+        previous[alias] = test_settings.get('NAME')
+        if path and alias == 'default':
+            test_settings['NAME'] = path
+        else:
+            test_settings['NAME'] = os.path.join(directory, f'bench_{alias}.sqlite3')
+    # Тестовое окружение подменяет почтовый бэкенд на locmem: уведомления сигналов не уходят наружу
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keep, aliases=set(aliases))
+    try:
+        yield
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0, keepdb=keep)
+        teardown_test_environment()
+        if temporary:
+            shutil.rmtree(temporary, ignore_errors=True)
+        for alias, name in previous.items():
+            settings.DATABASES[alias]['TEST']['NAME'] = name
+
+
+def percentile(sorted_values, q):
+    """Перцентиль по методу ближайшего ранга, q в процентах"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyRecorder:
+    """Потокобезопасный сбор задержек (в секундах) и ошибок по именам операций"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, elapsed, ok=True):
+        with self._lock:
+            self.samples[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self, duration):
+        rows = []
+        everything = []
+        for name in sorted(self.samples):
+            values = sorted(self.samples[name])
+            everything += values
+            rows.append(self._row(name, values, self.errors[name], duration))
+        everything.sort()
+        rows.append(self._row('TOTAL', everything, sum(self.errors.values()), duration))
+        return rows
+
+    @staticmethod
+    def _row(name, values, errors, duration):
+        return {
+            'name': name,
+            'requests': len(values),
+            'errors': errors,
+            'rps': round(len(values) / duration, 1) if duration else 0.0,
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+        }
+
+
+def format_table(rows, columns=None):
+    if not rows:
+        return ''
+    columns = columns or list(rows[0])
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    lines = ['  '.join(column.ljust(widths[column]) for column in columns)]
+    lines += ['  '.join(str(row[column]).ljust(widths[column]) for column in columns) for row in rows]
+    return '\n'.join(lines)
@@ -0,0 +1,292 @@
+"""Нагрузка на маршруты login/urls.py через WSGI- и ASGI-приложения проекта.
+
+Запросы проходят весь стек (middleware, аутентификация по токену, DRF) внутри
+процесса, без сетевого сервера: цифры сравнимы между конфигурациями и коммитами.
+"""
+import asyncio
+import io
+import json
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.urls import reverse
+
+from . import LatencyRecorder, bench_database, format_table
+from .dataset import generate_dataset
+
+HOST = 'testserver'
+
+# (название, вес) внутри группы чтения/записи
+READS = (
+    ('expense_list', 4), ('expense_list_filtered', 2), ('expense_detail', 2), ('income_list', 2),
+    ('analytics_month', 2), ('analytics_day', 1), ('budget_list', 2), ('category_list', 1),
+    ('wallet_list', 1), ('finances_list', 1), ('reminder_list', 1), ('auth_user_me', 1), ('ledger_export', 1),
+    ('dashboard', 1),
+)
+WRITES = (
+    ('expense_create', 4), ('income_create', 2), ('expense_update', 1), ('expense_import', 1), ('expense_delete', 1),
+)
+
+
+def add_arguments(parser):
+    parser.add_argument('--server', choices=('wsgi', 'asgi', 'both'), default='both')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=2000, help="Операций на пользователя")
+    parser.add_argument('--years', type=int, default=3, help="Глубина истории операций")
+    parser.add_argument('--concurrency', type=int, default=8, help="Потоков (WSGI) или задач (ASGI)")
+    parser.add_argument('--requests', type=int, default=2000, help="Запросов на каждый сервер")
+    parser.add_argument('--duration', type=float, help="Ограничение по времени на сервер, секунды")
+    parser.add_argument('--write-ratio', type=float, default=0.1, help="Доля пишущих запросов (0..1)")
+    parser.add_argument('--warmup', type=int, default=50, help="Запросов прогрева, не попадающих в отчёт")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db-path', help="Файл временной базы (по умолчанию во временном каталоге)")
+    parser.add_argument('--json', dest='json_path', help="Записать отчёт в JSON-файл")
+
+
+class Workload:
+    """Случайная последовательность запросов с заданной долей записи.
+
+    Один экземпляр на поток/задачу; созданные им расходы потом удаляются им же,
+    чтобы DELETE не попадал в чужие или уже удалённые строки.
+    """
+
+    def __init__(self, users, write_ratio, seed):
+        self.users = users
+        self.write_ratio = write_ratio
+        self.rng = random.Random(seed)
+        self.created = []
+        self.urls = {
+            'expense_list': reverse('expense_list'), 'income_list': reverse('income_list'),
+            'expense_import': reverse('expense_import'), 'analytics': reverse('expense-income-trends'),
+            'budget_list': reverse('budget_list'), 'category_list': reverse('category_list'),
+            'wallet_list': reverse('wallet_list'), 'finances_list': reverse('finances_list'),
+            'reminder_list': reverse('reminder-list'), 'auth_user_me': reverse('customuser-me'),
+            'ledger_export': reverse('ledger-export'), 'dashboard': reverse('dashboard'),
+        }
+
+    def pick(self, choices):
+        names, weights = zip(*choices)
+        return self.rng.choices(names, weights)[0]
+
+    def next(self):
+        """(название, метод, путь, query string, тело, токен)"""
+        user = self.rng.choice(self.users)
+        name = self.pick(WRITES if self.rng.random() < self.write_ratio else READS)
+        if name == 'expense_delete':
+            if not self.created:
+                name = 'expense_create'
+            else:
+                # Удаляем от имени владельца, а не случайного пользователя
+                token, pk = self.created.pop()
+                return name, 'DELETE', reverse('expense_detail', args=[pk]), '', b'', token
+        return (name,) + getattr(self, 'build_' + name, self.build_plain)(name, user) + (user['token'],)
+
+    def row(self, user):
+        return {'amount': f'{self.rng.randrange(100, 5000) / 100:.2f}', 'category': self.rng.choice(user['categories']),
+                'date': time.strftime('%Y-%m-%d')}
+
+    def build_plain(self, name, user):
+        return 'GET', self.urls[name], '', b''
+
+    def build_expense_list_filtered(self, name, user):
+        query = {'category': self.rng.choice(user['categories']), 'start_date': '2020-01-01', 'end_date': '2100-01-01'}
+        return 'GET', self.urls['expense_list'], urlencode(query), b''
+
+    def build_expense_detail(self, name, user):
+        return 'GET', reverse('expense_detail', args=[self.rng.choice(user['expenses'])]), '', b''
+
+    def build_analytics_month(self, name, user):
+        return 'GET', self.urls['analytics'], 'granularity=month', b''
+
+    def build_analytics_day(self, name, user):
+        return 'GET', self.urls['analytics'], '', b''
+
+    def build_ledger_export(self, name, user):
+        return 'GET', self.urls['ledger_export'], 'format=ndjson', b''
+
+    def build_expense_create(self, name, user):
+        return 'POST', self.urls['expense_list'], '', json.dumps(self.row(user)).encode()
+
+    def build_income_create(self, name, user):
+        return 'POST', self.urls['income_list'], '', json.dumps(self.row(user)).encode()
+
+    def build_expense_update(self, name, user):
+        path = reverse('expense_detail', args=[self.rng.choice(user['expenses'])])
+        return 'PUT', path, '', json.dumps(self.row(user)).encode()
+
+    def build_expense_import(self, name, user):
+        return 'POST', self.urls['expense_import'], '', json.dumps([self.row(user) for _ in range(10)]).encode()
+
+    def observe(self, name, token, status, body):
+        if name == 'expense_create' and status == 201:
+            self.created.append((token, json.loads(body)['id']))
+
+
+def wsgi_environ(method, path, query, body, token):
+    return {
+        'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': HOST, 'HTTP_AUTHORIZATION': f'Token {token}', 'HTTP_ACCEPT': '*/*',
+        'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+
+
+def asgi_scope(method, path, query, body, token):
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query.encode(),
+        'server': (HOST, 80), 'client': ('127.0.0.1', 0),
+        'headers': [
+            (b'host', HOST.encode()), (b'authorization', f'Token {token}'.encode()),
+            (b'accept', b'*/*'), (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    }
+
+
+async def asgi_request(application, method, path, query, body, token):
+    """(статус, тело) ответа ASGI-приложения на один запрос"""
+    sent = False
+    status, chunks = [], []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # Клиент не отключается: Django сам отменит ожидание после ответа
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await application(asgi_scope(method, path, query, body, token), receive, send)
+    return status[0], b''.join(chunks)
+
+
+class Schedule:
+    """Общий для всех исполнителей счётчик: прогрев, лимит запросов и времени"""
+
+    def __init__(self, total, warmup, duration):
+        self.total = total + warmup
+        self.warmup = warmup
+        self.duration = duration
+        self.issued = 0
+        self.lock = threading.Lock()
+        self.started = self.measured_from = None
+
+    def take(self):
+        """None - пора остановиться, иначе True, если запрос идёт в отчёт"""
+        with self.lock:
+            now = time.perf_counter()
+            if self.started is None:
+                self.started = now
+            if self.issued >= self.total:
+                return None
+            if self.duration and self.measured_from and now - self.measured_from > self.duration:
+                return None
+            self.issued += 1
+            if self.issued == self.warmup + 1:
+                self.measured_from = now
+            return self.issued > self.warmup
+
+
+def run_wsgi(users, options):
+    from google.wsgi import application
+
+    recorder = LatencyRecorder()
+    schedule = Schedule(options['requests'], options['warmup'], options['duration'])
+
+    def worker(number):
+        workload = Workload(users, options['write_ratio'], options['seed'] + number)
+        while True:
+            measured = schedule.take()
+            if measured is None:
+                return
+            name, method, path, query, body, token = workload.next()
+            status = []
+            started = time.perf_counter()
+            try:
+                response = application(wsgi_environ(method, path, query, body, token),
+                                       lambda line, headers, exc_info=None: status.append(int(line[:3])))
+                try:
+                    content = b''.join(response)
+                finally:
+                    getattr(response, 'close', lambda: None)()
+            except Exception:
+                # Ошибка посреди потокового ответа: для клиента это оборванный ответ
+                status, content = [500], b''
+            elapsed = time.perf_counter() - started
+            workload.observe(name, token, status[-1], content)
+            if measured:
+                recorder.add(name, elapsed, ok=status[-1] < 400)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(options['concurrency'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - (schedule.measured_from or schedule.started)
+
+
+def run_asgi(users, options):
+    from google.asgi import application
+
+    recorder = LatencyRecorder()
+    schedule = Schedule(options['requests'], options['warmup'], options['duration'])
+
+    async def worker(number):
+        workload = Workload(users, options['write_ratio'], options['seed'] + number)
+        while True:
+            measured = schedule.take()
+            if measured is None:
+                return
+            name, method, path, query, body, token = workload.next()
+            started = time.perf_counter()
+            try:
+                status, content = await asgi_request(application, method, path, query, body, token)
+            except Exception:
+                status, content = 500, b''
+            elapsed = time.perf_counter() - started
+            workload.observe(name, token, status, content)
+            if measured:
+                recorder.add(name, elapsed, ok=status < 400)
+
+    async def main():
+        await asyncio.gather(*(worker(number) for number in range(options['concurrency'])))
+
+    asyncio.run(main())
+    return recorder, time.perf_counter() - (schedule.measured_from or schedule.started)
+
+
+RUNNERS = {'wsgi': run_wsgi, 'asgi': run_asgi}
+
+
+def run(command, **options):
+    servers = ('wsgi', 'asgi') if options['server'] == 'both' else (options['server'],)
+    report = {'options': {key: options[key] for key in (
+        'users', 'transactions', 'years', 'concurrency', 'requests', 'duration', 'write_ratio', 'seed')}}
+    with bench_database(options['db_path']):
+        started = time.perf_counter()
+        users = generate_dataset(options['users'], options['transactions'], options['years'], options['seed'])
+        command.stdout.write(f"Данные: {options['users']} польз. x {options['transactions']} операций "
+                             f"за {time.perf_counter() - started:.1f} с")
+        for server in servers:
+            recorder, duration = RUNNERS[server](users, options)
+            rows = recorder.summary(duration)
+            report[server] = {'duration_s': round(duration, 3), 'endpoints': rows}
+            command.stdout.write(f"\n{server.upper()}: concurrency={options['concurrency']}, "
+                                 f"write_ratio={options['write_ratio']}, {duration:.2f} с")
+            command.stdout.write(format_table(rows))
+    if options['json_path']:
+        with open(options['json_path'], 'w') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    return report
@@ -0,0 +1,136 @@
+"""Аналитика и главный экран под ASGI: выборки по очереди против одновременных (login.asyncviews).
+
+Запросы идут через google.asgi с --concurrency задачами в одном цикле событий,
+кэш ответов выключен. --db-latency-ms добавляет задержку к каждому SQL, как у
+сетевой базы: на локальной SQLite выигрыш от параллельных выборок почти не виден.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db.backends.utils import CursorWrapper
+from django.test import override_settings
+from django.urls import reverse
+
+from . import LatencyRecorder, bench_database, format_table
+from .api import Schedule, asgi_request
+from .dataset import generate_dataset
+
+MODES = (('sequential', False), ('concurrent', True))
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--transactions', type=int, default=2000, help="Операций на пользователя")
+    parser.add_argument('--years', type=int, default=3, help="Глубина истории операций")
+    parser.add_argument('--concurrency', type=int, default=16, help="Одновременных запросов")
+    parser.add_argument('--requests', type=int, default=500, help="Запросов на каждый режим")
+    parser.add_argument('--warmup', type=int, default=20, help="Запросов прогрева, не попадающих в отчёт")
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help="Задержка на каждый SQL-запрос")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db-path', help="Файл временной базы (по умолчанию во временном каталоге)")
+    parser.add_argument('--json', dest='json_path', help="Записать отчёт в JSON-файл")
+
+
+def read_requests():
+    """(название, путь, query string) для нагрузки"""
+    analytics = reverse('expense-income-trends')
+    return [
+        ('analytics_day', analytics, ''),
+        ('analytics_month', analytics, 'granularity=month'),
+        ('dashboard', reverse('dashboard'), ''),
+    ]
+
+
+@contextmanager
+def db_latency(seconds):
+    if not seconds:
+        yield
+        return
+    execute = CursorWrapper._execute
+
+    def slow_execute(self, *args, **kwargs):
+        time.sleep(seconds)
+        return execute(self, *args, **kwargs)
+
+    with mock.patch.object(CursorWrapper, '_execute', slow_execute):
+        yield
+
+
+class ThreadGauge:
+    """Наибольшее число живых потоков процесса за время замера"""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_reads(users, options):
+    """(LatencyRecorder, длительность) одной серии запросов через ASGI-приложение"""
+    from google.asgi import application
+
+    recorder = LatencyRecorder()
+    schedule = Schedule(options['requests'], options['warmup'], None)
+    requests = read_requests()
+
+    async def worker(number):
+        rng = random.Random(options['seed'] + number)
+        while True:
+            measured = schedule.take()
+            if measured is None:
+                return
+            name, path, query = rng.choice(requests)
+            token = rng.choice(users)['token']
+            started = time.perf_counter()
+            try:
+                status, _content = await asgi_request(application, 'GET', path, query, b'', token)
+            except Exception:
+                status = 500
+            elapsed = time.perf_counter() - started
+            if measured:
+                recorder.add(name, elapsed, ok=status < 400)
+
+    async def main():
+        await asyncio.gather(*(worker(number) for number in range(options['concurrency'])))
+
+    asyncio.run(main())
+    return recorder, time.perf_counter() - (schedule.measured_from or schedule.started)
+
+
+def run(command, **options):
+    report = {'options': {key: options[key] for key in (
+        'users', 'transactions', 'years', 'concurrency', 'requests', 'db_latency_ms', 'seed')}}
+    with bench_database(options['db_path']):
+        users = generate_dataset(options['users'], options['transactions'], options['years'], options['seed'])
+        for mode, concurrent in MODES:
+            with override_settings(ASYNC_CONCURRENT_READS=concurrent, RESPONSE_CACHE_ENABLED=False), \
+                    db_latency(options['db_latency_ms'] / 1000), ThreadGauge() as threads:
+                recorder, duration = run_reads(users, options)
+            rows = recorder.summary(duration)
+            report[mode] = {'duration_s': round(duration, 3), 'peak_threads': threads.peak, 'endpoints': rows}
+            command.stdout.write(f"\n{mode}: concurrency={options['concurrency']}, "
+                                 f"db_latency={options['db_latency_ms']} ms, {duration:.2f} с, "
+                                 f"потоков не более {threads.peak}")
+            command.stdout.write(format_table(rows))
+    if options['json_path']:
+        with open(options['json_path'], 'w') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    return report
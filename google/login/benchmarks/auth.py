@@ -0,0 +1,56 @@
+"""CPU на аутентификацию запроса: стандартные классы DRF против кэширующих из login.authentication"""
+import base64
+import time
+
+from django.test import RequestFactory, override_settings
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from . import bench_database, format_table
+from ..authentication import CachedBasicAuthentication, CachedTokenAuthentication, get_auth_cache
+from ..models import CustomUser
+
+PASSWORD = 'bench-password'
+
+
+def add_arguments(parser):
+    parser.add_argument('--iterations', type=int, default=200, help="Аутентификаций на каждый вариант")
+    parser.add_argument('--db-path', help="Файл временной базы (по умолчанию во временном каталоге)")
+
+
+def measure(authenticator, header, iterations):
+    """(CPU на запрос, wall на запрос) в микросекундах; первый вызов прогревает кэш"""
+    request = Request(RequestFactory().get('/', HTTP_AUTHORIZATION=header))
+    authenticator.authenticate(request)
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(iterations):
+        user, _auth = authenticator.authenticate(request)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    return cpu / iterations * 1e6, wall / iterations * 1e6
+
+
+def run(command, **options):
+    iterations = options['iterations']
+    # Замер в одном процессе: кэш процесса здесь равнозначен общему
+    with bench_database(options['db_path']), override_settings(AUTH_CACHE_ALLOW_LOCAL=True):
+        user = CustomUser.objects.create_user(username='bench-auth', email='bench-auth@example.com', password=PASSWORD)
+        token = Token.objects.create(user=user)
+        basic = 'Basic ' + base64.b64encode(f'{user.username}:{PASSWORD}'.encode()).decode()
+        get_auth_cache().clear()
+
+        rows = []
+        for scheme, header, plain, cached in (
+                ('token', f'Token {token.key}', TokenAuthentication(), CachedTokenAuthentication()),
+                ('basic', basic, BasicAuthentication(), CachedBasicAuthentication())):
+            plain_cpu, plain_wall = measure(plain, header, iterations)
+            cached_cpu, cached_wall = measure(cached, header, iterations)
+            rows.append({
+                'scheme': scheme,
+                'plain_cpu_us': round(plain_cpu, 1), 'cached_cpu_us': round(cached_cpu, 1),
+                'saved_cpu_us': round(plain_cpu - cached_cpu, 1),
+                'plain_wall_us': round(plain_wall, 1), 'cached_wall_us': round(cached_wall, 1),
+            })
+    command.stdout.write(f"Аутентификаций на вариант: {iterations}")
+    command.stdout.write(format_table(rows))
+    return rows
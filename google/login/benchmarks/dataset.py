@@ -0,0 +1,103 @@
+"""Генерация правдоподобного набора данных для замеров (только bulk-вставки)"""
+import io
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from ..models import Budget, Category, CustomUser, Expense, Finance, Income, Reminder, TransactionRollup, Wallet
+from ..rollups import rebuild_rollups
+
+EXPENSE_CATEGORIES = ('Продукты', 'Транспорт', 'Жильё', 'Кафе', 'Здоровье', 'Одежда', 'Связь', 'Развлечения')
+INCOME_CATEGORIES = ('Зарплата', 'Подработка')
+PASSWORD = 'bench-password'
+
+
+def generate_dataset(users=20, transactions=2000, years=3, seed=0, using='default', batch_size=5000):
+    """Создаёт пользователей с токенами, кошельками, категориями, бюджетами, целями, напоминаниями
+    и историей операций за years лет; возвращает описания пользователей для генератора нагрузки."""
+    rng = random.Random(seed)
+    end = date.today()
+    start = end - timedelta(days=365 * years)
+    span = (end - start).days
+    password = make_password(PASSWORD)
+
+    with transaction.atomic(using=using):
+        accounts = CustomUser.objects.using(using).bulk_create([
+            CustomUser(username=f'bench{n}', email=f'bench{n}@example.com', password=password)
+            for n in range(users)])
+        wallets = Wallet.objects.using(using).bulk_create([Wallet(user=user) for user in accounts])
+        tokens = Token.objects.using(using).bulk_create([
+            Token(key=Token.generate_key(), user=user) for user in accounts])
+
+        names = EXPENSE_CATEGORIES + INCOME_CATEGORIES
+        categories = Category.objects.using(using).bulk_create([
+            Category(name=f'{name} #{user.pk}', user=user) for user in accounts for name in names])
+        by_user = defaultdict(list)
+        for category in categories:
+            by_user[category.user_id].append(category)
+
+        balances = defaultdict(Decimal)
+        for user, wallet in zip(accounts, wallets):
+            spending, earning = by_user[user.pk][:len(EXPENSE_CATEGORIES)], by_user[user.pk][len(EXPENSE_CATEGORIES):]
+            expenses, incomes = [], []
+            for i in range(transactions):
+                day = start + timedelta(days=rng.randrange(span + 1))
+                # Примерно каждая восьмая операция - доход, он покрывает расходы с запасом
+                if i % 8 == 0:
+                    amount = Decimal(rng.randrange(1500, 3000))
+                    incomes.append(Income(user=user, wallet=wallet, amount=amount, category=rng.choice(earning),
+                                          date=day))
+                    balances[wallet.pk] += amount
+                else:
+                    amount = Decimal(rng.randrange(100, 20000)) / 100
+                    expenses.append(Expense(user=user, wallet=wallet, amount=amount, category=rng.choice(spending),
+                                            date=day, comments=rng.choice(('', 'карта', 'наличные'))))
+                    balances[wallet.pk] -= amount
+            Expense.objects.using(using).bulk_create(expenses, batch_size=batch_size)
+            Income.objects.using(using).bulk_create(incomes, batch_size=batch_size)
+
+        for wallet in wallets:
+            wallet.balance = balances[wallet.pk]
+        Wallet.objects.using(using).bulk_update(wallets, ['balance'], batch_size=batch_size)
+
+        # Лимиты заведомо выше трат, чтобы пишущие запросы нагрузки не упирались в prevent_exceeding_budget
+        Budget.objects.using(using).bulk_create([
+            Budget(user_id=category.user_id, category=category, amount=10 ** 7,
+                   start_date=date(year, 1, 1), end_date=date(year, 12, 31))
+            for category in categories if not category.name.startswith(INCOME_CATEGORIES)
+            for year in range(start.year, end.year + 1)], batch_size=batch_size)
+        goals = Finance.objects.using(using).bulk_create([
+            Finance(user=user, name=f'Цель {n}', target_amount=10 ** 7, start_date=start,
+                    end_date=end + timedelta(days=365 * (n + 1)))
+            for user in accounts for n in range(3)])
+        reminders = Reminder.objects.using(using).bulk_create([
+            Reminder(user=user, title=f'Платёж {n}', description='', start_date=start,
+                     recurrence_interval=interval)
+            for user in accounts for n, interval in enumerate(('daily', 'weekly', 'monthly'))])
+
+    call_command('rebuild_budget_spent', database=using, stdout=io.StringIO())
+    rebuild_rollups(TransactionRollup, {'expense': Expense, 'income': Income}, using=using)
+
+    expense_ids = defaultdict(list)
+    for user_id, pk in Expense.objects.using(using).values_list('user_id', 'pk'):
+        expense_ids[user_id].append(pk)
+    budgets = dict(Budget.objects.using(using).values_list('user_id', 'pk'))
+    goals_by_user = {goal.user_id: goal.pk for goal in goals}
+    reminders_by_user = {reminder.user_id: reminder.pk for reminder in reminders}
+    return [{
+        'id': user.pk,
+        'token': token.key,
+        'wallet': wallet.pk,
+        'categories': [category.pk for category in by_user[user.pk][:len(EXPENSE_CATEGORIES)]],
+        'expenses': expense_ids[user.pk],
+        'budget': budgets[user.pk],
+        'goal': goals_by_user[user.pk],
+        'reminder': reminders_by_user[user.pk],
+    } for user, wallet, token in zip(accounts, wallets, tokens)]
+
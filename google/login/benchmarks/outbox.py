@@ -0,0 +1,125 @@
+"""Доставка писем: send_mail на каждое письмо против пачечной отправки из EmailOutbox.
+
+Письма уходят на локальный SMTP-заглушку (поток с socketserver), которая
+отвечает на команды с задержкой --latency-ms, имитируя сетевой RTT.
+"""
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from django.core.mail import get_connection, send_mail
+from django.test.utils import override_settings
+
+from . import bench_database, format_table
+from ..models import EmailOutbox
+from ..outbox import drain_outbox, enqueue_email
+
+
+def add_arguments(parser):
+    parser.add_argument('--messages', type=int, default=200, help="Писем на каждый вариант")
+    parser.add_argument('--batch-size', type=int, default=100, help="Размер пачки воркера")
+    parser.add_argument('--latency-ms', type=float, default=2.0, help="Задержка ответа SMTP на команду")
+    parser.add_argument('--db-path', help="Файл временной базы (по умолчанию во временном каталоге)")
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP: принимает любые письма и считает их"""
+
+    def reply(self, line):
+        time.sleep(self.server.latency)
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 bench ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 bench')
+            elif command == b'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.messages += 1
+                self.reply('250 queued')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.latency = latency
+        self.connections = self.messages = 0
+
+
+@contextmanager
+def smtp_server(latency):
+    server = SMTPServer(latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                               EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1],
+                               EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+                               EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''):
+            yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def send_inline(count):
+    """Как было: по одному соединению на письмо прямо в запросе"""
+    for number in range(count):
+        send_mail(f'Goal {number}', 'Goal achieved', 'money@example.com', [f'user{number}@example.com'],
+                  fail_silently=False)
+
+
+def send_outbox(count, batch_size):
+    """Постановка в очередь (это время видит запрос) и отдельно работа воркера"""
+    started = time.perf_counter()
+    for number in range(count):
+        enqueue_email(f'Goal {number}', 'Goal achieved', [f'user{number}@example.com'],
+                      from_email='money@example.com', dedupe_key=f'bench:{number}')
+    enqueued = time.perf_counter() - started
+    totals = drain_outbox(batch_size=batch_size, connection=get_connection(fail_silently=False))
+    return enqueued, totals
+
+
+def run(command, **options):
+    count, latency = options['messages'], options['latency_ms'] / 1000
+    rows = []
+    with bench_database(options['db_path']):
+        with smtp_server(latency) as server:
+            started = time.perf_counter()
+            send_inline(count)
+            elapsed = time.perf_counter() - started
+            rows.append({'variant': 'send_mail', 'messages': server.messages, 'connections': server.connections,
+                         'request_ms_per_msg': round(elapsed / count * 1000, 3),
+                         'total_s': round(elapsed, 3), 'msgs_per_s': round(count / elapsed, 1)})
+
+        # Постановка в очередь не должна дёргать воркер на каждое письмо: воркер запускается ниже
+        with smtp_server(latency) as server, mock.patch('login.outbox.kick_outbox_worker'):
+            started = time.perf_counter()
+            enqueued, totals = send_outbox(count, options['batch_size'])
+            elapsed = time.perf_counter() - started
+            rows.append({'variant': 'outbox', 'messages': server.messages, 'connections': server.connections,
+                         'request_ms_per_msg': round(enqueued / count * 1000, 3),
+                         'total_s': round(elapsed, 3), 'msgs_per_s': round(count / elapsed, 1)})
+            assert totals['sent'] == count, totals
+            assert not EmailOutbox.objects.exclude(status=EmailOutbox.SENT).exists()
+    command.stdout.write(f"Писем на вариант: {count}, задержка SMTP: {options['latency_ms']} мс")
+    command.stdout.write(format_table(rows))
+    return rows
@@ -0,0 +1,64 @@
+"""Списки операций: ExpenseSerializer + JSONRenderer против быстрого пути login.fastread.
+
+Замер включает чтение из базы, сериализацию и рендер JSON, как в list() - но
+без пагинации, чтобы строк было ровно --rows.
+"""
+import math
+import time
+
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import bench_database, format_table
+from .dataset import generate_dataset
+from ..fastread import FastJSONRenderer, row_builder
+from ..models import CustomUser, Expense
+from ..serializers import ExpenseSerializer
+
+
+def add_arguments(parser):
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000], help="Размеры выборки")
+    parser.add_argument('--repeat', type=int, default=3, help="Повторов (берётся лучший)")
+    parser.add_argument('--db-path', help="Файл временной базы (по умолчанию во временном каталоге)")
+
+
+def regular_path(queryset, request):
+    data = ExpenseSerializer(queryset, many=True, context={'request': request}).data
+    return JSONRenderer().render(data)
+
+
+def fast_path(queryset, request):
+    columns, build = row_builder(ExpenseSerializer)
+    return FastJSONRenderer().render([build(row) for row in queryset.values_list(*columns, named=True)])
+
+
+def best_of(function, queryset, request, repeat):
+    timings, body = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = function(queryset, request)
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+
+def run(command, **options):
+    sizes = sorted(options['rows'])
+    rows = []
+    with bench_database(options['db_path']):
+        # Каждая восьмая операция генератора - доход
+        generate_dataset(users=1, transactions=math.ceil(sizes[-1] * 8 / 7) + 8, years=5, batch_size=20000)
+        user = CustomUser.objects.get()
+        request = Request(RequestFactory().get('/'))
+        request.user = user
+        for size in sizes:
+            queryset = Expense.objects.filter(user=user).order_by('-date', '-id')[:size]
+            regular, regular_body = best_of(regular_path, queryset, request, options['repeat'])
+            fast, fast_body = best_of(fast_path, queryset, request, options['repeat'])
+            rows.append({
+                'rows': size,
+                'regular_rows_per_s': round(size / regular), 'fast_rows_per_s': round(size / fast),
+                'speedup': round(regular / fast, 1), 'identical': regular_body == fast_body,
+            })
+    command.stdout.write(format_table(rows))
+    return rows
@@ -0,0 +1,119 @@
+"""Пропускная способность записи операций в зависимости от числа шардов (login.sharding).
+
+Каждый поток пишет расходы своего пользователя (операция с сигналами: баланс,
+свёртки, бюджет) по одной транзакции на расход. У SQLite один писатель на файл,
+поэтому на одной базе потоки ждут друг друга, а с шардами пишут параллельно.
+Недостающие в settings базы шардов объявляются на время замера во временном каталоге.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.test import override_settings
+
+from . import bench_database, format_table
+from ..models import Category, CustomUser, Expense
+from ..sharding import user_shard
+
+
+def add_arguments(parser):
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2], help="Числа шардов для сравнения")
+    parser.add_argument('--users', type=int, default=16, help="Пользователей (и пишущих потоков)")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Длительность записи на каждое число шардов")
+    parser.add_argument('--json', dest='json_path', help="Записать отчёт в JSON-файл")
+
+
+def shard_aliases(count):
+    return ['default'] + [f'shard{number}' for number in range(1, count)]
+
+
+@contextmanager
+def declared_shards(aliases):
+    """Объявляет отсутствующие в settings.DATABASES базы (по образцу default) на время замера;
+    файлы создаёт и удаляет bench_database"""
+    added = [alias for alias in aliases if alias not in settings.DATABASES]
+    for alias in added:
+        settings.DATABASES[alias] = {'ENGINE': settings.DATABASES['default']['ENGINE'],
+                                     'NAME': f'bench_{alias}.sqlite3'}
+    # Недостающие ключи (OPTIONS, TEST...) заполняет сам ConnectionHandler
+    connections.configure_settings(settings.DATABASES)
+    try:
+        yield
+    finally:
+        for alias in added:
+            connections[alias].close()
+            del connections[alias]
+            del settings.DATABASES[alias]
+
+
+def create_users(count):
+    users = []
+    for number in range(count):
+        user = CustomUser.objects.create_user(username=f'shard{number}', email=f'shard{number}@example.com',
+                                              password='bench-password')
+        with user_shard(user):
+            category = Category.objects.create(name=f'Bench #{user.pk}', user=user)
+        users.append((user, category))
+    return users
+
+
+def write_expenses(user, category, deadline, totals, lock):
+    written = retries = 0
+    wallet = user.wallet
+    with user_shard(user) as shard:
+        while time.perf_counter() < deadline:
+            try:
+                with transaction.atomic(using=shard):
+                    Expense.objects.create(user=user, wallet=wallet, category=category, amount=Decimal('1.00'),
+                                           date=date.today())
+            except OperationalError as error:
+                # database is locked: писатель ждал дольше timeout соединения
+                if 'locked' not in str(error):
+                    raise
+                retries += 1
+                continue
+            written += 1
+    connections.close_all()
+    with lock:
+        totals['writes'] += written
+        totals['retries'] += retries
+
+
+def run_writes(users, seconds):
+    totals, lock = {'writes': 0, 'retries': 0}, threading.Lock()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=write_expenses, args=(user, category, started + seconds, totals, lock))
+               for user, category in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return totals, time.perf_counter() - started
+
+
+def run(command, **options):
+    rows = []
+    for count in options['shards']:
+        aliases = shard_aliases(count)
+        with declared_shards(aliases), bench_database(aliases=aliases), override_settings(USER_SHARDS=aliases):
+            users = create_users(options['users'])
+            placement = {alias: sum(user.shard in (alias, '') if alias == 'default' else user.shard == alias
+                                    for user, _category in users) for alias in aliases}
+            totals, duration = run_writes(users, options['seconds'])
+        rows.append({'shards': count, 'writes': totals['writes'], 'retries': totals['retries'],
+                     'writes_per_s': round(totals['writes'] / duration, 1),
+                     'users_per_shard': '/'.join(str(placement[alias]) for alias in aliases)})
+    for row in rows:
+        row['speedup'] = round(row['writes_per_s'] / rows[0]['writes_per_s'], 2) if rows[0]['writes_per_s'] else 0.0
+    command.stdout.write(f"\nusers={options['users']}, {options['seconds']} с на каждое число шардов")
+    command.stdout.write(format_table(rows))
+    if options['json_path']:
+        with open(options['json_path'], 'w') as file:
+            json.dump({'options': {key: options[key] for key in ('shards', 'users', 'seconds')}, 'shards': rows},
+                      file, indent=2, ensure_ascii=False)
+    return rows
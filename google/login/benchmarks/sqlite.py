@@ -0,0 +1,85 @@
+"""Смешанная нагрузка чтение/запись на SQLite: профиль баз default против production.
+
+Для каждого профиля создаётся своя файловая база с одинаковыми данными, и через
+WSGI-приложение в --concurrency потоков идут запросы api-набора с долей записи
+--write-ratio. В default писатель блокирует читателей (журнал отката), соединение
+открывается на каждый запрос, а повышение блокировки в транзакции может сразу
+закончиться "database is locked" - такие ответы видны в колонке errors.
+"""
+import json
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from . import bench_database, format_table
+from .api import run_wsgi
+from .dataset import generate_dataset
+
+PROFILES = ('default', 'production')
+
+
+def add_arguments(parser):
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--transactions', type=int, default=1000, help="Операций на пользователя")
+    parser.add_argument('--years', type=int, default=2, help="Глубина истории операций")
+    parser.add_argument('--concurrency', type=int, default=8, help="Потоков")
+    parser.add_argument('--requests', type=int, default=1000, help="Запросов на каждый профиль")
+    parser.add_argument('--duration', type=float, help="Ограничение по времени на профиль, секунды")
+    parser.add_argument('--write-ratio', type=float, default=0.3, help="Доля пишущих запросов (0..1)")
+    parser.add_argument('--warmup', type=int, default=20, help="Запросов прогрева, не попадающих в отчёт")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_path', help="Записать отчёт в JSON-файл")
+
+
+def profile_settings(name):
+    if name == 'production':
+        return dict(settings.SQLITE_PRODUCTION, OPTIONS=dict(settings.SQLITE_PRODUCTION['OPTIONS']))
+    return {'ENGINE': 'django.db.backends.sqlite3', 'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}
+
+
+@contextmanager
+def database_profile(name):
+    """Подменяет настройки default на время замера; потоки нагрузки откроют соединения уже с ними"""
+    database = settings.DATABASES['default']
+    previous = {key: database[key] for key in ('ENGINE', 'OPTIONS', 'CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+    connections['default'].close()
+    del connections['default']
+    database.update(profile_settings(name))
+    try:
+        yield
+    finally:
+        connections['default'].close()
+        del connections['default']
+        database.update(previous)
+
+
+def journal_mode():
+    with connections['default'].cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        return cursor.fetchone()[0]
+
+
+def run(command, **options):
+    report = {'options': {key: options[key] for key in (
+        'users', 'transactions', 'years', 'concurrency', 'requests', 'duration', 'write_ratio', 'seed')}}
+    totals = []
+    for profile in options['profiles']:
+        with database_profile(profile), bench_database():
+            users = generate_dataset(options['users'], options['transactions'], options['years'], options['seed'])
+            mode = journal_mode()
+            recorder, duration = run_wsgi(users, options)
+        rows = recorder.summary(duration)
+        report[profile] = {'journal_mode': mode, 'duration_s': round(duration, 3), 'endpoints': rows}
+        totals.append(dict(rows[-1], name=profile, journal_mode=mode))
+        command.stdout.write(f"\n{profile} (journal_mode={mode}): concurrency={options['concurrency']}, "
+                             f"write_ratio={options['write_ratio']}, {duration:.2f} с")
+        command.stdout.write(format_table(rows))
+    command.stdout.write("\nИтого:")
+    command.stdout.write(format_table(totals, ['name', 'journal_mode', 'requests', 'errors', 'rps',
+                                               'p50_ms', 'p95_ms', 'p99_ms']))
+    if options['json_path']:
+        with open(options['json_path'], 'w') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    return report
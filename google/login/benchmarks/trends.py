@@ -0,0 +1,147 @@
+"""/analytics/trends/: векторный расчёт против наивного ORM-запроса на каждый месяц и категорию.
+
+Варианты:
+* naive   - Sum() отдельным запросом на каждый (месяц, вид) и каждую категорию, ряды в цикле Python;
+* raw     - все операции одним values_list, помесячная свёртка и ряды на pandas;
+* rollup  - то, что делает эндпоинт: помесячные TransactionRollup одним запросом и тот же pandas.
+"""
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from django.db import connection
+from django.db.models import Sum, Value
+from django.test.utils import CaptureQueriesContext
+
+from . import bench_database, format_table
+from .dataset import generate_dataset
+from ..models import Category, CustomUser, Expense, Income
+from ..recurrence import add_months
+from ..trends import DEFAULT_THRESHOLD, DEFAULT_WINDOW, compute_trends, load_monthly_totals, to_frame
+
+
+def add_arguments(parser):
+    parser.add_argument('--transactions', type=int, default=1_000_000, help="Операций в таблицах всего")
+    parser.add_argument('--users', type=int, default=4,
+                        help="Пользователей, между которыми делятся операции (замер - по первому)")
+    parser.add_argument('--years', type=int, default=5, help="Глубина истории операций")
+    parser.add_argument('--repeat', type=int, default=3, help="Повторов каждого варианта (берётся медиана)")
+    parser.add_argument('--db-path', help="Файл временной базы (по умолчанию во временном каталоге)")
+
+
+def naive_trends(user, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD):
+    """Как написали бы без массивов: запрос на каждую корзину, ряды в цикле"""
+    bounds = [model.objects.filter(user=user).order_by(order).values_list('date', flat=True).first()
+              for model in (Expense, Income) for order in ('date', '-date')]
+    bounds = [day for day in bounds if day]
+    if not bounds:
+        return {'window': window, 'threshold': threshold, 'months': [], 'categories': []}
+    month, last = min(bounds).replace(day=1), max(bounds).replace(day=1)
+
+    months = []
+    while month <= last:
+        following = add_months(month, 1)
+        totals = {}
+        for kind, model in (('income', Income), ('expense', Expense)):
+            total = model.objects.filter(user=user, date__gte=month, date__lt=following).aggregate(
+                total=Sum('amount'))['total']
+            totals[kind] = float(total or 0)
+        months.append({'month': month.isoformat(), 'income': totals['income'], 'expense': totals['expense'],
+                       'net': totals['income'] - totals['expense']})
+        month = following
+
+    for index, row in enumerate(months):
+        recent = months[max(index - window + 1, 0):index + 1]
+        row['net_rolling'] = round(sum(item['net'] for item in recent) / len(recent), 2)
+        row['expense_rolling'] = round(sum(item['expense'] for item in recent) / len(recent), 2)
+        previous = months[index - 1]['net'] if index else None
+        row['net_change'] = None if previous is None else round(row['net'] - previous, 2)
+        row['net_change_pct'] = (round((row['net'] - previous) / abs(previous) * 100, 2)
+                                 if previous else None)
+        history = [item['expense'] for item in months[index - window:index]] if index >= window else []
+        spread = statistics.pstdev(history) if history else 0
+        row['expense_anomaly'] = bool(spread) and row['expense'] - statistics.mean(history) > threshold * spread
+
+    categories = []
+    for category in Category.objects.filter(user=user):
+        total = Expense.objects.filter(user=user, category=category).aggregate(total=Sum('amount'))['total']
+        if total:
+            categories.append({'category': category.name, 'total': float(total)})
+    overall = sum(row['total'] for row in categories)
+    for row in categories:
+        row['share'] = round(row['total'] / overall, 4)
+    categories.sort(key=lambda row: -row['total'])
+    return {'window': window, 'threshold': threshold, 'months': months, 'categories': categories}
+
+
+def raw_trends(user, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD):
+    """Все операции одним запросом (UNION расходов и доходов), свёртка по месяцам на массивах"""
+    expenses = Expense.objects.filter(user=user).values_list(Value('expense'), 'date', 'category__name', 'amount')
+    incomes = Income.objects.filter(user=user).values_list(Value('income'), 'date', 'category__name', 'amount')
+    rows = list(expenses.union(incomes, all=True))
+    if not rows:
+        return compute_trends(to_frame(rows), window, threshold)
+    kinds, days, categories, amounts = zip(*rows)
+    frame = pd.DataFrame({
+        'kind': np.array(kinds, dtype=object),
+        'month': pd.to_datetime(np.array(days, dtype='datetime64[D]').astype('datetime64[M]')),
+        'category': np.array(categories, dtype=object),
+        'total': np.array(amounts, dtype=float),
+    })
+    frame = frame.groupby(['kind', 'month', 'category'], as_index=False, sort=False)['total'].sum()
+    return compute_trends(frame, window, threshold)
+
+
+def rollup_trends(user, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD):
+    return compute_trends(to_frame(load_monthly_totals(user)), window, threshold)
+
+
+VARIANTS = (('naive', naive_trends), ('raw', raw_trends), ('rollup', rollup_trends))
+
+
+def measure(variant, user, repeat):
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = variant(user)
+            timings.append(time.perf_counter() - started)
+    return result, statistics.median(timings), len(queries)
+
+
+def same_result(expected, actual):
+    columns = ('income', 'expense', 'net', 'net_rolling', 'net_change')
+    if [row['month'] for row in expected['months']] != [row['month'] for row in actual['months']]:
+        return False
+    for column in columns:
+        left = np.array([row[column] for row in expected['months']], dtype=float)
+        right = np.array([row[column] for row in actual['months']], dtype=float)
+        if not np.allclose(left, right, atol=0.011, equal_nan=True):
+            return False
+    return ([row['month'] for row in expected['months'] if row['expense_anomaly']]
+            == [row['month'] for row in actual['months'] if row['expense_anomaly']])
+
+
+def run(command, **options):
+    rows = []
+    with bench_database(options['db_path']):
+        started = time.perf_counter()
+        # Баланс кошелька - DecimalField(max_digits=10): миллион операций одного пользователя его переполняет
+        per_user = options['transactions'] // options['users']
+        generate_dataset(users=options['users'], transactions=per_user, years=options['years'], batch_size=20000)
+        command.stdout.write(f"Данные: {per_user * options['users']} операций, {per_user} у пользователя, "
+                             f"{time.perf_counter() - started:.1f} с")
+        user = CustomUser.objects.order_by('pk').first()
+
+        baseline = None
+        for name, variant in VARIANTS:
+            result, elapsed, queries = measure(variant, user, options['repeat'])
+            baseline = baseline or result
+            rows.append({'variant': name, 'queries': queries, 'months': len(result['months']),
+                         'median_ms': round(elapsed * 1000, 1), 'matches_naive': same_result(baseline, result)})
+    naive = rows[0]['median_ms']
+    for row in rows:
+        row['speedup'] = round(naive / row['median_ms'], 1) if row['median_ms'] else None
+    command.stdout.write(format_table(rows))
+    return rows
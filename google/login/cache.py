@@ -0,0 +1,110 @@
+"""Кэш ответов GET-запросов по пользователю.
+
+Ключ включает CustomUser.data_version, который увеличивают сигналы при любом
+изменении данных пользователя, поэтому устаревшие записи никогда не читаются и
+просто вытесняются бэкендом. Бэкенд - любой кэш Django из settings.CACHES
+(locmem с ограничением MAX_ENTRIES, файловый, Redis).
+"""
+import hashlib
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ResponseCacheStats:
+    """Счётчики попаданий и промахов по эндпоинтам (в пределах процесса)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    def record(self, endpoint, hit):
+        with self._lock:
+            self._counters[endpoint]['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(counters) for endpoint, counters in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+stats = ResponseCacheStats()
+
+
+def get_response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'responses')]
+
+
+def response_cache_key(user, endpoint, query_params, origin=''):
+    """origin - схема и хост запроса: ссылки next/previous пагинации абсолютные"""
+    query = '&'.join(f'{key}={value}' for key in sorted(query_params)
+                     for value in sorted(query_params.getlist(key)))
+    digest = hashlib.sha1(f'{origin}?{query}'.encode()).hexdigest()
+    return f'response:{user.pk}:{user.data_version}:{endpoint}:{digest}'
+
+
+def request_cache_key(request, variant=None):
+    """(эндпоинт, ключ) ответа на запрос или None, если кэш не применяется"""
+    user = request.user
+    if not getattr(settings, 'RESPONSE_CACHE_ENABLED', True) or not user.is_authenticated:
+        return None
+    endpoint = request.resolver_match.url_name if request.resolver_match else request.path
+    return endpoint, response_cache_key(user, f'{endpoint}@{variant}' if variant else endpoint, request.query_params,
+                                        f'{request.scheme}://{request.get_host()}')
+
+
+def cached_response(request, compute, variant=None):
+    """Возвращает закэшированные данные ответа или вызывает compute() и сохраняет результат;
+    variant - то, от чего ответ зависит помимо параметров запроса (например, текущая дата)"""
+    cache_key = request_cache_key(request, variant)
+    if cache_key is None:
+        return compute()
+
+    endpoint, key = cache_key
+    cache = get_response_cache()
+    data = cache.get(key)
+    if data is not None:
+        stats.record(endpoint, hit=True)
+        return Response(data, headers={'X-Cache': 'HIT'})
+
+    stats.record(endpoint, hit=False)
+    response = compute()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+async def acached_response(request, compute, variant=None):
+    """cached_response для async-представлений: compute - корутинная функция"""
+    cache_key = request_cache_key(request, variant)
+    if cache_key is None:
+        return await compute()
+
+    endpoint, key = cache_key
+    cache = get_response_cache()
+    data = await cache.aget(key)
+    if data is not None:
+        stats.record(endpoint, hit=True)
+        return Response(data, headers={'X-Cache': 'HIT'})
+
+    stats.record(endpoint, hit=False)
+    response = await compute()
+    if response.status_code == status.HTTP_200_OK:
+        await cache.aset(key, response.data)
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+class CachedListMixin:
+    """Кэширует list() у ViewSet"""
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(request, lambda: super(CachedListMixin, self).list(request, *args, **kwargs))
@@ -0,0 +1,66 @@
+"""Условные GET-запросы (ETag / Last-Modified -> 304) без выполнения запроса к данным.
+
+Валидаторы строятся из CustomUser.data_version и data_changed_at, которые уже
+загружены вместе с request.user при аутентификации.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.timezone import localdate
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Добавляет ETag и Last-Modified к GET-ответам и отвечает 304, если данные не менялись"""
+
+    def depends_on_today(self, request):
+        """True - ответ считается от текущей даты (прогнозы, текущий месяц) и устаревает со сменой дня"""
+        return False
+
+    def get_etag(self, request):
+        user = request.user
+        variant = '|'.join([
+            request.path,
+            request.META.get('QUERY_STRING', ''),
+            getattr(request, 'accepted_media_type', '') or '',
+            str(localdate()) if self.depends_on_today(request) else '',
+        ])
+        digest = hashlib.sha1(variant.encode()).hexdigest()[:16]
+        return quote_etag(f'{user.pk}-{user.data_version}-{digest}')
+
+    def get_last_modified(self, request):
+        if self.depends_on_today(request):
+            return None
+        changed_at = request.user.data_changed_at
+        return int(changed_at.timestamp()) if changed_at else None
+
+    def is_conditional(self, request):
+        return request.method in ('GET', 'HEAD') and request.user.is_authenticated
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.is_conditional(request):
+            not_modified = get_conditional_response(
+                request, etag=self.get_etag(request), last_modified=self.get_last_modified(request))
+            if not_modified is not None:
+                raise NotModified(not_modified)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.is_conditional(request) and response.status_code in (200, 304):
+            response['ETag'] = self.get_etag(request)
+            last_modified = self.get_last_modified(request)
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Accept', 'Authorization', 'Cookie'))
+        return response
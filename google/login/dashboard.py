@@ -0,0 +1,73 @@
+"""Главный экран одним запросом к API: баланс, бюджеты, цели, последние операции и итоги месяца.
+
+Число SQL-запросов не зависит от объёма данных (см. DASHBOARD_QUERIES): имена
+категорий приходят через select_related, суммы месяца - из помесячных
+TransactionRollup, последние операции - двумя запросами по индексу (user, date, id).
+"""
+from heapq import merge
+
+from .models import Budget, Expense, Finance, Income, TransactionRollup, Wallet
+from .serializers import DashboardBudgetSerializer, GoalProgressSerializer, RecentTransactionSerializer
+
+# кошелёк, бюджеты, цели, последние расходы, последние доходы, итоги месяца
+DASHBOARD_QUERIES = 6
+
+
+def load_wallet(user):
+    return Wallet.objects.filter(user=user).first()
+
+
+def load_budgets(user, as_of):
+    return list(Budget.objects.filter(user=user, start_date__lte=as_of, end_date__gte=as_of).select_related(
+        'category').order_by('end_date', 'pk'))
+
+
+def load_goals(user):
+    return list(Finance.objects.filter(user=user).order_by('is_achieved', 'end_date', 'pk'))
+
+
+def load_recent(user, kind, limit):
+    """Последние limit операций одного вида, от новых к старым"""
+    model = Expense if kind == 'expense' else Income
+    rows = model.objects.filter(user=user).select_related('category').order_by('-date', '-id')[:limit]
+    return [(row.date, row.pk, kind, row) for row in rows]
+
+
+def month_totals(user, month_start):
+    totals = {'expenses': [], 'incomes': [], 'expense_total': 0, 'income_total': 0}
+    rollups = TransactionRollup.objects.filter(
+        user=user, granularity=TransactionRollup.MONTH, period_start=month_start, count__gt=0,
+    ).values_list('kind', 'category_id', 'category__name', 'total', 'count').order_by('-total')
+    for kind, category_id, name, total, count in rollups:
+        totals[f'{kind}s'].append({'category': category_id, 'category__name': name, 'total': total, 'count': count})
+        totals[f'{kind}_total'] += total
+    return totals
+
+
+def dashboard_loaders(user, as_of, recent):
+    """Независимые друг от друга запросы экрана; DashboardView выполняет их одновременно"""
+    return {
+        'wallet': lambda: load_wallet(user),
+        'budgets': lambda: load_budgets(user, as_of),
+        'goals': lambda: load_goals(user),
+        'recent_expenses': lambda: load_recent(user, 'expense', recent),
+        'recent_incomes': lambda: load_recent(user, 'income', recent),
+        'month': lambda: month_totals(user, as_of.replace(day=1)),
+    }
+
+
+def assemble_dashboard(as_of, recent, loaded):
+    wallet = loaded['wallet']
+    balance = wallet.balance if wallet else 0
+    context = {'as_of': as_of, 'balance': balance}
+    # Слияние двух уже упорядоченных выборок
+    latest = list(merge(loaded['recent_expenses'], loaded['recent_incomes'], reverse=True))[:recent]
+    return {
+        'as_of': as_of,
+        'wallet': {'id': wallet.pk if wallet else None, 'balance': balance},
+        'budgets': DashboardBudgetSerializer(loaded['budgets'], many=True, context=context).data,
+        'goals': GoalProgressSerializer(loaded['goals'], many=True, context=context).data,
+        'recent_transactions': RecentTransactionSerializer(
+            [{'kind': kind, 'transaction': row} for _date, _pk, kind, row in latest], many=True).data,
+        'month': {'start': as_of.replace(day=1), **loaded['month']},
+    }
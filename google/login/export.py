@@ -0,0 +1,91 @@
+"""Потоковая выгрузка всех операций пользователя (CSV / NDJSON)"""
+import csv
+import heapq
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from rest_framework.renderers import BaseRenderer
+
+from .models import Expense, Income
+
+EXPORT_FIELDS = ('type', 'id', 'date', 'amount', 'category', 'category_name', 'comments')
+CHUNK_SIZE = 2000
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Сама выгрузка отдаётся StreamingHttpResponse, сюда попадают только ошибки (401, 403...)
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class NDJSONRenderer(CSVRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+def iter_transactions(model, kind, user, using=None):
+    rows = model.objects.db_manager(using).filter(user=user).order_by('date', 'id').values_list(
+        'id', 'date', 'amount', 'category_id', 'category__name', 'comments')
+    for pk, day, amount, category_id, category_name, comments in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield (kind, pk, day.isoformat(), f'{amount:.2f}', category_id, category_name, comments)
+
+
+def iter_ledger(user, using=None):
+    """Расходы и доходы, слитые по дате; каждая выборка читается чанками через iterator()"""
+    return heapq.merge(
+        iter_transactions(Expense, 'expense', user, using),
+        iter_transactions(Income, 'income', user, using),
+        key=lambda row: row[2],
+    )
+
+
+def stream_csv(rows, batch_size=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for number, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if number % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows, batch_size=500):
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    lines = []
+    for row in rows:
+        lines.append(encode(dict(zip(EXPORT_FIELDS, row))))
+        if len(lines) >= batch_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+async def aiter_chunks(chunks):
+    """Асинхронный итератор поверх синхронного для ответа под ASGI: синхронный Django
+    сначала собрал бы всю выгрузку в памяти. Чанки читаются по одному в общем потоке
+    (thread_sensitive) - открытый курсор iterator() остаётся на своём соединении"""
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while (chunk := await next_chunk(chunks, done)) is not done:
+            yield chunk
+    finally:
+        # Клиент отключился посреди выгрузки - курсор закрывается в том же потоке
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+STREAMERS = {
+    CSVRenderer.format: stream_csv,
+    NDJSONRenderer.format: stream_ndjson,
+}
@@ -0,0 +1,127 @@
+"""Быстрый путь чтения списков операций (?fast=1).
+
+Вместо экземпляров моделей и ModelSerializer строки берутся кортежами из
+values_list, а каждое поле переводится заранее выбранным конвертером того же
+поля сериализатора - вывод побайтно совпадает с обычным путём. Рендерит
+FastJSONRenderer: orjson, если он установлен, иначе стандартный json без
+JSONEncoder DRF (в строках уже только str/int/None).
+"""
+import decimal
+import json
+from datetime import date
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависимость необязательная
+    orjson = None
+
+# Поля, значение которых из values_list уже совпадает с представлением сериализатора
+PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.PrimaryKeyRelatedField)
+# Поля, представление которых получает их же to_representation
+CONVERTED_FIELDS = (serializers.DecimalField, serializers.DateField)
+
+
+def fast_converter(field):
+    """to_representation поля или его упрощённый эквивалент для частого случая (строка Decimal, ISO-дата)"""
+    if isinstance(field, serializers.DecimalField):
+        plain = (getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) and not field.localize
+                 and not field.normalize_output and field.decimal_places is not None)
+        if plain:
+            exponent = decimal.Decimal('.1') ** field.decimal_places
+            context = decimal.getcontext().copy()
+            if field.max_digits is not None:
+                context.prec = field.max_digits
+            rounding = field.rounding
+            return lambda value: format(value.quantize(exponent, rounding=rounding, context=context), 'f')
+    if isinstance(field, serializers.DateField):
+        if getattr(field, 'format', api_settings.DATE_FORMAT).lower() == ISO_8601:
+            return date.isoformat
+    return field.to_representation
+
+
+def compile_row_builder(serializer_class):
+    """(колонки для values_list, функция кортеж -> dict) по полям сериализатора.
+
+    Функция собирается из исходника один раз: литерал словаря в порядке полей
+    сериализатора, конвертер вызывается только для непустых Decimal и дат.
+    """
+    columns, items, namespace = [], [], {}
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if '.' in field.source or field.source == '*':
+            raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: вложенный source не поддерживается")
+        index = len(columns)
+        if isinstance(field, PASSTHROUGH_FIELDS):
+            items.append(f'{name!r}: row[{index}]')
+        elif isinstance(field, CONVERTED_FIELDS):
+            namespace[f'convert_{index}'] = fast_converter(field)
+            items.append(f'{name!r}: None if row[{index}] is None else convert_{index}(row[{index}])')
+        else:
+            raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: поле {type(field).__name__} "
+                                       f"не поддерживается быстрым путём")
+        columns.append(field.source)
+    exec(f"def build(row):\n    return {{{', '.join(items)}}}\n", namespace)
+    return columns, namespace['build']
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer с тем же выводом байт в байт, но без JSONEncoder DRF"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            if orjson is not None:
+                ret = orjson.dumps(data)
+            else:
+                ret = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+        except (TypeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как JSONRenderer: U+2028/U+2029 допустимы в JSON, но не в JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastListMixin:
+    """list() через values_list и compile_row_builder, когда включён быстрый путь"""
+    fast_query_param = 'fast'
+
+    def use_fast_path(self):
+        if getattr(self, 'action', None) != 'list' or self.request.method != 'GET':
+            return False
+        value = self.request.query_params.get(self.fast_query_param)
+        if value is None:
+            return getattr(settings, 'TRANSACTIONS_FAST_LIST', False)
+        return value.lower() in ('1', 'true', 'yes')
+
+    def get_renderers(self):
+        if self.use_fast_path():
+            return [FastJSONRenderer()] + [renderer for renderer in super().get_renderers()
+                                          if not isinstance(renderer, JSONRenderer)]
+        return super().get_renderers()
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_path():
+            return super().list(request, *args, **kwargs)
+        columns, build = row_builder(self.get_serializer_class())
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*columns, named=True)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response([build(row) for row in queryset])
+        return self.get_paginated_response([build(row) for row in page])
+
+
+_builders = {}
+
+
+def row_builder(serializer_class):
+    if serializer_class not in _builders:
+        _builders[serializer_class] = compile_row_builder(serializer_class)
+    return _builders[serializer_class]
@@ -0,0 +1,212 @@
+"""Пакетный импорт расходов и доходов (выписки банка в CSV/JSON)"""
+import codecs
+import csv
+import json
+
+from django.db import transaction
+from django.db.models import F
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+
+from .models import (Budget, Category, Expense, apply_rollup_deltas, apply_wallet_delta, bump_user_data_version,
+                     schedule_goal_check)
+from .sharding import shard_for
+
+CSV_CONTENT_TYPES = ('text/csv', 'application/csv')
+
+
+def iter_csv_rows(stream):
+    reader = csv.DictReader(codecs.getreader('utf-8-sig')(stream))
+    try:
+        for row in reader:
+            yield row
+    except csv.Error as exc:
+        raise ParseError(f"Некорректный CSV (строка {reader.line_num}): {exc}")
+
+
+def iter_json_rows(stream, chunk_size=64 * 1024):
+    """Читает JSON-массив или JSON Lines по частям, не загружая файл целиком"""
+    reader = codecs.getreader('utf-8-sig')(stream)
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, in_array = '', 0, False, None
+
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ',')):
+            pos += 1
+        if in_array is None and pos < len(buffer):
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+                continue
+        if in_array and pos < len(buffer) and buffer[pos] == ']':
+            return
+        if pos >= len(buffer) and eof:
+            if in_array:
+                raise ParseError("Некорректный JSON: массив не закрыт.")
+            return
+        try:
+            if pos >= len(buffer):
+                raise ValueError
+            row, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            if eof:
+                raise ParseError("Некорректный JSON.")
+            chunk = reader.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield row
+
+
+def iter_uploaded_rows(request):
+    """Строки из загруженного файла (multipart, поле file) или из тела запроса"""
+    content_type = request.content_type.split(';')[0].strip().lower()
+    if content_type.startswith('multipart/'):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ParseError("Не передан файл (поле file).")
+        name = (upload.name or '').lower()
+        is_csv = name.endswith('.csv') or upload.content_type in CSV_CONTENT_TYPES
+        stream = upload
+    else:
+        is_csv = content_type in CSV_CONTENT_TYPES
+        stream = request.stream
+        if stream is None:
+            raise ParseError("Пустое тело запроса.")
+    return iter_csv_rows(stream) if is_csv else iter_json_rows(stream)
+
+
+class TransactionImporter:
+    """Импортирует строки пачками через bulk_create.
+
+    Сигналы post_save/pre_save при этом не срабатывают, поэтому их работа
+    выполняется здесь один раз на весь импорт: одна дельта баланса на кошелёк,
+    один UPDATE счётчика spent на каждый затронутый бюджет, одна запись свёрток
+    и одна проверка целей.
+    """
+    batch_size = 500
+
+    amount_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+    date_field = serializers.DateField()
+    comments_field = serializers.CharField(allow_blank=True, allow_null=True, required=False)
+
+    def __init__(self, model, user, using=None):
+        self.model = model
+        self.user = user
+        self.using = using or shard_for(user)
+        self.wallet = user.wallet
+        self.sign = -1 if model is Expense else 1
+
+        categories = list(Category.objects.db_manager(self.using).filter(user=user))
+        self.categories_by_id = {category.id: category for category in categories}
+        self.categories_by_name = {category.name: category for category in categories}
+
+        self.budgets = {}
+        if model is Expense:
+            for budget in Budget.objects.db_manager(self.using).filter(user=user).order_by('pk'):
+                self.budgets.setdefault(budget.category_id, []).append(budget)
+        self.budget_added = {}
+
+    def resolve_category(self, value):
+        if isinstance(value, str):
+            value = value.strip()
+        category = None
+        if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+            category = self.categories_by_id.get(int(value))
+        if category is None and isinstance(value, str):
+            category = self.categories_by_name.get(value)
+        if category is None:
+            raise serializers.ValidationError("Вы можете выбрать только созданные категории.")
+        return category
+
+    def build(self, row):
+        if not isinstance(row, dict):
+            raise serializers.ValidationError({'non_field_errors': ["Ожидался объект с полями операции."]})
+        values, errors = {}, {}
+        for name, parse in (('amount', self.amount_field.run_validation),
+                            ('date', self.date_field.run_validation),
+                            ('category', self.resolve_category)):
+            if row.get(name) in (None, ''):
+                errors[name] = ["Обязательное поле."]
+                continue
+            try:
+                values[name] = parse(row[name])
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+        try:
+            values['comments'] = self.comments_field.run_validation(row.get('comments') or None)
+        except serializers.ValidationError as exc:
+            errors['comments'] = exc.detail
+        if errors:
+            raise serializers.ValidationError(errors)
+        return self.model(user=self.user, wallet=self.wallet, **values)
+
+    def matching_budgets(self, obj):
+        return [budget for budget in self.budgets.get(obj.category_id, ())
+                if budget.start_date <= obj.date <= budget.end_date]
+
+    def spent(self, budget):
+        return budget.spent + self.budget_added.get(budget.pk, 0)
+
+    def check_budget(self, obj):
+        """То же, что prevent_exceeding_budget, но по накопленной в памяти сумме"""
+        budgets = self.matching_budgets(obj)
+        if budgets:
+            budget = budgets[0]
+            total_expenses = self.spent(budget)
+            if total_expenses + obj.amount > budget.amount:
+                raise serializers.ValidationError(
+                    f"Добавление этих расходов превысило бы бюджетный лимит для категории {obj.category.name}. "
+                    f"Текущие расходы: {total_expenses}, Бюджет: {budget.amount}")
+        for budget in budgets:
+            self.budget_added[budget.pk] = self.budget_added.get(budget.pk, 0) + obj.amount
+
+    def run(self, rows):
+        created, errors, batch = 0, [], []
+        delta, rollup_deltas = 0, {}
+        with transaction.atomic(using=self.using):
+            for number, row in enumerate(rows, start=1):
+                try:
+                    obj = self.build(row)
+                    if self.budgets:
+                        self.check_budget(obj)
+                except serializers.ValidationError as exc:
+                    errors.append({'row': number, 'errors': exc.detail})
+                    continue
+                batch.append(obj)
+                delta += obj.amount
+                total, count = rollup_deltas.get((obj.category_id, obj.date), (0, 0))
+                rollup_deltas[(obj.category_id, obj.date)] = (total + obj.amount, count + 1)
+                if len(batch) >= self.batch_size:
+                    created += self.flush(batch)
+                    batch = []
+            created += self.flush(batch)
+
+            apply_wallet_delta(self.wallet.pk, self.sign * delta, self.using)
+            self.update_budget_counters()
+            apply_rollup_deltas(self.user.pk, self.model.rollup_kind, rollup_deltas, self.using)
+            if self.sign > 0 and created:
+                # Одна проверка целей на весь импорт, после коммита
+                schedule_goal_check(self.user.pk, self.using)
+            if created:
+                bump_user_data_version(self.user.pk, self.using)
+
+        return {'created': created, 'failed': len(errors), 'errors': errors}
+
+    def flush(self, batch):
+        if batch:
+            self.model.objects.db_manager(self.using).bulk_create(batch)
+        return len(batch)
+
+    def update_budget_counters(self):
+        for budgets in self.budgets.values():
+            for budget in budgets:
+                added = self.budget_added.get(budget.pk)
+                if not added:
+                    continue
+                Budget.objects.db_manager(self.using).filter(pk=budget.pk).update(spent=F('spent') + added)
+                total_expenses = self.spent(budget)
+                if total_expenses > budget.amount:
+                    category = self.categories_by_id[budget.category_id]
+                    print(f"Предупреждение: Превышен лимит бюджета для категории {category.name}. "
+                          f"Текущие расходы: {total_expenses}, Бюджет: {budget.amount}")
@@ -0,0 +1,19 @@
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+
+from login.benchmarks import SUITES
+
+
+class Command(BaseCommand):
+    help = "Нагрузочные замеры на временной базе: manage.py bench <набор> [параметры]"
+
+    def add_arguments(self, parser):
+        suites = parser.add_subparsers(dest='suite', required=True, title='наборы')
+        for name, path in SUITES.items():
+            module = import_module(path)
+            suite = suites.add_parser(name, help=(module.__doc__ or '').strip().splitlines()[0])
+            module.add_arguments(suite)
+
+    def handle(self, *args, suite, **options):
+        import_module(SUITES[suite]).run(self, **options)
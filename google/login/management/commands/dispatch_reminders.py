@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from login.reminders import dispatch_due, run_dispatcher
+from login.sharding import user_shards
+
+
+class Command(BaseCommand):
+    help = "Диспетчер напоминаний: ставит письма по наступившим next_fire_at (можно запускать несколько)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help="По умолчанию - все шарды")
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--poll-seconds', type=float, help="Пауза, когда наступивших напоминаний нет")
+        parser.add_argument('--once', action='store_true', help="Разобрать наступившие и выйти")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            databases = [options['database']] if options['database'] else user_shards()
+            fired = sum(dispatch_due(options['batch_size'], using=using) for using in databases)
+            self.stdout.write(f"Сработало напоминаний: {fired}")
+            return
+        try:
+            run_dispatcher(options['batch_size'], options['poll_seconds'], options['database'],
+                           log=lambda fired: self.stdout.write(f"Сработало напоминаний: {fired}"))
+        except KeyboardInterrupt:
+            self.stdout.write("Диспетчер остановлен")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from login.outbox import drain_outbox
+from login.sharding import user_shards
+
+
+class Command(BaseCommand):
+    help = "Отправляет письма из EmailOutbox, которым пришёл срок (для cron без воркера Celery)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help="По умолчанию - все шарды")
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--max-batches', type=int)
+
+    def handle(self, *args, **options):
+        for using in [options['database']] if options['database'] else user_shards():
+            totals = drain_outbox(options['batch_size'], options['max_batches'], using)
+            self.stdout.write(f"{using}: отправлено: {totals['sent']}, отложено: {totals['retried']}, "
+                              f"не доставлено: {totals['failed']}")
@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from login.sharding import hashed_shard, move_user, shard_for, user_shards
+
+
+class Command(BaseCommand):
+    help = ("Переносит финансовые данные пользователей между шардами: на --to или, без него, "
+            "на шард по хэшу id (после изменения DATABASE_SHARDS)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="id пользователя (можно несколько)")
+        parser.add_argument('--to', dest='target', help="Алиас шарда назначения")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Только показать, кто куда переедет")
+
+    def handle(self, *args, **options):
+        shards = user_shards()
+        target = options['target']
+        if target is not None and target not in shards:
+            raise CommandError(f"{target} нет в USER_SHARDS: {', '.join(shards)}")
+
+        users = get_user_model().objects.using(DEFAULT_DB_ALIAS).order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+        moves = 0
+        for user in users.iterator():
+            destination = target or hashed_shard(user.pk, shards)
+            if destination == shard_for(user) and target is None:
+                continue
+            moves += 1
+            if options['dry_run']:
+                self.stdout.write(f"{user.pk}: {shard_for(user)} -> {destination}")
+                continue
+            moved = move_user(user, destination, options['batch_size'])
+            rows = ', '.join(f"{name}: {count}" for name, count in moved.items() if count)
+            self.stdout.write(f"{user.pk}: -> {destination} ({rows or 'нет данных'})")
+        self.stdout.write(self.style.SUCCESS(f"Пользователей к переносу: {moves}" if options['dry_run']
+                                             else f"Перенесено пользователей: {moves}"))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from login.models import Budget, Expense
+from login.sharding import user_shards
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики Budget.spent по таблице расходов (или только проверяет их с --verify)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Только сравнить счётчики, ничего не меняя")
+        parser.add_argument('--user', type=int, help="Ограничиться бюджетами одного пользователя")
+        parser.add_argument('--database', default=None, help="По умолчанию - все шарды")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        checked = mismatched = 0
+        for using in [options['database']] if options['database'] else user_shards():
+            shard_checked, shard_mismatched = self.rebuild(using, options)
+            checked += shard_checked
+            mismatched += shard_mismatched
+
+        if options['verify'] and mismatched:
+            raise CommandError(f"Расхождения в {mismatched} из {checked} бюджетов.")
+        action = "Проверено" if options['verify'] else "Пересчитано"
+        self.stdout.write(self.style.SUCCESS(f"{action} бюджетов: {checked}, исправлено: "
+                                             f"{0 if options['verify'] else mismatched}."))
+
+    def rebuild(self, using, options):
+        totals = Expense.objects.filter(
+            user=OuterRef('user'), category=OuterRef('category'),
+            date__gte=OuterRef('start_date'), date__lte=OuterRef('end_date'),
+        ).values('category').annotate(total=Sum('amount')).values('total')
+        budgets = Budget.objects.using(using).annotate(
+            actual=Coalesce(Subquery(totals), Value(0), output_field=models.DecimalField()))
+        if options['user']:
+            budgets = budgets.filter(user_id=options['user'])
+
+        checked, mismatched = 0, []
+        with transaction.atomic(using=using):
+            for budget in budgets.iterator(chunk_size=options['batch_size']):
+                checked += 1
+                if budget.spent != budget.actual:
+                    self.stdout.write(f"{using}: бюджет {budget.pk}: spent={budget.spent}, по расходам={budget.actual}")
+                    budget.spent = budget.actual
+                    mismatched.append(budget)
+            if mismatched and not options['verify']:
+                Budget.objects.using(using).bulk_update(mismatched, ['spent'], batch_size=options['batch_size'])
+        return checked, len(mismatched)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from login.models import Expense, Income, TransactionRollup
+from login.rollups import rebuild_rollups
+from login.sharding import user_shards
+
+
+class Command(BaseCommand):
+    help = "Заполняет таблицу свёрток TransactionRollup по расходам и доходам"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help="Пересчитать только указанных пользователей (можно повторять)")
+        parser.add_argument('--database', default=None, help="По умолчанию - все шарды")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = 0
+        for using in [options['database']] if options['database'] else user_shards():
+            shard_created = rebuild_rollups(
+                TransactionRollup, {Expense.rollup_kind: Expense, Income.rollup_kind: Income},
+                using=using, user_ids=options['users'], batch_size=options['batch_size'],
+            )
+            self.stdout.write(f"{using}: создано строк свёрток: {shard_created}")
+            created += shard_created
+        self.stdout.write(self.style.SUCCESS(f"Создано строк свёрток: {created}."))
@@ -0,0 +1,32 @@
+import os
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ("Копирует базу default в файл реплики (SQLite) - локальная замена репликации; "
+            "запуск по расписанию имитирует её задержку")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--replica', default=getattr(settings, 'READ_REPLICA_ALIAS', 'replica'))
+
+    def handle(self, *args, **options):
+        source, replica = connections[options['database']], connections[options['replica']]
+        if source.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("Копирование файлом - только для SQLite; у других СУБД реплику ведёт сама СУБД.")
+        target = str(replica.settings_dict['NAME'])
+        if os.path.abspath(str(source.settings_dict['NAME'])) == os.path.abspath(target):
+            raise CommandError(f"У {options['replica']} тот же файл, что у {options['database']}: "
+                               f"задайте DATABASE_REPLICA_NAME.")
+
+        replica.close()
+        source.ensure_connection()
+        # Онлайн-копия через backup API: писатели default не блокируются на всё время копирования
+        with sqlite3.connect(target) as destination:
+            source.connection.backup(destination)
+        destination.close()
+        self.stdout.write(self.style.SUCCESS(f"Реплика {target} обновлена."))
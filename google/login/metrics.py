@@ -0,0 +1,193 @@
+"""Гистограммы времени запросов и их выдача в текстовом формате Prometheus.
+
+Данные живут в памяти процесса: каждый воркер (gunicorn, uvicorn) отдаёт на
+/metrics свои значения, Prometheus собирает их с каждого экземпляра отдельно.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .cache import stats as cache_stats
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250)
+
+
+class Histogram:
+    """Накопительная гистограмма с метками (как prometheus_client.Histogram)"""
+
+    def __init__(self, name, documentation, labelnames, buckets=TIME_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def collect(self):
+        """(метки, [(граница, накопленное число)], сумма, количество)"""
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(snapshot):
+            cumulative, running = [], 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                running += count
+                cumulative.append((bound, running))
+            yield labels, cumulative, total, running
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_DURATION = Histogram('login_request_duration_seconds', "Полное время обработки запроса",
+                             ('view', 'method', 'status'))
+DB_QUERIES = Histogram('login_request_db_queries', "Число SQL-запросов на HTTP-запрос", ('view',), QUERY_BUCKETS)
+DB_DURATION = Histogram('login_request_db_duration_seconds', "Время в базе данных на запрос", ('view',))
+SERIALIZER_DURATION = Histogram('login_request_serializer_duration_seconds',
+                                "Время сериализации и валидации DRF на запрос", ('view',))
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZER_DURATION)
+
+# Замер текущего запроса; ContextVar, чтобы работать и в потоках WSGI, и в задачах ASGI
+current_sample = ContextVar('login_request_sample', default=None)
+
+
+@contextmanager
+def serializer_timer():
+    sample = current_sample.get()
+    if sample is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample['serializer_time'] += time.perf_counter() - started
+
+
+@contextmanager
+def measuring(sample):
+    """Делает sample замером текущего запроса внутри блока"""
+    token = current_sample.set(sample)
+    try:
+        yield
+    finally:
+        current_sample.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка выполнения SQL: учитывает запрос в замере текущего запроса, если он есть"""
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        sample['queries'] += 1
+        sample['db_time'] += elapsed
+        if sample['sql'] is not None:
+            sample['sql'].append((context['connection'].alias, elapsed, sql))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Обработчик connection_created. Соединения у каждого потока свои, и sync-представление
+    под ASGI работает не в потоке цикла событий, поэтому обёртка ставится каждому соединению
+    при открытии, а замер она берёт из ContextVar, который asgiref передаёт в поток"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedListMixin:
+    """Учитывает время serializer.data и is_valid() в метриках текущего запроса"""
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+    def is_valid(self, *args, **kwargs):
+        with serializer_timer():
+            return super().is_valid(*args, **kwargs)
+
+
+class TimedSerializerMixin(TimedListMixin):
+    """То же для ModelSerializer; many=True создаёт ListSerializer, который не вызывает
+    .data у дочернего сериализатора, поэтому список подменяется замеряемым классом."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        serializer.__class__ = _timed_list_class(type(serializer))
+        return serializer
+
+
+_timed_list_classes = {}
+
+
+def _timed_list_class(list_class):
+    if list_class not in _timed_list_classes:
+        _timed_list_classes[list_class] = type('Timed' + list_class.__name__, (TimedListMixin, list_class), {})
+    return _timed_list_classes[list_class]
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return '+Inf' if value == float('inf') else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.append(f'# HELP {histogram.name} {histogram.documentation}')
+        lines.append(f'# TYPE {histogram.name} histogram')
+        for labels, buckets, total, count in histogram.collect():
+            pairs = [f'{name}="{_label(value)}"' for name, value in zip(histogram.labelnames, labels)]
+            for bound, cumulative in buckets:
+                bucket_labels = ','.join(pairs + [f'le="{_number(bound)}"'])
+                lines.append(f'{histogram.name}_bucket{{{bucket_labels}}} {cumulative}')
+            joined = ','.join(pairs)
+            lines.append(f'{histogram.name}_sum{{{joined}}} {total!r}')
+            lines.append(f'{histogram.name}_count{{{joined}}} {count}')
+
+    lines.append('# HELP login_response_cache_requests_total Обращения к кэшу ответов (login.cache)')
+    lines.append('# TYPE login_response_cache_requests_total counter')
+    for endpoint, counters in sorted(cache_stats.snapshot().items()):
+        for result, counter in (('hit', 'hits'), ('miss', 'misses')):
+            lines.append(f'login_response_cache_requests_total{{endpoint="{_label(endpoint)}",result="{result}"}} '
+                         f'{counters[counter]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_allowed(request):
+    """Задержки и трафик маршрутов не для анонимов: нужен заголовок Authorization: Bearer <METRICS_TOKEN>,
+    адрес из METRICS_ALLOWED_IPS или DEBUG"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return settings.DEBUG or request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+
+
+def metrics_view(request):
+    """GET /metrics для Prometheus (доступ - metrics_allowed)"""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
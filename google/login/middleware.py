@@ -0,0 +1,103 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+slow_request_logger = logging.getLogger('login.slow_requests')
+
+
+class PerformanceMiddleware:
+    """Время запроса, число и время SQL-запросов и время сериализаторов по каждому view.
+
+    Значения попадают в гистограммы login.metrics (/metrics). Если задан
+    SLOW_REQUEST_THRESHOLD_MS, запросы дольше порога пишутся в лог
+    login.slow_requests вместе с выполненным SQL.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERFORMANCE_METRICS_ENABLED', True)
+        self.slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', None)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        sample = self.start()
+        with metrics.measuring(sample):
+            response = self.get_response(request)
+        return self.finish(request, response, sample)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        sample = self.start()
+        # SQL sync-представления выполняется в другом потоке; его считает metrics.record_query
+        with metrics.measuring(sample):
+            response = await self.get_response(request)
+        return self.finish(request, response, sample)
+
+    def start(self):
+        return {'started': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'serializer_time': 0.0,
+                'sql': [] if self.slow_threshold is not None else None}
+
+    def finish(self, request, response, sample):
+        if response.streaming:
+            # Выгрузка читает базу уже после возврата из view: считаем её до конца потока
+            if response.is_async:
+                response.streaming_content = self.astream(request, response, sample, response.streaming_content)
+            else:
+                response.streaming_content = self.stream(request, response, sample, response.streaming_content)
+            return response
+        self.observe(request, response, sample)
+        return response
+
+    def stream(self, request, response, sample, content):
+        # Сервер может читать части в разных контекстах, поэтому замер ставится на каждую часть
+        content = iter(content)
+        try:
+            while True:
+                with metrics.measuring(sample):
+                    chunk = next(content, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            self.observe(request, response, sample)
+
+    async def astream(self, request, response, sample, content):
+        content = aiter(content)
+        try:
+            while True:
+                with metrics.measuring(sample):
+                    chunk = await anext(content, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            self.observe(request, response, sample)
+
+    def observe(self, request, response, sample):
+        elapsed = time.perf_counter() - sample['started']
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        metrics.REQUEST_DURATION.observe((view, request.method, str(response.status_code)), elapsed)
+        metrics.DB_QUERIES.observe((view,), sample['queries'])
+        metrics.DB_DURATION.observe((view,), sample['db_time'])
+        metrics.SERIALIZER_DURATION.observe((view,), sample['serializer_time'])
+
+        if self.slow_threshold is not None and elapsed * 1000 >= self.slow_threshold:
+            statements = '\n'.join(f'  [{alias} {duration * 1000:.2f} ms] {sql}'
+                                   for alias, duration, sql in sample['sql'])
+            slow_request_logger.warning(
+                "Медленный запрос %s %s (%s): %.1f ms, %d SQL за %.1f ms, сериализация %.1f ms\n%s",
+                request.method, request.get_full_path(), view, elapsed * 1000, sample['queries'],
+                sample['db_time'] * 1000, sample['serializer_time'] * 1000, statements)
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:14
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_budget_spent(apps, schema_editor):
+    Budget = apps.get_model('login', 'Budget')
+    Expense = apps.get_model('login', 'Expense')
+    totals = Expense.objects.filter(
+        user=OuterRef('user'), category=OuterRef('category'),
+        date__gte=OuterRef('start_date'), date__lte=OuterRef('end_date'),
+    ).values('category').annotate(total=Sum('amount')).values('total')
+    Budget.objects.using(schema_editor.connection.alias).update(
+        spent=Coalesce(Subquery(totals), Value(0), output_field=models.DecimalField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0002_finance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='spent',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='потрачено за период'),
+        ),
+        migrations.RunPython(fill_budget_spent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+
+
+def fill_rollups(apps, schema_editor):
+    # Копия пересчёта на исторических моделях: код приложения (login.rollups) меняется, миграция - нет
+    using = schema_editor.connection.alias
+    rollup_model = apps.get_model('login', 'TransactionRollup')
+    periods = {'day': F('date'), 'week': TruncWeek('date'), 'month': TruncMonth('date'), 'year': TruncYear('date')}
+    for kind, model_name in (('expense', 'Expense'), ('income', 'Income')):
+        rows = apps.get_model('login', model_name).objects.using(using)
+        for granularity, period in periods.items():
+            groups = rows.values('user_id', 'category_id', period_start=period).annotate(
+                total=Sum('amount'), count=Count('id')).order_by()
+            batch = []
+            for group in groups.iterator(chunk_size=1000):
+                batch.append(rollup_model(kind=kind, granularity=granularity, **group))
+                if len(batch) >= 1000:
+                    rollup_model.objects.using(using).bulk_create(batch)
+                    batch = []
+            rollup_model.objects.using(using).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0003_budget_spent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('expense', 'Expense'), ('income', 'Income')], max_length=10)),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month'), ('year', 'Year')], max_length=5)),
+                ('period_start', models.DateField(verbose_name='начало периода')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='login.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='transactionrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'granularity', 'kind', 'period_start', 'category'), name='unique_transaction_rollup'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
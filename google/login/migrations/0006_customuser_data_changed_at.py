@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0005_customuser_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='data_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
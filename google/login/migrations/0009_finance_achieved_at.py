@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0008_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finance',
+            name='achieved_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
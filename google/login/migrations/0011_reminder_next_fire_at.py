@@ -0,0 +1,81 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:49
+
+import calendar
+from datetime import date, datetime, time, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Копия расчёта первого срабатывания из login.recurrence на момент миграции:
+# код приложения меняется, миграция - нет
+STEP_DAYS = {'daily': 1, 'weekly': 7}
+STEP_MONTHS = {'monthly': 1, 'yearly': 12}
+
+
+def _occurrence(start, recurrence, index):
+    if recurrence in STEP_DAYS:
+        return start + timedelta(days=STEP_DAYS[recurrence] * index)
+    year, month = divmod(start.month - 1 + STEP_MONTHS[recurrence] * index, 12)
+    year += start.year
+    return date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def _fire_time(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone())
+
+
+def _first_fire_at(start, recurrence, today):
+    """Первое срабатывание не раньше начала сегодняшнего дня; None - больше не сработает"""
+    if not recurrence:
+        return _fire_time(start) if start >= today else None
+    if recurrence in STEP_DAYS:
+        index = max((today - start).days // STEP_DAYS[recurrence], 0)
+    else:
+        index = max(((today.year - start.year) * 12 + today.month - start.month) // STEP_MONTHS[recurrence], 0)
+    while _occurrence(start, recurrence, index) < today:
+        index += 1
+    return _fire_time(_occurrence(start, recurrence, index))
+
+
+def fill_next_fire_at(apps, schema_editor):
+    Reminder = apps.get_model('login', 'Reminder')
+    today = timezone.localtime(timezone.now(), timezone.get_default_timezone()).date()
+    reminders = list(Reminder.objects.using(schema_editor.connection.alias).only('start_date', 'recurrence_interval'))
+    for reminder in reminders:
+        reminder.next_fire_at = _first_fire_at(reminder.start_date, reminder.recurrence_interval, today)
+    Reminder.objects.using(schema_editor.connection.alias).bulk_update(reminders, ['next_fire_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0010_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminder',
+            name='claimed_by',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='last_fired_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='next_fire_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('next_fire_at__isnull', False)), fields=['next_fire_at'], name='reminder_next_fire_idx'),
+        ),
+        migrations.RunPython(fill_next_fire_at, migrations.RunPython.noop),
+    ]
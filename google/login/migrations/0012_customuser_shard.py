@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0011_reminder_next_fire_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='shard',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
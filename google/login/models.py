@@ -1,22 +1,62 @@
-from django.db import models
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, models, connections, router
+from django.db.models import F, Q
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.contrib.auth.signals import user_logged_out
+from django.db.backends.signals import connection_created
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.utils.timezone import now
-from django.core.mail import send_mail
+
+from .authentication import forget_token, forget_user
+from .metrics import install_query_recorder
+from .oncommit import defer_per_user
+from .recurrence import first_fire_at
+from .sharding import copy_user, hashed_shard, shard_for, user_shards
 
 
 class CustomUser(AbstractUser):
     """Профиль ползователя"""
     last_name = models.CharField(max_length=30, blank=True, null=True)
     email = models.EmailField(unique=True)
+    # Растёт при любом изменении данных пользователя - ключ кэша ответов и ETag
+    data_version = models.PositiveBigIntegerField(default=0, editable=False)
+    data_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # База с финансовыми данными пользователя (login.sharding); пусто - default
+    shard = models.CharField(max_length=32, blank=True, default='', editable=False)
 
     def __str__(self):
         return self.email
 
 
+def bump_user_data_version(user_id, using=None):
+    if user_id is not None:
+        bump_users_data_version([user_id], using)
+
+
+def bump_users_data_version(user_ids, using=None):
+    """Один UPDATE на набор пользователей (для пакетных операций)"""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    directory = router.db_for_write(CustomUser)
+    if using is not None and using != directory:
+        # Данные на шарде: версия в каталоге растёт после коммита шарда, иначе параллельный
+        # запрос успел бы закэшировать старые данные под новой версией
+        for user_id in user_ids:
+            defer_per_user('data_version', user_id, lambda ids, _using: bump_users_data_version(ids, directory), using)
+        return
+    CustomUser.objects.db_manager(using).filter(pk__in=user_ids).update(data_version=F('data_version') + 1,
+                                                                         data_changed_at=now())
+    for user_id in user_ids:
+        # В кэше аутентификации лежит пользователь со старым data_version
+        forget_user(user_id, using)
+
+
 class Category(models.Model):
     """Категория"""
     name = models.CharField(max_length=50, unique=True)
@@ -36,14 +76,90 @@ class Wallet(models.Model):
         return f"Wallet of {self.user.email} - Balance: {self.balance}"
 
 
+@receiver(pre_save, sender=CustomUser)
+def keep_user_shard(sender, instance, using, raw=False, update_fields=None, **kwargs):
+    # Шард меняет только move_user; экземпляр, загруженный до переноса (кэш аутентификации), не должен его откатить
+    if raw or instance.pk is None or len(user_shards()) == 1 or (update_fields is not None and 'shard' not in update_fields):
+        return
+    shard = CustomUser.objects.using(using).filter(pk=instance.pk).values_list('shard', flat=True).first()
+    if shard is not None:
+        instance.shard = shard
+
+
+@receiver(post_save, sender=CustomUser)
+def place_user_on_shard(sender, instance, created, using, raw=False, **kwargs):
+    """Новый пользователь получает шард по хэшу id; копия строки на шарде следует за правками профиля"""
+    if raw or using != DEFAULT_DB_ALIAS:
+        return
+    if created and len(user_shards()) > 1:
+        instance.shard = hashed_shard(instance.pk)
+        CustomUser.objects.using(using).filter(pk=instance.pk).update(shard=instance.shard)
+    if shard_for(instance) != DEFAULT_DB_ALIAS:
+        copy_user(instance, instance.shard)
+
+
 @receiver(post_save, sender=CustomUser)
 def create_wallet_for_new_user(sender, instance, created, **kwargs):
     if created:
-        Wallet.objects.create(user=instance)
+        Wallet.objects.db_manager(shard_for(instance)).create(user=instance)
+
+
+@receiver(post_delete, sender=CustomUser)
+def delete_user_shard_rows(sender, instance, using, **kwargs):
+    # Каскад в default не видит строк на шарде - удаляем копию пользователя там, с её каскадом
+    shard = shard_for(instance)
+    if using == DEFAULT_DB_ALIAS and shard != DEFAULT_DB_ALIAS:
+        CustomUser.objects.using(shard).filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_cached_user(sender, instance, using, **kwargs):
+    # Смена пароля, блокировка и любые другие правки профиля
+    forget_user(instance.pk, using)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+@receiver(post_delete, sender='authtoken.Token')
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_token(instance.key)
 
 
-class Expense(models.Model):
+# SQL считается в метриках запроса (login.middleware) в любом потоке, открывшем соединение
+connection_created.connect(install_query_recorder, dispatch_uid='login.metrics.install_query_recorder')
+
+
+class TrackedTransactionMixin:
+    """Запоминает значения, загруженные из базы, чтобы не перечитывать строку при обновлении"""
+    tracked_fields = ('user_id', 'wallet_id', 'category_id', 'date', 'amount')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_state()
+        return instance
+
+    def remember_loaded_state(self):
+        if all(field in self.__dict__ for field in self.tracked_fields):
+            self._loaded_state = {field: self.__dict__[field] for field in self.tracked_fields}
+        else:
+            # Часть полей отложена (defer/only) - старые значения подгрузит pre_save
+            self._loaded_state = None
+
+    @property
+    def loaded_state(self):
+        return getattr(self, '_loaded_state', None)
+
+
+class Expense(TrackedTransactionMixin, models.Model):
     """Расходы"""
+    rollup_kind = 'expense'
+
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='expenses')
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='expenses')
     amount = models.DecimalField(verbose_name='сумма расхода', max_digits=10, decimal_places=2)
@@ -51,12 +167,20 @@ class Expense(models.Model):
     date = models.DateField()
     comments = models.TextField(blank=True, null=True, verbose_name='комментарии к расходу')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date', 'id'], name='expense_user_date_id_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='expense_user_cat_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.amount} - {self.category.name} on {self.date} - {self.user}"
 
 
-class Income(models.Model):
+class Income(TrackedTransactionMixin, models.Model):
     """Даход"""
+    rollup_kind = 'income'
+
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='incomes')
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='incomes')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -64,43 +188,262 @@ class Income(models.Model):
     date = models.DateField()
     comments = models.TextField(blank=True, null=True, verbose_name='комментарии к доходу')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date', 'id'], name='income_user_date_id_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='income_user_cat_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.amount} - {self.category.name} on {self.date}"
 
 
+class TransactionRollup(models.Model):
+    """Свёртка операций по дням, неделям, месяцам и годам для аналитики"""
+    DAY, WEEK, MONTH, YEAR = 'day', 'week', 'month', 'year'
+    GRANULARITIES = [(DAY, 'Day'), (WEEK, 'Week'), (MONTH, 'Month'), (YEAR, 'Year')]
+    KINDS = [('expense', 'Expense'), ('income', 'Income')]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='rollups')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='rollups')
+    kind = models.CharField(max_length=10, choices=KINDS)
+    granularity = models.CharField(max_length=5, choices=GRANULARITIES)
+    period_start = models.DateField(verbose_name='начало периода')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'granularity', 'kind', 'period_start', 'category'],
+                                    name='unique_transaction_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.granularity} {self.period_start}: {self.total}"
+
+    @classmethod
+    def period_start_for(cls, day, granularity):
+        if granularity == cls.WEEK:
+            return day - timedelta(days=day.weekday())
+        if granularity == cls.MONTH:
+            return day.replace(day=1)
+        if granularity == cls.YEAR:
+            return day.replace(month=1, day=1)
+        return day
+
+    @classmethod
+    def totals(cls, user, granularity, start_date=None, end_date=None, kind=None):
+        """(kind, period_start, category__name, total) за период одним запросом; kind - только один вид.
+        Периоды, в которые попадают start_date и end_date, входят целиком"""
+        rollups = cls.objects.filter(user=user, granularity=granularity, count__gt=0)
+        if kind:
+            rollups = rollups.filter(kind=kind)
+        if start_date:
+            rollups = rollups.filter(period_start__gte=cls.period_start_for(start_date, granularity))
+        if end_date:
+            rollups = rollups.filter(period_start__lte=end_date)
+        return rollups.values_list('kind', 'period_start', 'category__name', 'total').order_by(
+            'period_start', 'category__name')
+
+
+def apply_rollup_deltas(user_id, kind, deltas, using=None):
+    """Добавляет к свёрткам всех уровней дельты {(category_id, date): (сумма, количество)}.
+
+    Новые строки появляются только при положительном количестве - уменьшение
+    (удаление, перенос операции) обновляет существующие строки и поэтому
+    безопасно при каскадном удалении категории или пользователя.
+    """
+    using = using or router.db_for_write(TransactionRollup)
+    upserts, updates = {}, []
+    for (category_id, day), (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+        if count > 0:
+            for granularity, _label in TransactionRollup.GRANULARITIES:
+                key = (category_id, granularity, TransactionRollup.period_start_for(day, granularity))
+                total, rows = upserts.get(key, (0, 0))
+                upserts[key] = (total + amount, rows + count)
+        else:
+            updates.append((category_id, day, amount, count))
+
+    for category_id, day, amount, count in updates:
+        periods = Q()
+        for granularity, _label in TransactionRollup.GRANULARITIES:
+            periods |= Q(granularity=granularity, period_start=TransactionRollup.period_start_for(day, granularity))
+        TransactionRollup.objects.using(using).filter(periods, user_id=user_id, kind=kind,
+                                                     category_id=category_id).update(
+            total=F('total') + amount, count=F('count') + count)
+    if upserts:
+        upsert_rollups(user_id, kind, upserts, using)
+
+
+def upsert_rollups(user_id, kind, rows, using):
+    connection = connections[using]
+    if not connection.features.supports_update_conflicts_with_target:
+        for (category_id, granularity, period_start), (amount, count) in rows.items():
+            rollup, created = TransactionRollup.objects.using(using).get_or_create(
+                user_id=user_id, kind=kind, category_id=category_id, granularity=granularity,
+                period_start=period_start, defaults={'total': amount, 'count': count})
+            if not created:
+                TransactionRollup.objects.using(using).filter(pk=rollup.pk).update(
+                    total=F('total') + amount, count=F('count') + count)
+        return
+
+    # INSERT ... ON CONFLICT DO UPDATE (SQLite, PostgreSQL): одна команда на все уровни
+    qn = connection.ops.quote_name
+    table = qn(TransactionRollup._meta.db_table)
+    columns = ['user_id', 'category_id', 'kind', 'granularity', 'period_start', 'total', 'count']
+    conflict = ['user_id', 'granularity', 'kind', 'period_start', 'category_id']
+    items = list(rows.items())
+    batch_size = 100
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            params = []
+            for (category_id, granularity, period_start), (amount, count) in batch:
+                params += [user_id, category_id, kind, granularity, connection.ops.adapt_datefield_value(period_start),
+                           connection.ops.adapt_decimalfield_value(Decimal(str(amount)), 14, 2), count]
+            placeholders = ', '.join(['(%s)' % ', '.join(['%s'] * len(columns))] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) VALUES {placeholders} "
+                f"ON CONFLICT ({', '.join(qn(c) for c in conflict)}) DO UPDATE SET "
+                f"{qn('total')} = {table}.{qn('total')} + excluded.{qn('total')}, "
+                f"{qn('count')} = {table}.{qn('count')} + excluded.{qn('count')}",
+                params,
+            )
+
+
+def sync_rollups(instance, using=None):
+    previous = instance.loaded_state
+    if previous and (previous['user_id'], previous['category_id'], previous['date']) == (
+            instance.user_id, instance.category_id, instance.date):
+        deltas = {(instance.category_id, instance.date): (instance.amount - previous['amount'], 0)}
+        apply_rollup_deltas(instance.user_id, instance.rollup_kind, deltas, using)
+        return
+    if previous:
+        revert_rollups(instance, using)
+    apply_rollup_deltas(instance.user_id, instance.rollup_kind,
+                        {(instance.category_id, instance.date): (instance.amount, 1)}, using)
+
+
+def revert_rollups(instance, using=None):
+    previous = instance.loaded_state or {field: getattr(instance, field) for field in instance.tracked_fields}
+    apply_rollup_deltas(previous['user_id'], instance.rollup_kind,
+                        {(previous['category_id'], previous['date']): (-previous['amount'], -1)}, using)
+
+
 """фунция для обловления баланса из кошелка"""
 
 
-@receiver(post_save, sender=Income)
-def update_wallet_balance_on_income_save(sender, instance, created, **kwargs):
-    if created:
-        instance.wallet.balance += instance.amount
-        instance.wallet.save()
+def apply_wallet_delta(wallet_id, delta, using=None):
+    """Атомарно меняет баланс кошелька одним UPDATE, без чтения строки в Python"""
+    if wallet_id is None or not delta:
+        return
+    Wallet.objects.db_manager(using).filter(pk=wallet_id).update(balance=F('balance') + delta)
+
+
+def sync_wallet_balance(instance, sign, using=None):
+    """Применяет к кошельку разницу между сохранённой и загруженной версией операции.
+
+    sign = 1 для доходов и -1 для расходов.
+    """
+    previous = instance.loaded_state
+    if previous and previous['wallet_id'] == instance.wallet_id:
+        apply_wallet_delta(instance.wallet_id, sign * (instance.amount - previous['amount']), using)
     else:
-        previous = Income.objects.get(pk=instance.pk)
-        difference = instance.amount - previous.amount
-        instance.wallet.balance += difference
-        instance.wallet.save()
+        if previous:
+            apply_wallet_delta(previous['wallet_id'], -sign * previous['amount'], using)
+        apply_wallet_delta(instance.wallet_id, sign * instance.amount, using)
+
+
+def revert_wallet_balance(instance, sign, using=None):
+    previous = instance.loaded_state or {'wallet_id': instance.wallet_id, 'amount': instance.amount}
+    apply_wallet_delta(previous['wallet_id'], -sign * previous['amount'], using)
+
+
+def achieve_financial_goals(user_id, using=None):
+    """Одним UPDATE отмечает цели, которые покрывает текущий баланс; возвращает только что достигнутые"""
+    balance = Wallet.objects.filter(user_id=user_id).values('balance')[:1]
+    # Метка времени отделяет цели, достигнутые этим UPDATE, от достигнутых раньше или параллельно
+    achieved_at = now()
+    goals = Finance.objects.db_manager(using)
+    updated = goals.filter(user_id=user_id, is_achieved=False, target_amount__lte=models.Subquery(balance)).update(
+        is_achieved=True, achieved_at=achieved_at)
+    if not updated:
+        return []
+    bump_user_data_version(user_id, using)
+    return list(goals.filter(user_id=user_id, achieved_at=achieved_at).select_related('user'))
+
+
+def check_goals(user_ids, using=None):
+    for user_id in user_ids:
+        notify_achieved_goals(achieve_financial_goals(user_id, using))
+
+
+def schedule_goal_check(user_id, using=None):
+    """Проверка целей после коммита, одна на пользователя за транзакцию"""
+    defer_per_user('goal_check', user_id, check_goals, using or router.db_for_write(Finance))
+
+
+def notify_achieved_goals(goals):
+    from .outbox import enqueue_email
+
+    for goal in goals:
+        enqueue_email(
+            'Финансовая цель достигнута!',
+            f"Поздравляем! Вы достигли своей финансовой цели: {goal.name}.",
+            [goal.user.email],
+            from_email='money@example.com',
+            dedupe_key=f'goal-achieved:{goal.pk}',
+            using=goal._state.db,
+        )
+        print(f"Уведомление: достигнута финансовая цель '{goal.name}'.")
+
+
+@receiver(pre_save, sender=Income)
+@receiver(pre_save, sender=Expense)
+def load_previous_transaction_state(sender, instance, using, **kwargs):
+    # Экземпляр не из from_db (или с отложенными полями) - читаем старую версию до записи
+    if instance.pk is None or instance.loaded_state is not None:
+        return
+    instance._loaded_state = sender._base_manager.using(using).filter(pk=instance.pk).values(
+        *sender.tracked_fields).first()
+
 
-    # Check if any financial goals are achieved
-    for goal in instance.user.financial_goals.filter(is_achieved=False):
-        goal.check_goal_achievement()
+@receiver(post_save, sender=Income)
+def update_wallet_balance_on_income_save(sender, instance, created, using, **kwargs):
+    sync_wallet_balance(instance, 1, using)
+    sync_rollups(instance, using)
+    instance.remember_loaded_state()
+    schedule_goal_check(instance.user_id, using)
 
 
 @receiver(post_save, sender=Expense)
-def update_wallet_balance_on_expense_save(sender, instance, created, **kwargs):
-    if created:
-        instance.wallet.balance -= instance.amount
-        instance.wallet.save()
-    else:
-        previous = Expense.objects.get(pk=instance.pk)
-        difference = previous.amount - instance.amount
-        instance.wallet.balance += difference
-        instance.wallet.save()
+def update_wallet_balance_on_expense_save(sender, instance, created, using, **kwargs):
+    previous = instance.loaded_state
+    sync_wallet_balance(instance, -1, using)
+    sync_budget_spent(instance, using)
+    sync_rollups(instance, using)
+    instance.remember_loaded_state()
+
+    # Новый расход только уменьшает баланс; цели могут стать достижимыми лишь при уменьшении
+    # или переносе уже существующего
+    if previous and (previous['wallet_id'] != instance.wallet_id or instance.amount < previous['amount']):
+        schedule_goal_check(instance.user_id, using)
+
+
+@receiver(post_delete, sender=Income)
+def update_wallet_balance_on_income_delete(sender, instance, using, **kwargs):
+    revert_wallet_balance(instance, 1, using)
+    revert_rollups(instance, using)
 
-    # Check if any financial goals are achieved
-    for goal in instance.user.financial_goals.filter(is_achieved=False):
-        goal.check_goal_achievement()
+
+@receiver(post_delete, sender=Expense)
+def update_wallet_balance_on_expense_delete(sender, instance, using, **kwargs):
+    revert_wallet_balance(instance, -1, using)
+    revert_budget_spent(instance, using)
+    revert_rollups(instance, using)
+    schedule_goal_check(instance.user_id, using)
 
 
 class Budget(models.Model):
@@ -110,6 +453,13 @@ class Budget(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='установленный бюджет')
     start_date = models.DateField(verbose_name='начало периода')
     end_date = models.DateField(verbose_name='конец периода')
+    spent = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False,
+                                verbose_name='потрачено за период')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'category', 'start_date', 'end_date'], name='budget_user_cat_period_idx'),
+        ]
 
     def __str__(self):
         return f"{self.amount} for {self.category.name} from {self.start_date} to {self.end_date}"
@@ -118,28 +468,83 @@ class Budget(models.Model):
         if self.start_date > self.end_date:
             raise ValidationError(_('Дата начала не может быть позже даты окончания.'))
 
+    def calculate_spent(self, using=None):
+        return Expense.objects.db_manager(using or self._state.db).filter(
+            user_id=self.user_id, category_id=self.category_id, date__gte=self.start_date, date__lte=self.end_date,
+        ).aggregate(total=models.Sum('amount'))['total'] or 0
+
+    def status(self, as_of):
+        """Исполнение бюджета на дату as_of из уже посчитанного spent - без запросов к расходам.
+        Темп - потрачено на прошедший день периода, прогноз - при том же темпе до конца периода."""
+        cent = Decimal('0.01')
+        period_days = (self.end_date - self.start_date).days + 1
+        elapsed = min(max((as_of - self.start_date).days + 1, 0), period_days)
+        spent = Decimal(self.spent)
+        burn_rate = spent / elapsed if elapsed else Decimal(0)
+        projected = burn_rate * period_days if elapsed else spent
+        return {
+            'spent': spent.quantize(cent),
+            'remaining': (self.amount - spent).quantize(cent),
+            'percent_used': (spent / self.amount * 100).quantize(cent) if self.amount else None,
+            'period_days': period_days,
+            'days_elapsed': elapsed,
+            'daily_burn_rate': burn_rate.quantize(cent),
+            'projected_spent': projected.quantize(cent),
+            'on_track': projected <= self.amount,
+        }
+
+
+def find_budget(user_id, category_id, day, using=None):
+    return Budget.objects.db_manager(using).filter(user_id=user_id, category_id=category_id, start_date__lte=day,
+                                                   end_date__gte=day).first()
+
+
+def apply_budget_delta(user_id, category_id, day, delta, using=None):
+    """Сдвигает счётчик spent всех бюджетов, в период которых попадает расход"""
+    if not delta:
+        return
+    Budget.objects.db_manager(using).filter(user_id=user_id, category_id=category_id, start_date__lte=day,
+                                            end_date__gte=day).update(spent=F('spent') + delta)
+
+
+def sync_budget_spent(instance, using=None):
+    previous = instance.loaded_state
+    key = (instance.user_id, instance.category_id, instance.date)
+    if previous and (previous['user_id'], previous['category_id'], previous['date']) == key:
+        apply_budget_delta(*key, instance.amount - previous['amount'], using)
+    else:
+        if previous:
+            apply_budget_delta(previous['user_id'], previous['category_id'], previous['date'], -previous['amount'],
+                               using)
+        apply_budget_delta(*key, instance.amount, using)
+
+
+def revert_budget_spent(instance, using=None):
+    previous = instance.loaded_state or {field: getattr(instance, field) for field in instance.tracked_fields}
+    apply_budget_delta(previous['user_id'], previous['category_id'], previous['date'], -previous['amount'], using)
+
+
+@receiver(pre_save, sender=Budget)
+def calculate_budget_spent(sender, instance, using, raw=False, **kwargs):
+    # Период или категория могли измениться - пересчитываем один раз при сохранении бюджета
+    if not raw:
+        instance.spent = instance.calculate_spent(using)
+
 
 @receiver(post_save, sender=Expense)
-def check_budget_threshold(sender, instance, **kwargs):
-    budget = Budget.objects.filter(user=instance.user, category=instance.category, start_date__lte=instance.date,
-                                   end_date__gte=instance.date).first()
-    if budget:
-        total_expenses = Expense.objects.filter(user=instance.user, category=instance.category,
-                                                date__gte=budget.start_date, date__lte=budget.end_date).aggregate(total=models.Sum('amount'))['total'] or 0
-        if total_expenses > budget.amount:
-            print(f"Предупреждение: Превышен лимит бюджета для категории {instance.category.name}. Текущие расходы: {total_expenses}, Бюджет: {budget.amount}")
+def check_budget_threshold(sender, instance, using, **kwargs):
+    budget = find_budget(instance.user_id, instance.category_id, instance.date, using)
+    if budget and budget.spent > budget.amount:
+        print(f"Предупреждение: Превышен лимит бюджета для категории {instance.category.name}. Текущие расходы: {budget.spent}, Бюджет: {budget.amount}")
 
 
 @receiver(pre_save, sender=Expense)
-def prevent_exceeding_budget(sender, instance, **kwargs):
+def prevent_exceeding_budget(sender, instance, using, **kwargs):
     if instance.pk:  # Skip for updates
         return
-    budget = Budget.objects.filter(user=instance.user, category=instance.category, start_date__lte=instance.date,
-                                   end_date__gte=instance.date).first()
-    if budget:
-        total_expenses = Expense.objects.filter(user=instance.user, category=instance.category, date__gte=budget.start_date, date__lte=budget.end_date).aggregate(total=models.Sum('amount'))['total'] or 0
-        if total_expenses + instance.amount > budget.amount:
-            raise ValidationError(f"Добавление этих расходов превысило бы бюджетный лимит для категории {instance.category.name}. Текущие расходы: {total_expenses}, Бюджет: {budget.amount}")
+    budget = find_budget(instance.user_id, instance.category_id, instance.date, using)
+    if budget and budget.spent + instance.amount > budget.amount:
+        raise ValidationError(f"Добавление этих расходов превысило бы бюджетный лимит для категории {instance.category.name}. Текущие расходы: {budget.spent}, Бюджет: {budget.amount}")
 
 
 class Reminder(models.Model):
@@ -153,6 +558,17 @@ class Reminder(models.Model):
         ('monthly', 'Monthly'),
         ('yearly', 'Yearly')
     ], blank=True, null=True)
+    # Денормализованный момент следующего срабатывания (None - больше не сработает), см. reminders.py
+    next_fire_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_fired_at = models.DateTimeField(null=True, blank=True, editable=False)
+    claimed_by = models.CharField(max_length=32, blank=True, null=True, editable=False)
+    claimed_until = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_fire_at'], name='reminder_next_fire_idx',
+                         condition=Q(next_fire_at__isnull=False)),
+        ]
 
     def __str__(self):
         return self.title
@@ -166,6 +582,7 @@ class Finance(models.Model):
     start_date = models.DateField(default=now)
     end_date = models.DateField()
     is_achieved = models.BooleanField(default=False)
+    achieved_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.name} - {self.target_amount} by {self.end_date}"
@@ -175,26 +592,74 @@ class Finance(models.Model):
             raise ValidationError(_('Дата начала не может быть позже даты окончания.'))
 
     def check_goal_achievement(self):
-        if self.user.wallet.balance >= self.target_amount:
+        """Проверка одной цели; при изменении баланса цели проверяет schedule_goal_check"""
+        if not self.is_achieved and self.user.wallet.balance >= self.target_amount:
             self.is_achieved = True
-            self.save()
+            self.achieved_at = now()
+            self.save(update_fields=['is_achieved', 'achieved_at'])
             return True
         return False
 
 
 @receiver(post_save, sender=Finance)
-def check_financial_goal(sender, instance, **kwargs):
+def check_financial_goal(sender, instance, using, **kwargs):
     if instance.end_date <= now().date() and not instance.is_achieved:
         print(f"Напоминание: Финансовая цель '{instance.name}' близка к своей конечной дате.")
 
-    if instance.check_goal_achievement():
-        # Send notification (e.g., email, in-app notification)
-        send_mail(
-            'Финансовая цель достигнута!',
-            f"Поздравляем! Вы достигли своей финансовой цели: {instance.name}.",
-            'money@example.com',
-            [instance.user.email],
-            fail_silently=False,
-        )
-        print(f"Уведомление: достигнута финансовая цель '{instance.name}'.")
+    if not instance.is_achieved:
+        schedule_goal_check(instance.user_id, using)
+
+
+@receiver(post_save, sender=Wallet)
+def check_goals_on_wallet_change(sender, instance, created, using, **kwargs):
+    # Баланс, изменённый напрямую (WalletViewSet), а не через операции
+    if not created:
+        schedule_goal_check(instance.user_id, using)
+
+
+class EmailOutbox(models.Model):
+    """Исходящее письмо; отправляет login.outbox.drain_outbox (задача Celery или manage.py drain_outbox)"""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    dedupe_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    claimed_by = models.CharField(max_length=32, null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
 
+
+@receiver(pre_save, sender=Reminder)
+def schedule_reminder(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'start_date', 'recurrence_interval'} & set(update_fields)):
+        return
+    instance.next_fire_at = first_fire_at(instance.start_date, instance.recurrence_interval, instance.last_fired_at)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Wallet)
+@receiver([post_save, post_delete], sender=Expense)
+@receiver([post_save, post_delete], sender=Income)
+@receiver([post_save, post_delete], sender=Budget)
+@receiver([post_save, post_delete], sender=Reminder)
+@receiver([post_save, post_delete], sender=Finance)
+def invalidate_user_responses(sender, instance, using, **kwargs):
+    bump_user_data_version(instance.user_id, using)
@@ -0,0 +1,27 @@
+from django.db import connections, transaction
+
+
+def defer_per_user(name, user_id, handler, using):
+    """Вызывает handler(user_ids, using) один раз после коммита текущей транзакции.
+
+    Все user_id, накопленные под одним name до коммита, передаются одним набором:
+    импорт на тысячу строк или каскадное удаление дают один вызов, а не тысячу.
+    """
+    connection = connections[using]
+    pending = connection.__dict__.setdefault('deferred_per_user', {})
+    callback = pending.get(name)
+    # Колбэк пропадает вместе с откатом транзакции или точки сохранения, а вне транзакции
+    # on_commit выполняет его сразу - тогда нужен новый
+    if callback is not None and not callback.done and any(
+            func is callback for _sids, func, _robust in connection.run_on_commit):
+        callback.user_ids.add(user_id)
+        return
+
+    def run_deferred():
+        run_deferred.done = True
+        handler(sorted(run_deferred.user_ids), using)
+
+    run_deferred.user_ids = {user_id}
+    run_deferred.done = False
+    pending[name] = run_deferred
+    transaction.on_commit(run_deferred, using=using, robust=True)
@@ -0,0 +1,122 @@
+"""Исходящая почта через таблицу EmailOutbox.
+
+Письмо сначала записывается в ту же транзакцию, что и изменение данных, и
+отправляется уже после коммита воркером: зависший SMTP не держит запрос, а
+ошибка отправки не откатывает запись пользователя. Воркер забирает пачку писем
+условным UPDATE (аренда на OUTBOX_CLAIM_SECONDS), отправляет их через одно
+SMTP-соединение и откладывает неудачные с экспоненциальной задержкой.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .models import EmailOutbox
+
+
+def outbox_setting(name, default):
+    return getattr(settings, f'OUTBOX_{name}', default)
+
+
+def enqueue_email(subject, body, recipients, from_email=None, dedupe_key=None, using=None):
+    """Ставит письмо в очередь; письмо с уже известным dedupe_key повторно не ставится"""
+    enqueue_emails([EmailOutbox(subject=subject, body=body, recipients=list(recipients), from_email=from_email,
+                                dedupe_key=dedupe_key)], using)
+
+
+def enqueue_emails(messages, using=None):
+    """Ставит пачку несохранённых EmailOutbox одним INSERT и будит воркер один раз"""
+    using = using or router.db_for_write(EmailOutbox)
+    for message in messages:
+        message.from_email = message.from_email or settings.DEFAULT_FROM_EMAIL or ''
+    EmailOutbox.objects.db_manager(using).bulk_create(messages, ignore_conflicts=True)
+    transaction.on_commit(kick_outbox_worker, using=using, robust=True)
+
+
+def kick_outbox_worker():
+    from .tasks import send_outbox_emails
+
+    if not outbox_setting('KICK_WORKER', True):
+        return
+    send_outbox_emails.delay()
+
+
+def retry_delay(attempts):
+    base = outbox_setting('RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), outbox_setting('RETRY_MAX_SECONDS', 3600)))
+
+
+def claim_batch(batch_size, using):
+    """Забирает до batch_size писем, которые пора отправить и которые не держит другой воркер"""
+    current = now()
+    free = Q(claimed_until__isnull=True) | Q(claimed_until__lt=current)
+    due = EmailOutbox.objects.db_manager(using).filter(free, status=EmailOutbox.PENDING, next_attempt_at__lte=current)
+    ids = list(due.order_by('next_attempt_at', 'pk').values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    due.filter(pk__in=ids).update(
+        claimed_by=token, claimed_until=current + timedelta(seconds=outbox_setting('CLAIM_SECONDS', 300)))
+    return list(EmailOutbox.objects.db_manager(using).filter(pk__in=ids, claimed_by=token).order_by('pk'))
+
+
+def send_batch(messages, connection):
+    """Отправляет пачку через одно соединение; возвращает (отправленные, [(письмо, ошибка)])"""
+    sent, failed = [], []
+    try:
+        connection.open()
+    except Exception as exc:
+        return sent, [(message, exc) for message in messages]
+    try:
+        for message in messages:
+            email = EmailMessage(message.subject, message.body, message.from_email or None, message.recipients,
+                                 connection=connection)
+            try:
+                email.send()
+            except Exception as exc:
+                failed.append((message, exc))
+                # Соединение после ошибки может быть в неизвестном состоянии - следующее письмо откроет новое
+                connection.close()
+            else:
+                sent.append(message)
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def drain_outbox(batch_size=None, max_batches=None, using=None, connection=None):
+    """Отправляет все письма, которым пришёл срок; возвращает счётчики sent/retried/failed"""
+    using = using or router.db_for_write(EmailOutbox)
+    batch_size = batch_size or outbox_setting('BATCH_SIZE', 100)
+    max_attempts = outbox_setting('MAX_ATTEMPTS', 8)
+    totals = {'sent': 0, 'retried': 0, 'failed': 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        messages = claim_batch(batch_size, using)
+        if not messages:
+            break
+        batches += 1
+        sent, failed = send_batch(messages, connection or get_connection(fail_silently=False))
+
+        current = now()
+        EmailOutbox.objects.db_manager(using).filter(pk__in=[message.pk for message in sent]).update(
+            status=EmailOutbox.SENT, sent_at=current, claimed_by=None, claimed_until=None, last_error='')
+        for message, exc in failed:
+            message.attempts += 1
+            message.last_error = f'{type(exc).__name__}: {exc}'[:2000]
+            message.claimed_by = message.claimed_until = None
+            if message.attempts >= max_attempts:
+                message.status = EmailOutbox.FAILED
+                totals['failed'] += 1
+            else:
+                message.next_attempt_at = current + retry_delay(message.attempts)
+                totals['retried'] += 1
+        EmailOutbox.objects.db_manager(using).bulk_update(
+            [message for message, _exc in failed],
+            ['attempts', 'last_error', 'claimed_by', 'claimed_until', 'status', 'next_attempt_at'])
+        totals['sent'] += len(sent)
+    return totals
@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Постраничная выдача операций по ключу (date, id), от новых к старым.
+
+    Курсор хранит позицию последней выданной строки, поэтому следующая страница
+    читается по индексу (user, date, id) без OFFSET и не сдвигается, когда
+    пользователь добавляет новые операции во время просмотра.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'TRANSACTIONS_PAGE_SIZE', 100)
+        self.max_page_size = getattr(settings, 'TRANSACTIONS_MAX_PAGE_SIZE', 500)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            return date.fromisoformat(payload['d']), int(payload['i']), bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse=False):
+        # row - модель или именованный кортеж из values_list (быстрый путь, login.fastread)
+        payload = {'d': row.date.isoformat(), 'i': row.id}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        reverse = bool(cursor and cursor[2])
+        if cursor:
+            day, pk, _reverse = cursor
+            # Отдельное условие по date задаёт диапазон по индексу, OR лишь отсекает строки той же даты
+            if reverse:
+                queryset = queryset.filter(Q(date__gt=day) | Q(pk__gt=pk), date__gte=day)
+            else:
+                queryset = queryset.filter(Q(date__lt=day) | Q(pk__lt=pk), date__lte=day)
+        queryset = queryset.order_by('date', 'pk') if reverse else queryset.order_by('-date', '-pk')
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_link = self.previous_link = None
+        if rows:
+            if has_more or reverse:
+                self.next_link = self.encode_cursor(rows[-1])
+            if (has_more and reverse) or (cursor and not reverse):
+                self.previous_link = self.encode_cursor(rows[0], reverse=True)
+        elif reverse:
+            # Перед первой страницей ничего нет - возвращаем на начало списка
+            self.next_link = remove_query_param(self.base_url, self.cursor_query_param)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_link,
+            'previous': self.previous_link,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,65 @@
+"""Даты повторения напоминаний.
+
+Каждое срабатывание считается от start_date, а не от предыдущего срабатывания:
+ежемесячное напоминание на 31-е в феврале срабатывает 28-го (29-го в високосный
+год), но в марте снова 31-го; ежегодное на 29 февраля в невисокосные годы
+срабатывает 28 февраля.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+STEP_DAYS = {'daily': 1, 'weekly': 7}
+STEP_MONTHS = {'monthly': 1, 'yearly': 12}
+
+
+def add_months(start, months):
+    """start + months месяцев; день обрезается по последнему дню месяца"""
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    return date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def occurrence(start, recurrence, index):
+    """Дата index-го срабатывания (0 - сама start_date)"""
+    if recurrence in STEP_DAYS:
+        return start + timedelta(days=STEP_DAYS[recurrence] * index)
+    return add_months(start, STEP_MONTHS[recurrence] * index)
+
+
+def fire_time(day):
+    """Момент срабатывания: начало дня в часовом поясе проекта"""
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_default_timezone())
+
+
+def next_fire_at(start, recurrence, after, inclusive=False):
+    """Первое срабатывание позже after (или не раньше, если inclusive); None - больше не сработает"""
+    if isinstance(start, datetime):
+        start = start.date()
+    after_day = timezone.localtime(after, timezone.get_default_timezone()).date()
+    if not recurrence:
+        fire_at = fire_time(start)
+        return fire_at if fire_at > after or (inclusive and fire_at == after) else None
+
+    if recurrence in STEP_DAYS:
+        index = max((after_day - start).days // STEP_DAYS[recurrence], 0)
+    else:
+        months = (after_day.year - start.year) * 12 + after_day.month - start.month
+        index = max(months // STEP_MONTHS[recurrence], 0)
+    # Оценка снизу; дальше не больше пары шагов
+    while True:
+        fire_at = fire_time(occurrence(start, recurrence, index))
+        if fire_at > after or (inclusive and fire_at == after):
+            return fire_at
+        index += 1
+
+
+def first_fire_at(start, recurrence, last_fired_at=None, current=None):
+    """Срабатывание для нового или изменённого напоминания: пропущенные до сегодняшнего дня
+    повторы не догоняются, срабатывание на сегодня выполняется, но не второй раз"""
+    current = current or timezone.now()
+    today = fire_time(timezone.localtime(current, timezone.get_default_timezone()).date())
+    if last_fired_at is not None and last_fired_at >= today:
+        return next_fire_at(start, recurrence, last_fired_at)
+    return next_fire_at(start, recurrence, today, inclusive=True)
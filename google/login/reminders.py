@@ -0,0 +1,93 @@
+"""Срабатывание напоминаний.
+
+У каждого напоминания хранится next_fire_at (частичный индекс по непустым
+значениям), поэтому диспетчер читает только наступившие строки, а не всю
+таблицу. Пачка забирается условным UPDATE с арендой на REMINDER_CLAIM_SECONDS:
+несколько диспетчеров работают параллельно и не берут одни и те же строки, а
+письмо со срабатыванием ставится в EmailOutbox с dedupe_key напоминания и
+момента, так что даже после истёкшей аренды повторного письма не будет.
+"""
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .models import EmailOutbox, Reminder, bump_users_data_version
+from .outbox import enqueue_emails
+from .recurrence import next_fire_at
+from .sharding import user_shards
+
+
+def reminder_setting(name, default):
+    return getattr(settings, f'REMINDER_{name}', default)
+
+
+def claim_due(batch_size, using, current=None):
+    """Забирает до batch_size наступивших напоминаний, которые не держит другой диспетчер"""
+    current = current or now()
+    free = Q(claimed_until__isnull=True) | Q(claimed_until__lt=current)
+    due = Reminder.objects.db_manager(using).filter(free, next_fire_at__lte=current)
+    ids = list(due.order_by('next_fire_at', 'pk').values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return None, []
+    token = uuid.uuid4().hex
+    due.filter(pk__in=ids).update(
+        claimed_by=token, claimed_until=current + timedelta(seconds=reminder_setting('CLAIM_SECONDS', 300)))
+    return token, list(Reminder.objects.db_manager(using).filter(
+        pk__in=ids, claimed_by=token).select_related('user'))
+
+
+def fire_reminders(token, reminders, using, current=None):
+    """Ставит письма и переносит next_fire_at на следующее будущее срабатывание
+    (пропущенные за время простоя повторы не догоняются)"""
+    current = current or now()
+    with transaction.atomic(using=using):
+        owned = set(Reminder.objects.db_manager(using).filter(
+            pk__in=[reminder.pk for reminder in reminders], claimed_by=token).values_list('pk', flat=True))
+        reminders = [reminder for reminder in reminders if reminder.pk in owned]
+        enqueue_emails([EmailOutbox(
+            subject=f'Напоминание: {reminder.title}',
+            body=reminder.description,
+            recipients=[reminder.user.email],
+            dedupe_key=f'reminder:{reminder.pk}:{reminder.next_fire_at.isoformat()}',
+        ) for reminder in reminders], using)
+        for reminder in reminders:
+            reminder.last_fired_at = reminder.next_fire_at
+            reminder.next_fire_at = next_fire_at(reminder.start_date, reminder.recurrence_interval, current)
+            reminder.claimed_by = reminder.claimed_until = None
+        Reminder.objects.db_manager(using).bulk_update(
+            reminders, ['last_fired_at', 'next_fire_at', 'claimed_by', 'claimed_until'])
+        # bulk_update не шлёт сигналов - next_fire_at виден в API, сбрасываем кэш ответов сами
+        bump_users_data_version([reminder.user_id for reminder in reminders], using)
+    return len(reminders)
+
+
+def dispatch_due(batch_size=None, max_batches=None, using=None):
+    """Срабатывает все наступившие напоминания; возвращает их число"""
+    using = using or router.db_for_write(Reminder)
+    batch_size = batch_size or reminder_setting('BATCH_SIZE', 100)
+    fired = batches = 0
+    while max_batches is None or batches < max_batches:
+        token, reminders = claim_due(batch_size, using)
+        if not reminders:
+            break
+        batches += 1
+        fired += fire_reminders(token, reminders, using)
+    return fired
+
+
+def run_dispatcher(batch_size=None, poll_seconds=None, using=None, stop=None, log=None):
+    """Долгоживущий цикл: разбирает наступившие напоминания и спит poll_seconds, когда их нет.
+    Без using обходит все шарды"""
+    poll_seconds = reminder_setting('POLL_SECONDS', 30) if poll_seconds is None else poll_seconds
+    databases = [using] if using else user_shards()
+    while stop is None or not stop():
+        fired = sum(dispatch_due(batch_size, using=alias) for alias in databases)
+        if fired and log:
+            log(fired)
+        if not fired:
+            time.sleep(poll_seconds)
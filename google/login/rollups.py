@@ -0,0 +1,38 @@
+"""Полный пересчёт свёрток TransactionRollup по исходным таблицам операций"""
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+
+PERIOD_EXPRESSIONS = {
+    'day': lambda: F('date'),
+    'week': lambda: TruncWeek('date'),
+    'month': lambda: TruncMonth('date'),
+    'year': lambda: TruncYear('date'),
+}
+
+
+def rebuild_rollups(rollup_model, transaction_models, using='default', user_ids=None, batch_size=1000):
+    """Удаляет и заново строит свёртки (management-команда, бенчмарки, тесты). Модели
+    передаются явно; миграция 0004 держит собственную копию на исторических моделях."""
+    created = 0
+    with transaction.atomic(using=using):
+        rollups = rollup_model.objects.using(using)
+        if user_ids is not None:
+            rollups = rollups.filter(user_id__in=user_ids)
+        rollups.delete()
+
+        for kind, model in transaction_models.items():
+            rows = model.objects.using(using)
+            if user_ids is not None:
+                rows = rows.filter(user_id__in=user_ids)
+            for granularity, period in PERIOD_EXPRESSIONS.items():
+                groups = rows.values('user_id', 'category_id', period_start=period()).annotate(
+                    total=Sum('amount'), count=Count('id')).order_by()
+                batch = []
+                for group in groups.iterator(chunk_size=batch_size):
+                    batch.append(rollup_model(kind=kind, granularity=granularity, **group))
+                    if len(batch) >= batch_size:
+                        created += len(rollup_model.objects.using(using).bulk_create(batch))
+                        batch = []
+                created += len(rollup_model.objects.using(using).bulk_create(batch))
+    return created
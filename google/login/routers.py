@@ -0,0 +1,75 @@
+"""Чтения только-для-чтения эндпоинтов с реплики (settings.READ_REPLICA_ALIAS).
+
+На реплику идут только чтения внутри read_from_replica() - его включают
+аналитика, выгрузка и списки операций. Всё остальное, любые записи и чтения
+внутри открытой транзакции идут в default.
+
+Чтобы пользователь сразу видел свои изменения, его чтения остаются на default
+REPLICA_STICKY_SECONDS после последнего изменения данных
+(CustomUser.data_changed_at, его обновляют сигналы при каждой записи). Окно должно
+быть больше задержки репликации: ответы кэшируются по data_version, и ответ,
+прочитанный с отставшей реплики, остался бы в кэше под новой версией.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.timezone import now
+
+from .sharding import shard_for
+
+current_replica = ContextVar('login_read_replica', default=None)
+
+
+def replica_alias():
+    if not getattr(settings, 'READ_REPLICA_ENABLED', False):
+        return None
+    alias = getattr(settings, 'READ_REPLICA_ALIAS', None)
+    return alias if alias in settings.DATABASES and alias != DEFAULT_DB_ALIAS else None
+
+
+def recently_changed(user):
+    changed_at = getattr(user, 'data_changed_at', None)
+    sticky = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+    return changed_at is not None and changed_at > now() - timedelta(seconds=sticky)
+
+
+def replica_for(user):
+    """Алиас реплики для чтений user или None - читать из default"""
+    alias = replica_alias()
+    # Реплика - копия default; данные пользователей с других шардов читаются с их шарда
+    if alias is None or shard_for(user) != DEFAULT_DB_ALIAS or recently_changed(user):
+        return None
+    return alias
+
+
+@contextmanager
+def read_from_replica(user):
+    token = current_replica.set(replica_for(user))
+    try:
+        yield current_replica.get()
+    finally:
+        current_replica.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = current_replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия default, объекты с обеих баз - одни и те же строки
+        databases = {DEFAULT_DB_ALIAS, getattr(settings, 'READ_REPLICA_ALIAS', None)}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема приходит на реплику вместе с данными
+        if db == getattr(settings, 'READ_REPLICA_ALIAS', None):
+            return False
+        return None
@@ -1,5 +1,8 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import *
+from .metrics import TimedSerializerMixin
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from django.contrib.auth import get_user_model
 
@@ -18,62 +21,121 @@ class CustomUserSerializer(UserSerializer):
         fields = ('id', 'email', 'username', 'last_name', 'password')
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
         read_only_fields = ('user',)
 
 
-class WalletSerializer(serializers.ModelSerializer):
+class WalletSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Wallet
         fields = '__all__'
         read_only_fields = ('user',)
 
 
-class ExpenseSerializer(serializers.ModelSerializer):
+def owned_categories(request):
+    """Категории пользователя по id - один запрос на весь запрос к API (в том числе на пакет из many=True)"""
+    categories = getattr(request, '_owned_categories', None)
+    if categories is None:
+        categories = {category.pk: category for category in Category.objects.filter(user=request.user)}
+        request._owned_categories = categories
+    return categories
+
+
+class OwnedCategoryField(serializers.PrimaryKeyRelatedField):
+    """Категория текущего пользователя; принадлежность проверяется по словарю owned_categories, без запроса на строку"""
+    default_error_messages = {
+        'does_not_exist': "Вы можете выбрать только созданные категории.",
+    }
+
+    def get_queryset(self):
+        return Category.objects.filter(user=self.context['request'].user)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            # isdigit() пропустил бы '²', на котором int() падает
+            pk = int(data)
+        except ValueError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        category = owned_categories(self.context['request']).get(pk)
+        if category is None:
+            self.fail('does_not_exist', pk_value=data)
+        return category
+
+
+class ExpenseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    category = OwnedCategoryField()
+
     class Meta:
         model = Expense
         fields = '__all__'
         read_only_fields = ('user', 'wallet')
 
-    def validate_category(self, value):
-        if not Category.objects.filter(user=self.context['request'].user, id=value.id).exists():
-            raise serializers.ValidationError("Вы можете выбрать только созданные категории..")
-        return value
 
+class IncomeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    category = OwnedCategoryField()
 
-class IncomeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Income
         fields = '__all__'
         read_only_fields = ('user', 'wallet')
 
-    def validate_category(self, value):
-        if not Category.objects.filter(user=self.context['request'].user, id=value.id).exists():
-            raise serializers.ValidationError("Вы можете выбрать только созданные категории.")
-        return value
 
-
-class FinanceSerializer(serializers.ModelSerializer):
+class FinanceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Finance
         fields = '__all__'
         read_only_fields = ('user', 'is_achieved')
 
 
-class BudgetSerializer(serializers.ModelSerializer):
+class BudgetSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Budget
         fields = '__all__'
         read_only_fields = ('user',)
 
 
-class ReminderSerializer(serializers.ModelSerializer):
+class BudgetStatusSerializer(BudgetSerializer):
+    """Бюджет с исполнением на дату context['as_of']"""
+    status = serializers.SerializerMethodField()
+
+    def get_status(self, budget):
+        return budget.status(self.context['as_of'])
+
+
+class DashboardBudgetSerializer(BudgetStatusSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True)
+
+
+class GoalProgressSerializer(FinanceSerializer):
+    """Цель с прогрессом: доля текущего баланса (context['balance']) от целевой суммы, в процентах"""
+    progress = serializers.SerializerMethodField()
+
+    def get_progress(self, goal):
+        if goal.is_achieved or not goal.target_amount:
+            return Decimal('100.00')
+        share = max(min(Decimal(self.context['balance']) / goal.target_amount, 1), 0)
+        return (share * 100).quantize(Decimal('0.01'))
+
+
+class RecentTransactionSerializer(TimedSerializerMixin, serializers.Serializer):
+    kind = serializers.CharField()
+    id = serializers.IntegerField(source='transaction.pk')
+    amount = serializers.DecimalField(source='transaction.amount', max_digits=10, decimal_places=2)
+    date = serializers.DateField(source='transaction.date')
+    category = serializers.IntegerField(source='transaction.category_id')
+    category_name = serializers.CharField(source='transaction.category.name')
+    comments = serializers.CharField(source='transaction.comments', allow_null=True)
+
+
+class ReminderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Reminder
-        fields = '__all__'
+        exclude = ('claimed_by', 'claimed_until')
         read_only_fields = ('user',)
 
 
@@ -0,0 +1,218 @@
+"""Размещение финансовых данных пользователей по базам-шардам (settings.USER_SHARDS).
+
+Шард выбирается по хэшу id при регистрации и записывается в CustomUser.shard
+(пустое значение - default, там живут пользователи, созданные до шардирования).
+Каталог пользователей, токены и сессии остаются в default; на шарде лежит копия
+строки пользователя, поэтому внешние ключи и JOIN по user там работают как раньше.
+
+Запросы в представлениях не указывают базу: UserShardMiddleware запоминает
+запрос, и UserShardRouter отправляет запросы к моделям SHARDED_MODELS на шард
+request.user. Вне HTTP-запроса ту же роль играет контекст user_shard(user).
+Сигналы и проверки бюджета получают using от сохраняемого объекта и потому
+остаются на его шарде.
+"""
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+
+SHARDED_MODELS = frozenset(f'login.{name}' for name in (
+    'wallet', 'category', 'expense', 'income', 'budget', 'finance', 'reminder', 'transactionrollup',
+))
+
+# Функция без аргументов, возвращающая пользователя, чей шард сейчас используется
+current_user = ContextVar('login_shard_user', default=None)
+
+
+def user_shards():
+    return list(getattr(settings, 'USER_SHARDS', None) or [DEFAULT_DB_ALIAS])
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def is_user_model(model):
+    return model._meta.label_lower == settings.AUTH_USER_MODEL.lower()
+
+
+def hashed_shard(user_id, shards=None):
+    shards = shards or user_shards()
+    return shards[zlib.crc32(str(user_id).encode()) % len(shards)]
+
+
+def shard_for(user):
+    return getattr(user, 'shard', '') or DEFAULT_DB_ALIAS
+
+
+def shard_for_user_id(user_id):
+    """Шард по id, когда самого пользователя под рукой нет (один запрос к каталогу)"""
+    from .models import CustomUser
+
+    if len(user_shards()) == 1:
+        return DEFAULT_DB_ALIAS
+    shard = CustomUser.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id).values_list('shard', flat=True).first()
+    return shard or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def user_shard(user):
+    """Запросы без явной базы внутри блока идут на шард user (для кода вне HTTP-запросов)"""
+    token = current_user.set(lambda: user)
+    try:
+        yield shard_for(user)
+    finally:
+        current_user.reset(token)
+
+
+def current_shard():
+    get_user = current_user.get()
+    user = get_user() if get_user else None
+    if user is None or not user.is_authenticated:
+        return None
+    return shard_for(user)
+
+
+class UserShardMiddleware:
+    """Делает request.user источником шарда для UserShardRouter на время запроса"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # DRF после аутентификации записывает пользователя и в HttpRequest.user
+        token = current_user.set(lambda: request.user)
+        try:
+            return self.get_response(request)
+        finally:
+            current_user.reset(token)
+
+    async def __acall__(self, request):
+        token = current_user.set(lambda: request.user)
+        try:
+            return await self.get_response(request)
+        finally:
+            current_user.reset(token)
+
+
+class UserShardRouter:
+    """Шард для моделей SHARDED_MODELS; None (решают следующие роутеры) - для default и прочих моделей"""
+
+    def route(self, model, instance=None):
+        if len(user_shards()) == 1 or not is_sharded(model):
+            return None
+        if instance is not None and is_user_model(type(instance)):
+            # user.wallet, user.expenses и т. п.
+            shard = shard_for(instance)
+        elif instance is not None and instance._state.db:
+            shard = instance._state.db
+        else:
+            shard = current_shard()
+            if shard is None and getattr(instance, 'user_id', None) is not None:
+                shard = shard_for_user_id(instance.user_id)
+        return None if shard in (None, DEFAULT_DB_ALIAS) else shard
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Пользователь из default и его строки на шарде: на шарде есть копия пользователя
+        for user, row in ((obj1, obj2), (obj2, obj1)):
+            if is_user_model(type(user)) and is_sharded(type(row)):
+                return row._state.db == shard_for(user) or None
+        return None
+
+
+def copy_user(user, alias):
+    """Создаёт или обновляет копию строки пользователя на шарде alias (без сигналов)"""
+    model = type(user)
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    copy = model(pk=user.pk, **{field.attname: getattr(user, field.attname) for field in fields})
+    # Копия живёт на своём шарде: user.wallet от неё (goal.user.wallet) должен читать оттуда же
+    copy.shard = alias
+    model.objects.using(alias).bulk_create([copy], update_conflicts=True, unique_fields=[model._meta.pk.name],
+                                           update_fields=[field.name for field in fields])
+
+
+def delete_rows(model, alias, column, value):
+    """DELETE без загрузки строк и сигналов: перенесённые строки уже учтены на новом шарде"""
+    qn = connections[alias].ops.quote_name
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {qn(model._meta.db_table)} WHERE {qn(column)} = %s", [value])
+
+
+def copy_rows(model, source, target, user_id, remap, batch_size):
+    """Копирует строки пользователя с новыми id; remap - {поле: {старый id: новый}} для внешних ключей.
+    Возвращает {старый id: новый} для моделей, на которые ссылаются следующие"""
+    rows = list(model._base_manager.using(source).filter(user_id=user_id).order_by('pk'))
+    old_ids = [row.pk for row in rows]
+    for row in rows:
+        row.pk = None
+        row._state.adding, row._state.db = True, None
+        for field, ids in remap.items():
+            # Общие категории (user=None) не переносятся и сохраняют свой id
+            setattr(row, field, ids.get(getattr(row, field), getattr(row, field)))
+    model._base_manager.using(target).bulk_create(rows, batch_size=batch_size)
+    return dict(zip(old_ids, (row.pk for row in rows)))
+
+
+def move_user(user, target, batch_size=1000):
+    """Переносит финансовые строки пользователя со всех остальных шардов на target.
+
+    Строки получают новые id (на шарде назначения они могли быть заняты), счётчики
+    (баланс, spent, свёртки) копируются как есть. Повторный запуск переносит то, что
+    успело записаться на старый шард, пока каталог ещё указывал на него. Между базами
+    перенос не атомарен: сначала коммитится шард назначения, затем каталог, затем
+    удаление со старого шарда - сбой оставит копию, но не потеряет данные.
+    Возвращает {имя модели: перенесено строк}.
+    """
+    from .models import Budget, Category, Expense, Finance, Income, Reminder, TransactionRollup, Wallet, \
+        bump_user_data_version
+
+    user_model = type(user)
+    moved = dict.fromkeys([model.__name__ for model in (
+        Wallet, Category, Expense, Income, Budget, TransactionRollup, Finance, Reminder)], 0)
+    if target != DEFAULT_DB_ALIAS:
+        copy_user(user, target)
+    for source in user_shards():
+        if source == target or not any(model._base_manager.using(source).filter(user_id=user.pk).exists()
+                                       for model in (Wallet, Category, Finance, Reminder)):
+            continue
+        with transaction.atomic(using=source):
+            # Блокирует запись операций пользователя на время переноса: каждая из них меняет баланс
+            Wallet._base_manager.using(source).filter(user_id=user.pk).update(balance=F('balance'))
+            with transaction.atomic(using=target):
+                wallets = copy_rows(Wallet, source, target, user.pk, {}, batch_size)
+                categories = copy_rows(Category, source, target, user.pk, {}, batch_size)
+                moved['Wallet'] += len(wallets)
+                moved['Category'] += len(categories)
+                for model, remap in ((Expense, {'wallet_id': wallets, 'category_id': categories}),
+                                     (Income, {'wallet_id': wallets, 'category_id': categories}),
+                                     (Budget, {'category_id': categories}),
+                                     (TransactionRollup, {'category_id': categories}),
+                                     (Finance, {}), (Reminder, {})):
+                    moved[model.__name__] += len(copy_rows(model, source, target, user.pk, remap, batch_size))
+            if shard_for(user) != target:
+                user_model.objects.using(DEFAULT_DB_ALIAS).filter(pk=user.pk).update(shard=target)
+                user.shard = target
+            for model in (TransactionRollup, Expense, Income, Budget, Finance, Reminder, Wallet, Category):
+                delete_rows(model, source, 'user_id', user.pk)
+            if source != DEFAULT_DB_ALIAS:
+                delete_rows(user_model, source, user_model._meta.pk.column, user.pk)
+    if any(moved.values()):
+        # id строк сменились: кэш ответов и ETag должны устареть, кэш аутентификации - узнать новый шард
+        bump_user_data_version(user.pk, DEFAULT_DB_ALIAS)
+    return moved
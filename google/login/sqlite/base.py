@@ -0,0 +1,51 @@
+"""SQLite с PRAGMA при открытии соединения и выбором режима BEGIN (профиль production в settings).
+
+OPTIONS повторяют появившиеся в Django 5.1 ключи: 'init_command' - SQL через ';',
+выполняемый на каждом новом соединении, и 'transaction_mode' - DEFERRED, IMMEDIATE
+или EXCLUSIVE для BEGIN в atomic(). После обновления Django до 5.1 достаточно
+вернуть ENGINE 'django.db.backends.sqlite3'.
+
+BEGIN IMMEDIATE берёт блокировку записи в начале транзакции. При обычном BEGIN
+транзакция, которая сначала читает (проверка бюджета, select_for_update), а потом
+пишет, повышает блокировку посреди работы; если в это время пишет другое
+соединение, SQLite сразу отвечает "database is locked", не дожидаясь busy_timeout.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # В sqlite3.connect() уходят только его собственные параметры
+        kwargs.pop('init_command', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"transaction_mode для SQLite - одно из {', '.join(TRANSACTION_MODES)}")
+        return mode and mode.upper()
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in (self.settings_dict['OPTIONS'].get('init_command') or '').split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def is_usable(self):
+        # У базового бэкенда всегда True, и CONN_HEALTH_CHECKS для постоянных соединений ничего не проверял бы
+        try:
+            self.connection.execute('SELECT 1')
+        except self.Database.Error:
+            return False
+        return True
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.transaction_mode
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
@@ -0,0 +1,20 @@
+from celery import shared_task
+from django.db import DatabaseError
+
+from .outbox import drain_outbox
+from .reminders import dispatch_due
+from .sharding import user_shards
+
+
+@shared_task(ignore_result=True, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=5)
+def send_outbox_emails():
+    """Отправляет накопившиеся письма EmailOutbox (повторы отдельных писем - в самой таблице)"""
+    # Письмо лежит в базе операции, которая его поставила, - разбираем все шарды
+    totals = [drain_outbox(using=using) for using in user_shards()]
+    return {key: sum(total[key] for total in totals) for key in totals[0]}
+
+
+@shared_task(ignore_result=True, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=5)
+def dispatch_reminders():
+    """Срабатывает наступившие напоминания (несколько воркеров не пересекаются - см. reminders.py)"""
+    return sum(dispatch_due(using=using) for using in user_shards())
@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.db import connections
+
+# Тесты шардирования включают его через USER_SHARDS, поэтому shard1 должен быть объявлен и без
+# DATABASE_SHARDS. Пакет импортируется при сборке тестов, до создания тестовых баз (в памяти),
+# под любым запускателем - manage.py test, python -m django test или pytest-django.
+if 'shard1' not in settings.DATABASES:
+    settings.DATABASES['shard1'] = {'ENGINE': 'django.db.backends.sqlite3',
+                                    'NAME': settings.BASE_DIR / 'db_shard1.sqlite3'}
+    # Недостающие ключи (OPTIONS, TEST...) заполняет ConnectionHandler
+    connections.configure_settings(settings.DATABASES)
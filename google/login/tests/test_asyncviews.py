@@ -0,0 +1,60 @@
+import threading
+from datetime import date
+
+from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..asyncviews import gather_reads
+from ..cache import get_response_cache
+from ..models import Category, CustomUser, Expense, Income
+
+
+class AsyncReadsTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='async', email='async@example.com', password='password')
+        self.food = Category.objects.create(name='Async food', user=self.user)
+        self.salary = Category.objects.create(name='Async salary', user=self.user)
+        Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=10, category=self.food,
+                               date=date(2024, 5, 6))
+        Income.objects.create(user=self.user, wallet=self.user.wallet, amount=100, category=self.salary,
+                              date=date(2024, 5, 1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_response_cache().clear()
+
+    def test_loaders_run_at_the_same_time(self):
+        # По очереди второй загрузчик не дошёл бы до барьера, и первый упал бы по таймауту
+        barrier = threading.Barrier(2, timeout=5)
+
+        def load(model):
+            barrier.wait()
+            return model.objects.filter(user=self.user).count()
+
+        loaded = async_to_sync(gather_reads)({'expenses': lambda: load(Expense), 'incomes': lambda: load(Income)})
+        self.assertEqual(loaded, {'expenses': 1, 'incomes': 1})
+
+    def test_reads_inside_transaction_use_its_connection(self):
+        with transaction.atomic():
+            Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=5, category=self.food,
+                                   date=date(2024, 5, 7))
+            loaded = async_to_sync(gather_reads)({
+                'count': lambda: Expense.objects.filter(user=self.user).count(),
+                'thread': threading.get_ident,
+            })
+        self.assertEqual(loaded, {'count': 2, 'thread': threading.get_ident()})
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_concurrent_and_sequential_responses_match(self):
+        responses = {}
+        for concurrent in (True, False):
+            with override_settings(ASYNC_CONCURRENT_READS=concurrent):
+                analytics = self.client.get(reverse('expense-income-trends'), {'granularity': 'month'})
+                dashboard = self.client.get(reverse('dashboard'))
+            self.assertEqual((analytics.status_code, dashboard.status_code), (200, 200))
+            responses[concurrent] = (analytics.json(), dashboard.json())
+        self.assertEqual(responses[True], responses[False])
+        self.assertEqual(responses[True][0]['expenses'],
+                         [{'date': '2024-05-01', 'category__name': 'Async food', 'total': 10.0}])
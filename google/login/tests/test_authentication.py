@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import base_user
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ..authentication import get_auth_cache, user_key
+from ..cache import get_response_cache
+from ..models import Category, CustomUser
+
+
+@override_settings(AUTH_CACHE_ALLOW_LOCAL=True)
+class CachedAuthenticationTestCase(TestCase):
+    def setUp(self):
+        get_auth_cache().clear()
+        get_response_cache().clear()
+        self.user = CustomUser.objects.create_user(username='cached', email='cached@example.com', password='password')
+        self.category = Category.objects.create(name='Cached food', user=self.user)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def basic(self, password='password'):
+        return 'Basic ' + base64.b64encode(f'cached:{password}'.encode()).decode()
+
+    def test_token_lookup_is_cached(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        etag = self.client.get(reverse('category_list'))['ETag']
+        # Токен и пользователь уже в кэше, ответ не изменился - база не нужна вовсе
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('category_list'), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_password_hash_is_checked_once(self):
+        self.client.credentials(HTTP_AUTHORIZATION=self.basic())
+        with mock.patch.object(base_user, 'check_password', wraps=base_user.check_password) as check:
+            for _ in range(3):
+                self.assertEqual(self.client.get(reverse('category_list')).status_code, 200)
+        self.assertEqual(check.call_count, 1)
+
+    def test_wrong_password_is_never_cached(self):
+        self.client.credentials(HTTP_AUTHORIZATION=self.basic('wrong'))
+        for _ in range(2):
+            self.assertIn(self.client.get(reverse('category_list')).status_code, (401, 403))
+
+    def test_password_change_invalidates_credentials(self):
+        self.client.credentials(HTTP_AUTHORIZATION=self.basic())
+        self.assertEqual(self.client.get(reverse('category_list')).status_code, 200)
+        self.user.set_password('another-password')
+        self.user.save()
+        self.assertIn(self.client.get(reverse('category_list')).status_code, (401, 403))
+        self.client.credentials(HTTP_AUTHORIZATION=self.basic('another-password'))
+        self.assertEqual(self.client.get(reverse('category_list')).status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get(reverse('category_list')).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIn(self.client.get(reverse('category_list')).status_code, (401, 403))
+
+    def test_logout_and_token_deletion(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get(reverse('category_list')).status_code, 200)
+        self.assertEqual(self.client.post(reverse('logout')).status_code, 204)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertIn(self.client.get(reverse('category_list')).status_code, (401, 403))
+
+    def test_cached_user_sees_new_data_version(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        first = self.client.get(reverse('expense_list'))
+        row = {'amount': '5.00', 'category': self.category.pk, 'date': str(date(2024, 5, 1))}
+        self.assertEqual(self.client.post(reverse('expense_list'), json.dumps(row),
+                                          content_type='application/json').status_code, 201)
+        second = self.client.get(reverse('expense_list'), headers={'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(second.data['results']), 1)
+
+    def test_process_local_cache_is_refused(self):
+        # Другие воркеры не увидели бы отзыв токена: с LocMemCache без явного разрешения кэш не работает
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with self.settings(AUTH_CACHE_ALLOW_LOCAL=False):
+            self.assertEqual(self.client.get(reverse('category_list')).status_code, 200)
+            Token.objects.filter(key=self.token.key).update(key='revoked-elsewhere')
+            self.assertIn(self.client.get(reverse('category_list')).status_code, (401, 403))
+
+    def test_cached_user_holds_no_password_hash(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get(reverse('category_list')).status_code, 200)
+        entry = get_auth_cache().get(user_key(self.user.pk))
+        self.assertNotIn('password', entry['fields'])
+        self.assertNotIn(self.user.password, repr(entry))
+        # Остальные поля дочитываются из базы
+        self.assertEqual(self.client.get(reverse('customuser-me')).data['email'], 'cached@example.com')
+
+    def test_writes_skip_refresh_when_cache_is_off(self):
+        self.client.force_authenticate(self.user)
+        row = {'amount': '5.00', 'category': self.category.pk, 'date': str(date(2024, 5, 1))}
+        for allowed, refreshes in ((True, 1), (False, 0)):
+            with self.subTest(allowed=allowed), self.settings(AUTH_CACHE_ALLOW_LOCAL=allowed), \
+                    mock.patch('login.authentication.defer_per_user') as defer:
+                self.client.post(reverse('expense_list'), json.dumps(row), content_type='application/json')
+            self.assertEqual(defer.call_count, refreshes)
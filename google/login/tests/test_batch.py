@@ -0,0 +1,63 @@
+import json
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import Category, CustomUser, Income, Wallet
+
+
+class TransactionBatchCreateTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='batch', email='batch@example.com', password='password')
+        other = CustomUser.objects.create_user(username='batch2', email='batch2@example.com', password='password')
+        self.food = Category.objects.create(name='Batch food', user=self.user)
+        self.salary = Category.objects.create(name='Batch salary', user=self.user)
+        self.foreign = Category.objects.create(name='Batch foreign', user=other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, name, payload):
+        return self.client.post(reverse(name), json.dumps(payload), content_type='application/json')
+
+    def test_list_payload_resolves_categories_once(self):
+        rows = [{'amount': '2.50', 'category': self.food.pk, 'date': '2024-05-01'} for _ in range(20)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post('expense_list', rows)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 20)
+        category_reads = [query for query in queries if 'FROM "login_category"' in query['sql']]
+        self.assertEqual(len(category_reads), 1)
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('-50.00'))
+
+    def test_foreign_category_rejects_the_whole_batch(self):
+        rows = [{'amount': '10', 'category': self.salary.pk, 'date': '2024-05-01'},
+                {'amount': '10', 'category': self.foreign.pk, 'date': '2024-05-01'}]
+        response = self.post('income_list', rows)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[1]['category'], ["Вы можете выбрать только созданные категории."])
+        self.assertFalse(Income.objects.exists())
+
+    def test_single_object_still_works(self):
+        response = self.post('income_list', {'amount': '10', 'category': str(self.salary.pk), 'date': '2024-05-01'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['category'], self.salary.pk)
+        response = self.post('expense_list', {'amount': '10', 'category': self.foreign.pk, 'date': '2024-05-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post('expense_list', {'amount': '1', 'category': 'food', 'date': '2024-05-01'})
+                         .status_code, 400)
+
+    def test_malformed_category_id_is_a_validation_error(self):
+        for value in ('²', '1.5', '', None, True, [self.food.pk]):
+            with self.subTest(value=value):
+                response = self.post('expense_list', {'amount': '1', 'category': value, 'date': '2024-05-01'})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('category', response.data)
+
+    @override_settings(TRANSACTIONS_MAX_BATCH_SIZE=2)
+    def test_batch_size_limit(self):
+        rows = [{'amount': '1', 'category': self.food.pk, 'date': '2024-05-01'}] * 3
+        self.assertEqual(self.post('expense_list', rows).status_code, 400)
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from ..benchmarks import LatencyRecorder, percentile
+from ..benchmarks.api import run_asgi, run_wsgi
+from ..benchmarks.asyncreads import MODES, run_reads
+from ..benchmarks.dataset import generate_dataset
+from ..benchmarks.outbox import send_outbox, smtp_server
+from ..benchmarks.reads import fast_path, regular_path
+from ..benchmarks.shards import create_users, run_writes
+from ..benchmarks.trends import VARIANTS, same_result
+from ..cache import get_response_cache
+from ..models import Budget, CustomUser, Expense, Income, TransactionRollup, Wallet
+
+
+class LatencyReportTestCase(SimpleTestCase):
+    def test_percentiles_use_nearest_rank(self):
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 0.05)
+        self.assertEqual(percentile(values, 99), 0.099)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_summary_counts_errors_and_total(self):
+        recorder = LatencyRecorder()
+        recorder.add('a', 0.01)
+        recorder.add('a', 0.03, ok=False)
+        recorder.add('b', 0.02)
+        rows = {row['name']: row for row in recorder.summary(duration=1.0)}
+        self.assertEqual(rows['a']['errors'], 1)
+        self.assertEqual(rows['TOTAL']['requests'], 3)
+        self.assertEqual(rows['TOTAL']['rps'], 3.0)
+
+
+class BenchHarnessTestCase(TransactionTestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        self.users = generate_dataset(users=2, transactions=80, years=1)
+
+    def test_dataset_is_consistent(self):
+        self.assertEqual(Expense.objects.count() + Income.objects.count(), 160)
+        for wallet in Wallet.objects.all():
+            incomes = sum(income.amount for income in Income.objects.filter(wallet=wallet))
+            expenses = sum(expense.amount for expense in Expense.objects.filter(wallet=wallet))
+            self.assertEqual(wallet.balance, incomes - expenses)
+        self.assertTrue(TransactionRollup.objects.exists())
+        self.assertTrue(Budget.objects.filter(spent__gt=0).exists())
+
+    def test_trend_variants_agree(self):
+        user = CustomUser.objects.get(pk=self.users[0]['id'])
+        results = [variant(user) for _name, variant in VARIANTS]
+        self.assertTrue(results[0]['months'])
+        for result in results[1:]:
+            self.assertTrue(same_result(results[0], result))
+
+    def test_fast_read_path_matches_serializer(self):
+        queryset = Expense.objects.filter(user_id=self.users[0]['id']).order_by('-date', '-id')
+        self.assertEqual(fast_path(queryset, None), regular_path(queryset, None))
+
+    def test_wsgi_and_asgi_runs_succeed(self):
+        options = {'requests': 40, 'warmup': 5, 'duration': None, 'write_ratio': 0.3, 'seed': 1,
+                   # Общая in-memory база тестов не ждёт блокировок SQLite, поэтому без параллелизма
+                   'concurrency': 1}
+        for runner in (run_wsgi, run_asgi):
+            with self.subTest(runner=runner.__name__):
+                recorder, duration = runner(self.users, options)
+                total = recorder.summary(duration)[-1]
+                self.assertEqual(total['requests'], 40)
+                self.assertEqual(total['errors'], 0, dict(recorder.errors))
+
+
+    def test_async_reads_under_asgi_load(self):
+        options = {'requests': 30, 'warmup': 3, 'seed': 1, 'concurrency': 4}
+        for mode, concurrent in MODES:
+            with self.subTest(mode=mode), self.settings(ASYNC_CONCURRENT_READS=concurrent,
+                                                       RESPONSE_CACHE_ENABLED=False):
+                recorder, duration = run_reads(self.users, options)
+                total = recorder.summary(duration)[-1]
+                self.assertEqual(total['requests'], 30)
+                self.assertEqual(total['errors'], 0, dict(recorder.errors))
+
+
+class OutboxBenchTestCase(TransactionTestCase):
+    def test_smtp_stand_in_receives_batch_over_one_connection(self):
+        with smtp_server(latency=0) as server, mock.patch('login.outbox.kick_outbox_worker'):
+            _enqueued, totals = send_outbox(5, batch_size=10)
+        self.assertEqual(totals['sent'], 5)
+        self.assertEqual((server.messages, server.connections), (5, 1))
+
+
+@override_settings(USER_SHARDS=['default', 'shard1'])
+class ShardBenchTestCase(TransactionTestCase):
+    databases = {'default', 'shard1'}
+
+    def test_writers_count_only_committed_expenses(self):
+        users = create_users(4)
+        totals, _duration = run_writes(users, seconds=0.2)
+        self.assertGreater(totals['writes'], 0)
+        written = sum(Expense.objects.using(alias).count() for alias in ('default', 'shard1'))
+        self.assertEqual(written, totals['writes'])
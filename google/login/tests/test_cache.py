@@ -0,0 +1,67 @@
+from datetime import date
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..cache import get_response_cache, stats as cache_stats
+from ..models import Budget, Category, CustomUser, Expense
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='cache', email='cache@example.com', password='password')
+        self.category = Category.objects.create(name='Cache food', user=self.user)
+        self.client = APIClient()
+        get_response_cache().clear()
+        cache_stats.reset()
+
+    def get(self, name, **params):
+        # Как при обычной аутентификации: пользователь (и data_version) читается заново на каждый запрос
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        return self.client.get(reverse(name), params)
+
+    def test_repeated_requests_are_served_from_cache(self):
+        Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=10, category=self.category,
+                               date=date(2024, 5, 1))
+        self.assertEqual(self.get('expense_list')['X-Cache'], 'MISS')
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('expense_list'))
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(self.get('expense_list', start='1')['X-Cache'], 'MISS')
+        self.assertEqual(cache_stats.snapshot()['expense_list'], {'hits': 1, 'misses': 2})
+
+    def test_writes_and_deletes_invalidate(self):
+        self.get('expense-income-trends', start_date='2024-05-01', end_date='2024-05-31')
+        expense = Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=10, category=self.category,
+                                         date=date(2024, 5, 1))
+        response = self.get('expense-income-trends', start_date='2024-05-01', end_date='2024-05-31')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['expenses']), 1)
+
+        self.get('expense_list')
+        expense.delete()
+        response = self.get('expense_list')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'], [])
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'api.example.com'])
+    def test_pagination_links_follow_the_request_host(self):
+        for day in (1, 2):
+            Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=10, category=self.category,
+                                   date=date(2024, 5, day))
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        self.assertTrue(self.client.get(reverse('expense_list'), {'page_size': 1}).data['next']
+                        .startswith('http://testserver/'))
+        response = self.client.get(reverse('expense_list'), {'page_size': 1}, HTTP_HOST='api.example.com',
+                                   secure=True)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertTrue(response.data['next'].startswith('https://api.example.com/'))
+
+    def test_budget_list_is_per_user(self):
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='password')
+        Budget.objects.create(user=other, category=self.category, amount=10, start_date=date(2024, 5, 1),
+                              end_date=date(2024, 5, 31))
+        self.assertEqual(self.get('budget_list').data, [])
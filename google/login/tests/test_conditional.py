@@ -0,0 +1,44 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..cache import get_response_cache
+from ..models import Category, CustomUser, Expense
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='etag', email='etag@example.com', password='password')
+        self.category = Category.objects.create(name='Etag food', user=self.user)
+        self.client = APIClient()
+        get_response_cache().clear()
+
+    def get(self, name, headers=None, **params):
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        return self.client.get(reverse(name), params, headers=headers or {})
+
+    def test_unchanged_collection_answers_304_without_queries(self):
+        for name in ('category_list', 'expense_list', 'income_list', 'budget_list', 'finances_list',
+                     'reminder-list', 'expense-income-trends'):
+            response = self.get(name)
+            self.assertEqual(response.status_code, 200, name)
+            etag = response['ETag']
+            self.assertIn('Last-Modified', response)
+
+            self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse(name), headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304, name)
+            self.assertEqual(response.content, b'')
+
+    def test_change_produces_new_etag(self):
+        etag = self.get('expense_list')['ETag']
+        Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=10, category=self.category,
+                               date=date(2024, 5, 1))
+        response = self.get('expense_list', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertNotEqual(self.get('expense_list', page='2')['ETag'], response['ETag'])
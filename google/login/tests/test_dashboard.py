@@ -0,0 +1,75 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import localdate
+from rest_framework.test import APIClient
+
+from ..cache import get_response_cache
+from ..dashboard import DASHBOARD_QUERIES
+from ..models import Budget, Category, CustomUser, Expense, Finance, Income
+
+
+class DashboardTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='dash', email='dash@example.com', password='password')
+        self.food = Category.objects.create(name='Dash food', user=self.user)
+        self.salary = Category.objects.create(name='Dash salary', user=self.user)
+        self.today = localdate()
+        self.client = APIClient()
+        get_response_cache().clear()
+
+    def fill(self, size):
+        for n in range(size):
+            Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=10, category=self.food,
+                                   date=self.today - timedelta(days=n % 3))
+            Income.objects.create(user=self.user, wallet=self.user.wallet, amount=100, category=self.salary,
+                                  date=self.today - timedelta(days=40))
+            Budget.objects.create(user=self.user, category=self.food, amount=1000,
+                                  start_date=self.today - timedelta(days=n), end_date=self.today + timedelta(days=30))
+            with self.captureOnCommitCallbacks(execute=True):
+                Finance.objects.create(user=self.user, name=f'Goal {n}', target_amount=10 ** 6,
+                                       end_date=self.today + timedelta(days=365))
+
+    def dashboard(self, **params):
+        get_response_cache().clear()
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(DASHBOARD_QUERIES):
+            response = self.client.get(reverse('dashboard'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_query_count_does_not_grow_with_data(self):
+        self.fill(2)
+        small = self.dashboard()
+        self.fill(20)
+        large = self.dashboard(recent=15)
+        self.assertEqual((len(small['budgets']), len(large['budgets'])), (2, 22))
+        self.assertEqual(len(large['goals']), 22)
+        self.assertEqual(len(large['recent_transactions']), 15)
+
+    def test_contents(self):
+        self.fill(3)
+        data = self.dashboard(recent=4)
+        self.assertEqual(data['wallet']['balance'], Decimal('270.00'))
+        self.assertEqual(data['budgets'][0]['category_name'], 'Dash food')
+        self.assertTrue(all(row['status']['spent'] > 0 for row in data['budgets']))
+        self.assertEqual(data['goals'][0]['progress'], Decimal('0.03'))
+        recent = data['recent_transactions']
+        self.assertEqual([row['kind'] for row in recent], ['expense'] * 3 + ['income'])
+        self.assertEqual([row['date'] for row in recent], sorted((row['date'] for row in recent), reverse=True))
+        self.assertEqual(recent[0]['category_name'], 'Dash food')
+
+        month_start = self.today.replace(day=1)
+        spent_this_month = sum(10 for n in range(3) if self.today - timedelta(days=n % 3) >= month_start)
+        self.assertEqual(data['month']['expense_total'], spent_this_month)
+        self.assertEqual(self.client.get(reverse('dashboard'), {'recent': 0}).status_code, 400)
+
+    def test_etag_changes_with_the_day(self):
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(reverse('dashboard'))['ETag']
+        self.assertEqual(self.client.get(reverse('dashboard'), headers={'If-None-Match': etag}).status_code, 304)
+        with mock.patch('login.conditional.localdate', return_value=self.today + timedelta(days=1)):
+            self.assertEqual(self.client.get(reverse('dashboard'), headers={'If-None-Match': etag}).status_code, 200)
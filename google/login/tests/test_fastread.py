@@ -0,0 +1,56 @@
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..cache import get_response_cache
+from ..models import Category, CustomUser, Expense, Income
+
+
+class FastReadPathTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='fast', email='fast@example.com', password='password')
+        self.food = Category.objects.create(name='Fast food', user=self.user)
+        comments = [None, '', 'Обед "в кафе"', 'line\nbreak sep\x01', 'emoji 🍕 \\ / \u2028']
+        Expense.objects.bulk_create([
+            Expense(user=self.user, wallet=self.user.wallet, amount=Decimal(n * 7 + 1) / 4, category=self.food,
+                    date=date(2024, 5, 1 + n % 20), comments=comments[n % len(comments)])
+            for n in range(45)])
+        Income.objects.bulk_create([
+            Income(user=self.user, wallet=self.user.wallet, amount=Decimal('1000.5'), category=self.food,
+                   date=date(2024, 5, 1 + n), comments=comments[n % len(comments)])
+            for n in range(7)])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def pages(self, name, params):
+        get_response_cache().clear()
+        bodies, response = [], self.client.get(reverse(name), params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            bodies.append(response.content)
+            next_link = json.loads(response.content)['next']
+            if not next_link:
+                return bodies
+            response = self.client.get(next_link)
+
+    def test_output_is_byte_identical(self):
+        for name in ('expense_list', 'income_list'):
+            for params in ({'page_size': 10}, {'page_size': 4, 'start_date': '2024-05-03', 'category': self.food.pk}):
+                with self.subTest(name=name, params=params):
+                    regular = self.pages(name, params)
+                    with override_settings(TRANSACTIONS_FAST_LIST=True):
+                        fast = self.pages(name, params)
+                    self.assertEqual(fast, regular)
+                    with mock.patch('login.fastread.orjson', None), override_settings(TRANSACTIONS_FAST_LIST=True):
+                        self.assertEqual(self.pages(name, params), regular)
+
+    def test_fast_path_skips_model_instances(self):
+        with mock.patch.object(Expense, 'from_db', side_effect=AssertionError('model instance built')):
+            response = self.client.get(reverse('expense_list'), {'fast': '1', 'page_size': 5})
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertEqual(self.client.get(reverse('expense_list'), {'fast': '1', 'format': 'api'}).status_code, 200)
@@ -0,0 +1,66 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..cache import get_response_cache
+from ..models import Budget, Category, CustomUser, Expense, Wallet
+
+
+class TransactionImportTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='import', email='import@example.com', password='password')
+        self.food = Category.objects.create(name='Import food', user=self.user)
+        self.salary = Category.objects.create(name='Import salary', user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_response_cache().clear()
+
+    def balance(self):
+        return Wallet.objects.get(user=self.user).balance
+
+    def test_csv_import_reports_row_errors(self):
+        body = (
+            "amount,category,date,comments\n"
+            f"10.50,{self.food.id},2024-05-01,bread\n"
+            "5,Import food,2024-05-02,\n"
+            "abc,Import food,2024-05-03,\n"
+            "7,Unknown,2024-05-03,\n"
+        )
+        response = self.client.post(reverse('expense_import'), body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self.balance(), Decimal('-15.50'))
+
+    def test_json_array_and_lines(self):
+        rows = [{'amount': '100', 'category': 'Import salary', 'date': '2024-05-01'},
+                {'amount': 50, 'category': self.salary.id, 'date': '2024-05-02', 'comments': 'bonus'}]
+        response = self.client.post(reverse('income_import'), json.dumps(rows), content_type='application/json')
+        self.assertEqual(response.data['created'], 2)
+
+        upload = SimpleUploadedFile('statement.jsonl', '\n'.join(json.dumps(row) for row in rows).encode(),
+                                    content_type='application/x-ndjson')
+        response = self.client.post(reverse('income_import'), {'file': upload})
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(self.balance(), Decimal('300'))
+
+    def test_budget_limit_is_checked_per_row(self):
+        Budget.objects.create(user=self.user, category=self.food, amount=100,
+                              start_date=date(2024, 5, 1), end_date=date(2024, 5, 31))
+        Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=40, category=self.food,
+                               date=date(2024, 5, 1))
+        rows = [{'amount': 30, 'category': 'Import food', 'date': '2024-05-10'},
+                {'amount': 40, 'category': 'Import food', 'date': '2024-05-11'},
+                {'amount': 30, 'category': 'Import food', 'date': '2024-05-12'},
+                {'amount': 40, 'category': 'Import food', 'date': '2024-06-01'}]
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse('expense_import'), json.dumps(rows), content_type='application/json')
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2])
+        self.assertEqual(self.balance(), Decimal('-140'))
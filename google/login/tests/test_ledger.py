@@ -0,0 +1,275 @@
+import json
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.db import OperationalError, connection, transaction
+from django.core.exceptions import ValidationError
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from ..models import CustomUser, Finance, Category, Wallet, Expense, Income, Budget
+
+
+# Письмо о цели уходит воркером после коммита; он выполняется сразу в процессе
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, OUTBOX_KICK_WORKER=True)
+class FinancialGoalTestCase(TestCase):
+    def setUp(self):
+        # Иначе отложенная проверка цели из setUp так и висела бы в незакоммиченной транзакции теста
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = CustomUser.objects.create_user(username='testuser', email='test@example.com',
+                                                       password='password')
+            self.goal = Finance.objects.create(
+                user=self.user, name='Test Goal', target_amount=1000, start_date=now().date(), end_date=now().date() + timedelta(days=30)
+            )
+
+    def test_goal_creation(self):
+        self.assertEqual(self.goal.name, 'Test Goal')
+        self.assertEqual(self.goal.target_amount, 1000)
+        self.assertFalse(self.goal.is_achieved)
+
+    def income(self, amount):
+        category = Category.objects.get_or_create(name='Goal salary', user=self.user)[0]
+        return Income.objects.create(user=self.user, wallet=self.user.wallet, amount=Decimal(amount),
+                                     category=category, date=date.today())
+
+    def goal_updates(self, queries):
+        return sum(query['sql'].startswith('UPDATE "login_finance"') for query in queries)
+
+    def test_goals_are_evaluated_once_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Finance.objects.create(user=self.user, name='Second goal', target_amount=1500, end_date=date.today())
+            far = Finance.objects.create(user=self.user, name='Far goal', target_amount=10 ** 6,
+                                         end_date=date.today())
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for _ in range(4):
+                        self.income(500)
+                    # До коммита цели не трогаются
+                    self.assertFalse(Finance.objects.filter(is_achieved=True).exists())
+        self.assertEqual(self.goal_updates(queries), 1)
+        self.assertEqual(set(Finance.objects.filter(is_achieved=True).values_list('name', flat=True)),
+                         {'Test Goal', 'Second goal'})
+        self.assertIsNotNone(Finance.objects.get(name='Test Goal').achieved_at)
+        self.assertFalse(Finance.objects.get(pk=far.pk).is_achieved)
+        self.assertEqual(len(mail.outbox), 2)
+
+        # Уже достигнутые цели повторно не уведомляются
+        with self.captureOnCommitCallbacks(execute=True):
+            self.income(1)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_new_expense_does_not_check_goals(self):
+        category = Category.objects.create(name='Goal food', user=self.user)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            expense = Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=Decimal(10),
+                                             category=category, date=date.today())
+        self.assertEqual(self.goal_updates(queries), 0)
+        # Удаление расхода увеличивает баланс - проверка нужна
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            expense.delete()
+        self.assertEqual(self.goal_updates(queries), 1)
+
+    def test_rolled_back_check_is_rescheduled(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.income(2000)
+            raise ValueError
+        with self.captureOnCommitCallbacks(execute=True):
+            self.income(2000)
+        self.goal.refresh_from_db()
+        self.assertTrue(self.goal.is_achieved)
+
+    def test_import_evaluates_goals_once(self):
+        Category.objects.create(name='Goal import', user=self.user)
+        rows = [{'amount': 1, 'category': 'Goal import', 'date': '2024-05-01'}] * 1000
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('income_import'), json.dumps(rows), content_type='application/json')
+        self.assertEqual(response.data['created'], 1000)
+        self.assertEqual(self.goal_updates(queries), 1)
+        self.goal.refresh_from_db()
+        self.assertTrue(self.goal.is_achieved)
+
+
+class WalletBalanceTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='wallet', email='wallet@example.com', password='password')
+        self.wallet = self.user.wallet
+        self.category = Category.objects.create(name='Food', user=self.user)
+
+    def balance(self):
+        return Wallet.objects.get(pk=self.wallet.pk).balance
+
+    def test_income_and_expense_change_balance(self):
+        Income.objects.create(user=self.user, wallet=self.wallet, amount=100, category=self.category, date=date.today())
+        Expense.objects.create(user=self.user, wallet=self.wallet, amount=30, category=self.category, date=date.today())
+        self.assertEqual(self.balance(), Decimal('70'))
+
+    def test_update_applies_difference_without_reload(self):
+        Income.objects.create(user=self.user, wallet=self.wallet, amount=100, category=self.category, date=date.today())
+        income = Income.objects.get()
+        income.amount = Decimal('150')
+        with self.assertNumQueries(4):  # доход, кошелёк, свёртки, версия данных (цели - после коммита)
+            income.save()
+        self.assertEqual(self.balance(), Decimal('150'))
+
+        expense = Expense.objects.create(user=self.user, wallet=self.wallet, amount=40, category=self.category,
+                                         date=date.today())
+        expense.amount = Decimal('10')
+        expense.save()
+        self.assertEqual(self.balance(), Decimal('140'))
+
+    def test_update_of_unloaded_instance(self):
+        income = Income.objects.create(user=self.user, wallet=self.wallet, amount=100, category=self.category,
+                                       date=date.today())
+        Income(pk=income.pk, user=self.user, wallet=self.wallet, amount=80, category=self.category,
+               date=date.today()).save(force_update=True)
+        self.assertEqual(self.balance(), Decimal('80'))
+
+    def test_delete_reverts_balance(self):
+        income = Income.objects.create(user=self.user, wallet=self.wallet, amount=100, category=self.category,
+                                       date=date.today())
+        expense = Expense.objects.create(user=self.user, wallet=self.wallet, amount=30, category=self.category,
+                                         date=date.today())
+        expense.delete()
+        self.assertEqual(self.balance(), Decimal('100'))
+        Income.objects.filter(pk=income.pk).delete()
+        self.assertEqual(self.balance(), Decimal('0'))
+
+
+class WalletBalanceConcurrencyTestCase(TransactionTestCase):
+    writers = 16
+    rows_per_writer = 10
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='parallel', email='parallel@example.com', password='password')
+        self.wallet = self.user.wallet
+        self.category = Category.objects.create(name='Parallel', user=self.user)
+
+    def write(self, model, amount, errors):
+        try:
+            for _ in range(self.rows_per_writer):
+                for attempt in range(200):
+                    try:
+                        with transaction.atomic():
+                            model.objects.create(user=self.user, wallet=self.wallet, amount=amount,
+                                                 category=self.category, date=date.today())
+                        break
+                    except OperationalError:
+                        # SQLite держит одну блокировку на запись - повторяем транзакцию целиком
+                        threading.Event().wait(0.005)
+                else:
+                    errors.append(model)
+        finally:
+            connection.close()
+
+    def test_parallel_writers_do_not_lose_updates(self):
+        errors = []
+        threads = [
+            threading.Thread(target=self.write, args=(Income if i % 2 else Expense, Decimal('3.00'), errors))
+            for i in range(self.writers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        incomes = Income.objects.filter(wallet=self.wallet).count()
+        expenses = Expense.objects.filter(wallet=self.wallet).count()
+        self.assertEqual(incomes + expenses, self.writers * self.rows_per_writer)
+        expected = Decimal('3.00') * (incomes - expenses)
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, expected)
+
+
+class BudgetSpentCounterTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='budget', email='budget@example.com', password='password')
+        self.food = Category.objects.create(name='Budget food', user=self.user)
+        self.other = Category.objects.create(name='Budget other', user=self.user)
+        self.budget = Budget.objects.create(user=self.user, category=self.food, amount=100,
+                                            start_date=date(2024, 5, 1), end_date=date(2024, 5, 31))
+
+    def expense(self, amount, day=date(2024, 5, 10), category=None):
+        return Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=amount,
+                                      category=category or self.food, date=day)
+
+    def spent(self):
+        return Budget.objects.get(pk=self.budget.pk).spent
+
+    def test_counter_follows_create_update_delete(self):
+        expense = self.expense(40)
+        self.expense(10, day=date(2024, 6, 1))
+        self.assertEqual(self.spent(), Decimal('40'))
+
+        expense.amount = Decimal('25')
+        expense.save()
+        self.assertEqual(self.spent(), Decimal('25'))
+
+        expense.category = self.other
+        expense.save()
+        self.assertEqual(self.spent(), Decimal('0'))
+
+        expense.category = self.food
+        expense.save()
+        expense.delete()
+        self.assertEqual(self.spent(), Decimal('0'))
+
+    def test_limit_check_does_not_aggregate(self):
+        self.expense(60)
+        with self.assertRaises(ValidationError):
+            self.expense(50)
+        with self.assertNumQueries(7):  # бюджет, INSERT, кошелёк, счётчик, свёртки, порог, версия данных
+            Expense.objects.create(user=self.user, wallet_id=self.user.wallet.pk, amount=20, category=self.food,
+                                   date=date(2024, 5, 11))
+        self.assertEqual(self.spent(), Decimal('80'))
+
+    def test_budget_created_after_expenses(self):
+        self.expense(30, day=date(2024, 7, 2))
+        budget = Budget.objects.create(user=self.user, category=self.food, amount=50,
+                                       start_date=date(2024, 7, 1), end_date=date(2024, 7, 31))
+        self.assertEqual(budget.spent, Decimal('30'))
+
+    def test_status_for_all_budgets_in_one_query(self):
+        self.expense(40, day=date(2024, 5, 5))
+        self.expense(10, day=date(2024, 5, 20))
+        Budget.objects.create(user=self.user, category=self.other, amount=300,
+                              start_date=date(2024, 6, 1), end_date=date(2024, 6, 30))
+        for month in range(1, 11):
+            Budget.objects.create(user=self.user, category=self.other, amount=50,
+                                  start_date=date(2023, month, 1), end_date=date(2023, month, 28))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.assertNumQueries(1):
+            response = client.get(reverse('budget_status'), {'as_of': '2024-05-10'})
+        self.assertEqual(len(response.data), 12)
+        statuses = {row['id']: row['status'] for row in response.data}
+        self.assertEqual(statuses[self.budget.pk], {
+            'spent': Decimal('50.00'), 'remaining': Decimal('50.00'), 'percent_used': Decimal('50.00'),
+            'period_days': 31, 'days_elapsed': 10, 'daily_burn_rate': Decimal('5.00'),
+            'projected_spent': Decimal('155.00'), 'on_track': False,
+        })
+        upcoming = response.data[-1]['status']
+        self.assertEqual((upcoming['days_elapsed'], upcoming['projected_spent'], upcoming['on_track']),
+                         (0, Decimal('0.00'), True))
+
+        finished = client.get(reverse('budget_status'), {'as_of': '2024-07-01'}).data
+        self.assertEqual(finished[-2]['status']['projected_spent'], Decimal('50.00'))
+        self.assertEqual(client.get(reverse('budget_status'), {'as_of': 'soon'}).status_code, 400)
+
+    def test_rebuild_command(self):
+        self.expense(30)
+        Budget.objects.filter(pk=self.budget.pk).update(spent=999)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_budget_spent', '--verify', stdout=StringIO())
+        call_command('rebuild_budget_spent', stdout=StringIO())
+        self.assertEqual(self.spent(), Decimal('30'))
+        call_command('rebuild_budget_spent', '--verify', stdout=StringIO())
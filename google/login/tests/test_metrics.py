@@ -0,0 +1,90 @@
+import re
+from datetime import date
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .. import metrics
+from ..cache import get_response_cache
+from ..models import Category, CustomUser, Expense
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+class PerformanceMetricsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='metrics', email='metrics@example.com', password='password')
+        cls.category = Category.objects.create(name='Metrics', user=cls.user)
+        Expense.objects.bulk_create([
+            Expense(user=cls.user, wallet=cls.user.wallet, amount=5, category=cls.category, date=date(2024, 1, i))
+            for i in range(1, 11)])
+
+    def setUp(self):
+        get_response_cache().clear()
+        for histogram in metrics.HISTOGRAMS:
+            histogram.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sample(self, text, name, **labels):
+        selector = ','.join(f'{key}="{value}"' for key, value in labels.items())
+        match = re.search(rf'^{re.escape(name)}{{{re.escape(selector)}}} (\S+)$', text, re.MULTILINE)
+        self.assertIsNotNone(match, f'{name}{{{selector}}} нет в /metrics')
+        return float(match.group(1))
+
+    def test_request_timings_are_exposed(self):
+        self.assertEqual(self.client.get(reverse('expense_list')).status_code, 200)
+        text = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertEqual(self.sample(text, 'login_request_duration_seconds_count',
+                                     view='expense_list', method='GET', status='200'), 1)
+        self.assertGreater(self.sample(text, 'login_request_db_queries_sum', view='expense_list'), 0)
+        self.assertGreater(self.sample(text, 'login_request_db_duration_seconds_sum', view='expense_list'), 0)
+        self.assertGreater(self.sample(text, 'login_request_serializer_duration_seconds_sum', view='expense_list'), 0)
+        self.assertEqual(self.sample(text, 'login_request_db_queries_bucket', view='expense_list', le='+Inf'), 1)
+
+    def test_streamed_export_is_measured_to_the_end(self):
+        response = self.client.get(reverse('ledger-export'))
+        b''.join(response.streaming_content)
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertGreater(self.sample(text, 'login_request_db_queries_sum', view='ledger-export'), 0)
+
+    async def test_asgi_sync_view_queries_are_counted(self):
+        # Sync-представление под ASGI выполняет SQL не в потоке цикла событий
+        token = await Token.objects.acreate(user=self.user)
+        headers = {'Authorization': f'Token {token.key}'}
+        self.assertEqual((await self.async_client.get(reverse('expense_list'), headers=headers)).status_code, 200)
+        export = await self.async_client.get(reverse('ledger-export'), headers=headers)
+        b''.join([chunk async for chunk in export.streaming_content])
+        text = (await self.async_client.get(reverse('metrics'))).content.decode()
+
+        for view in ('expense_list', 'ledger-export'):
+            with self.subTest(view=view):
+                self.assertGreater(self.sample(text, 'login_request_db_queries_sum', view=view), 0)
+                self.assertGreater(self.sample(text, 'login_request_db_duration_seconds_sum', view=view), 0)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_requests_are_logged_with_sql(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertLogs('login.slow_requests', 'WARNING') as logs:
+            client.get(reverse('expense_list'))
+        self.assertIn('expense_list', logs.output[0])
+        self.assertIn('FROM "login_expense"', logs.output[0])
+
+    @override_settings(METRICS_TOKEN='secret', METRICS_ALLOWED_IPS=[])
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    @override_settings(METRICS_TOKEN=None, METRICS_ALLOWED_IPS=[])
+    def test_metrics_are_closed_by_default(self):
+        self.assertEqual(APIClient().get(reverse('metrics')).status_code, 403)
+        with self.settings(METRICS_ALLOWED_IPS=['10.0.0.5']):
+            self.assertEqual(APIClient().get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 200)
+            self.assertEqual(APIClient().get(reverse('metrics'), REMOTE_ADDR='10.0.0.6').status_code, 403)
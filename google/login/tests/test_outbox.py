@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from smtplib import SMTPServerDisconnected
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+
+from ..models import Category, CustomUser, EmailOutbox, Finance, Income
+from ..outbox import claim_batch, drain_outbox, enqueue_email
+
+
+class CountingBackend(BaseEmailBackend):
+    """Почтовый бэкенд для тестов: считает соединения и по желанию падает"""
+    opened = 0
+    delivered = []
+    fail_for = set()
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.fail_for:
+                raise SMTPServerDisconnected('connection dropped')
+            CountingBackend.delivered.append(message)
+        return len(messages)
+
+
+# Воркер отправки запускается после коммита и выполняется сразу в процессе
+@override_settings(EMAIL_BACKEND='login.tests.test_outbox.CountingBackend', CELERY_TASK_ALWAYS_EAGER=True,
+                   OUTBOX_KICK_WORKER=True)
+class EmailOutboxTestCase(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+        CountingBackend.delivered = []
+        CountingBackend.fail_for = set()
+
+    def enqueue(self, count, **kwargs):
+        for number in range(count):
+            enqueue_email(f'Subject {number}', 'Body', [f'user{number}@example.com'], **kwargs)
+
+    def test_batch_is_sent_over_one_connection(self):
+        self.enqueue(5)
+        self.assertEqual(drain_outbox(), {'sent': 5, 'retried': 0, 'failed': 0})
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(CountingBackend.delivered), 5)
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.SENT).exists())
+        self.assertEqual(drain_outbox()['sent'], 0)
+
+    def test_dedupe_key(self):
+        enqueue_email('Once', 'Body', ['a@example.com'], dedupe_key='same')
+        enqueue_email('Once', 'Body', ['a@example.com'], dedupe_key='same')
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+    def test_failed_message_is_retried_with_backoff(self):
+        CountingBackend.fail_for = {'user1@example.com'}
+        self.enqueue(3)
+        self.assertEqual(drain_outbox(), {'sent': 2, 'retried': 1, 'failed': 0})
+        failed = EmailOutbox.objects.get(recipients=['user1@example.com'])
+        self.assertEqual((failed.status, failed.attempts), (EmailOutbox.PENDING, 1))
+        self.assertIn('connection dropped', failed.last_error)
+        self.assertGreater(failed.next_attempt_at, now() + timedelta(seconds=20))
+
+        # Срок следующей попытки не наступил - письмо не трогается
+        self.assertEqual(drain_outbox()['retried'], 0)
+        EmailOutbox.objects.filter(pk=failed.pk).update(next_attempt_at=now())
+        drain_outbox()
+        failed.refresh_from_db()
+        self.assertEqual(failed.attempts, 2)
+        self.assertGreater(failed.next_attempt_at, now() + timedelta(seconds=50))
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_message_fails_after_max_attempts(self):
+        CountingBackend.fail_for = {'user0@example.com'}
+        self.enqueue(1)
+        drain_outbox()
+        EmailOutbox.objects.update(next_attempt_at=now())
+        self.assertEqual(drain_outbox()['failed'], 1)
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.FAILED)
+
+    @override_settings(OUTBOX_KICK_WORKER=False)
+    def test_without_broker_commit_only_enqueues(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enqueue(2)
+        self.assertEqual(CountingBackend.delivered, [])
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.PENDING).count(), 2)
+
+    def test_claimed_messages_are_not_taken_twice(self):
+        self.enqueue(4)
+        first = claim_batch(3, 'default')
+        second = claim_batch(3, 'default')
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({message.pk for message in first} & {message.pk for message in second})
+
+    def test_goal_notification_does_not_block_the_write(self):
+        CountingBackend.fail_for = {'outbox@example.com'}
+        user = CustomUser.objects.create_user(username='outbox', email='outbox@example.com', password='password')
+        category = Category.objects.create(name='Outbox salary', user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            goal = Finance.objects.create(user=user, name='Car', target_amount=100, end_date=date(2030, 1, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            Income.objects.create(user=user, wallet=user.wallet, amount=Decimal(500), category=category,
+                                  date=date.today())
+
+        goal.refresh_from_db()
+        self.assertTrue(goal.is_achieved)
+        self.assertTrue(Income.objects.filter(user=user).exists())
+        message = EmailOutbox.objects.get(dedupe_key=f'goal-achieved:{goal.pk}')
+        self.assertEqual((message.status, message.attempts), (EmailOutbox.PENDING, 1))
+
+        CountingBackend.fail_for = set()
+        EmailOutbox.objects.update(next_attempt_at=now())
+        drain_outbox()
+        self.assertEqual([sent.to for sent in CountingBackend.delivered], [['outbox@example.com']])
+        self.assertEqual(len(mail.outbox), 0)
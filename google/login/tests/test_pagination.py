@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..cache import get_response_cache
+from ..models import Category, CustomUser, Expense
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='pages', email='pages@example.com', password='password')
+        self.food = Category.objects.create(name='Pages food', user=self.user)
+        self.rent = Category.objects.create(name='Pages rent', user=self.user)
+        Expense.objects.bulk_create([
+            Expense(user=self.user, wallet=self.user.wallet, amount=1, date=date(2024, 5, 1 + i // 3),
+                    category=self.food if i % 2 else self.rent)
+            for i in range(25)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_response_cache().clear()
+
+    def walk(self, url, params=None):
+        ids, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            pages += 1
+            ids += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                return ids, pages
+            response = self.client.get(response.data['next'])
+
+    def test_pages_follow_date_and_id_order(self):
+        ids, pages = self.walk(reverse('expense_list'), {'page_size': 10})
+        expected = list(Expense.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_concurrent_inserts_do_not_shift_pages(self):
+        first = self.client.get(reverse('expense_list'), {'page_size': 10}).data
+        Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=1, category=self.food,
+                               date=date(2024, 6, 1))
+        get_response_cache().clear()
+        second = self.client.get(first['next']).data
+        seen = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(self.client.get(second['previous']).data['results'], first['results'])
+
+    def test_filters_combine_with_cursor_and_page_size_is_capped(self):
+        ids, _pages = self.walk(reverse('expense_list'), {'page_size': 2, 'category': self.food.id,
+                                                           'start_date': '2024-05-02', 'end_date': '2024-05-05'})
+        expected = Expense.objects.filter(category=self.food, date__range=(date(2024, 5, 2), date(2024, 5, 5)))
+        self.assertEqual(ids, list(expected.order_by('-date', '-id').values_list('id', flat=True)))
+        with self.settings(TRANSACTIONS_MAX_PAGE_SIZE=5):
+            self.assertEqual(len(self.client.get(reverse('expense_list'), {'page_size': 1000}).data['results']), 5)
+        self.assertEqual(self.client.get(reverse('expense_list'), {'cursor': 'broken'}).status_code, 404)
@@ -0,0 +1,144 @@
+import json
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from ..cache import get_response_cache
+from ..models import Budget, Category, CustomUser, Expense, Income, Reminder
+from ..reminders import dispatch_due
+
+# Таблицы, которые растут вместе с историей пользователя: полный проход по ним недопустим
+HOT_TABLES = {'login_expense', 'login_income', 'login_budget', 'login_transactionrollup', 'login_finance',
+              'login_reminder'}
+# SCAN <таблица или псевдоним> [USING ...]; SQLite до 3.36 писал SCAN TABLE <таблица> [AS <псевдоним>]
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+# Псевдонимы таблиц в SQL Django: "login_expense" U0, "login_expense" AS "T3"
+TABLE_ALIAS = re.compile(r'"(\w+)"\s+(?:AS\s+)?(?!(?:WHERE|INNER|LEFT|JOIN|ON|GROUP|ORDER|LIMIT|SET|USING)\b)"?(\w+)"?')
+
+
+def table_aliases(sql):
+    """{псевдоним: таблица} для горячих таблиц; подзапросы (__in, Exists) читают их под U0, U1..."""
+    return {alias: table for table, alias in TABLE_ALIAS.findall(sql) if table in HOT_TABLES}
+
+
+class QueryPlanTestCase(TestCase):
+    """Выполняет горячие пути API, снимает EXPLAIN QUERY PLAN каждого запроса и падает,
+    если какой-то из них читает таблицу операций целиком вместо поиска по индексу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='plans', email='plans@example.com', password='password')
+        other = CustomUser.objects.create_user(username='plans2', email='plans2@example.com', password='password')
+        cls.food = Category.objects.create(name='Plans food', user=cls.user)
+        cls.salary = Category.objects.create(name='Plans salary', user=cls.user)
+        other_category = Category.objects.create(name='Plans other', user=other)
+        start = date(2024, 1, 1)
+        Expense.objects.bulk_create(
+            [Expense(user=cls.user, wallet=cls.user.wallet, amount=1, category=cls.food,
+                     date=start + timedelta(days=i % 200)) for i in range(400)]
+            + [Expense(user=other, wallet=other.wallet, amount=1, category=other_category,
+                       date=start + timedelta(days=i % 200)) for i in range(400)])
+        Income.objects.bulk_create(
+            [Income(user=cls.user, wallet=cls.user.wallet, amount=10, category=cls.salary,
+                    date=start + timedelta(days=i % 200)) for i in range(200)])
+        Reminder.objects.bulk_create(
+            [Reminder(user=cls.user, title=f'Reminder {i}', description='', start_date=start,
+                      recurrence_interval='daily', next_fire_at=None if i % 2 else now() + timedelta(days=i))
+             for i in range(200)])
+        cls.budget = Budget.objects.create(user=cls.user, category=cls.food, amount=100000,
+                                           start_date=date(2024, 1, 1), end_date=date(2024, 12, 31))
+
+    def setUp(self):
+        self.client = APIClient()
+        get_response_cache().clear()
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoFullScans(self, queries):
+        explained = 0
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            explained += 1
+            plan = self.plan(sql)
+            aliases = table_aliases(sql)
+            for detail in plan:
+                match = FULL_SCAN.match(detail)
+                table = match and aliases.get(match.group(1), match.group(1))
+                if table in HOT_TABLES:
+                    self.fail(f"Полный проход по {table}:\n{sql}\n" + '\n'.join(plan))
+        self.assertGreater(explained, 0)
+
+    def capture(self, action):
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        with CaptureQueriesContext(connection) as context:
+            action()
+        return context.captured_queries
+
+    def test_transaction_write_paths(self):
+        def write():
+            expense = Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=Decimal('5'),
+                                             category=self.food, date=date(2024, 3, 1))
+            expense.amount = Decimal('6')
+            expense.date = date(2024, 3, 2)
+            expense.save()
+            expense.delete()
+            Income.objects.create(user=self.user, wallet=self.user.wallet, amount=Decimal('5'),
+                                  category=self.salary, date=date(2024, 3, 1))
+        self.assertNoFullScans(self.capture(write))
+
+    def test_import_and_budget_paths(self):
+        def write():
+            rows = [{'amount': 1, 'category': self.food.id, 'date': '2024-02-01'}] * 5
+            self.client.post(reverse('expense_import'), json.dumps(rows), content_type='application/json')
+            Budget.objects.create(user=self.user, category=self.food, amount=100,
+                                  start_date=date(2024, 2, 1), end_date=date(2024, 2, 29))
+        self.assertNoFullScans(self.capture(write))
+
+    def test_list_endpoints(self):
+        def read():
+            for name in ('expense_list', 'income_list'):
+                page = self.client.get(reverse(name), {'page_size': 50}).data
+                self.client.get(page['next'])
+                self.client.get(reverse(name), {'start_date': '2024-02-01', 'end_date': '2024-02-10'})
+                self.client.get(reverse(name), {'category': self.food.id, 'page_size': 20})
+            self.client.get(reverse('budget_list'))
+            self.client.get(reverse('budget_status'))
+            self.client.get(reverse('dashboard'))
+            self.client.get(reverse('finances_list'))
+        self.assertNoFullScans(self.capture(read))
+
+    def test_analytics_and_export(self):
+        def read():
+            for granularity in ('day', 'week', 'month', 'year'):
+                self.client.get(reverse('expense-income-trends'), {
+                    'start_date': '2024-01-01', 'end_date': '2024-06-30', 'granularity': granularity})
+            self.client.get(reverse('analytics-trends'), {'start_date': '2024-01-01'})
+            b''.join(self.client.get(reverse('ledger-export')).streaming_content)
+        self.assertNoFullScans(self.capture(read))
+
+    def test_scans_are_detected_in_every_plan_format(self):
+        sql = ('SELECT "login_budget"."id" FROM "login_budget" WHERE "login_budget"."category_id" IN '
+               '(SELECT U0."category_id" FROM "login_expense" U0)')
+        aliases = table_aliases(sql)
+        for detail in ('SCAN login_expense', 'SCAN U0', 'SCAN TABLE login_expense',
+                       'SCAN TABLE login_expense AS U0', 'SCAN U0 USING INDEX expense_user_date_idx'):
+            with self.subTest(detail=detail):
+                match = FULL_SCAN.match(detail)
+                self.assertEqual(aliases.get(match.group(1), match.group(1)), 'login_expense')
+
+    def test_reminder_dispatch(self):
+        Reminder.objects.create(user=self.user, title='Due', description='', start_date=date.today(),
+                                recurrence_interval='daily')
+        self.assertNoFullScans(self.capture(lambda: dispatch_due(batch_size=10)))
@@ -0,0 +1,112 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from ..models import CustomUser, EmailOutbox, Reminder
+from ..recurrence import add_months, first_fire_at, next_fire_at
+from ..reminders import claim_due, dispatch_due, fire_reminders
+
+
+def at(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class RecurrenceTestCase(SimpleTestCase):
+    def test_month_end_is_clamped_without_drift(self):
+        fires = [add_months(date(2023, 1, 31), months) for months in range(4)]
+        self.assertEqual(fires, [date(2023, 1, 31), date(2023, 2, 28), date(2023, 3, 31), date(2023, 4, 30)])
+        self.assertEqual(add_months(date(2024, 1, 31), 1), date(2024, 2, 29))
+        self.assertEqual(next_fire_at(date(2023, 1, 31), 'monthly', at(2023, 2, 28)), at(2023, 3, 31))
+
+    def test_leap_day_yearly(self):
+        self.assertEqual(next_fire_at(date(2024, 2, 29), 'yearly', at(2024, 3, 1)), at(2025, 2, 28))
+        self.assertEqual(next_fire_at(date(2024, 2, 29), 'yearly', at(2027, 3, 1)), at(2028, 2, 29))
+
+    def test_daily_weekly_and_one_off(self):
+        self.assertEqual(next_fire_at(date(2024, 1, 1), 'daily', at(2024, 1, 10, 12)), at(2024, 1, 11))
+        self.assertEqual(next_fire_at(date(2024, 1, 1), 'weekly', at(2024, 1, 8)), at(2024, 1, 15))
+        self.assertEqual(next_fire_at(date(2024, 1, 1), 'weekly', at(2024, 1, 8), inclusive=True), at(2024, 1, 8))
+        self.assertIsNone(next_fire_at(date(2024, 1, 1), None, at(2024, 1, 1)))
+        # Будущая дата начала - первое срабатывание в сам день начала
+        self.assertEqual(next_fire_at(date(2030, 5, 5), 'monthly', at(2024, 1, 1)), at(2030, 5, 5))
+
+    def test_first_fire_skips_the_past_but_not_today(self):
+        current = at(2024, 6, 10, 15)
+        self.assertEqual(first_fire_at(date(2024, 1, 1), 'daily', current=current), at(2024, 6, 10))
+        self.assertIsNone(first_fire_at(date(2024, 1, 1), None, current=current))
+        self.assertEqual(first_fire_at(date(2024, 1, 1), 'daily', last_fired_at=at(2024, 6, 10), current=current),
+                         at(2024, 6, 11))
+
+
+class ReminderDispatchTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='reminders', email='reminders@example.com',
+                                                   password='password')
+        self.today = now().date()
+
+    def reminder(self, start, recurrence=None, title='Pay rent'):
+        return Reminder.objects.create(user=self.user, title=title, description='Rent is due',
+                                       start_date=start, recurrence_interval=recurrence)
+
+    def test_next_fire_at_follows_schedule_changes(self):
+        reminder = self.reminder(self.today + timedelta(days=3), 'weekly')
+        self.assertEqual(reminder.next_fire_at.date(), self.today + timedelta(days=3))
+        reminder.start_date = self.today + timedelta(days=10)
+        reminder.save()
+        self.assertEqual(reminder.next_fire_at.date(), self.today + timedelta(days=10))
+        self.assertIsNone(self.reminder(self.today - timedelta(days=1)).next_fire_at)
+
+    def test_dispatch_fires_due_reminders_once(self):
+        daily = self.reminder(self.today - timedelta(days=30), 'daily')
+        once = self.reminder(self.today, title='Call bank')
+        future = self.reminder(self.today + timedelta(days=5), 'monthly')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(dispatch_due(), 2)
+        self.assertEqual(dispatch_due(), 0)
+
+        for reminder in (daily, once, future):
+            reminder.refresh_from_db()
+        self.assertEqual(daily.next_fire_at.date(), self.today + timedelta(days=1))
+        self.assertEqual(daily.last_fired_at.date(), self.today)
+        self.assertIsNone(once.next_fire_at)
+        self.assertIsNone(future.last_fired_at)
+        self.assertEqual(sorted(EmailOutbox.objects.values_list('subject', flat=True)),
+                         ['Напоминание: Call bank', 'Напоминание: Pay rent'])
+
+        # Правка напоминания не должна повторно сработать сегодняшний повтор
+        daily.title = 'Pay rent today'
+        daily.save()
+        self.assertEqual(daily.next_fire_at.date(), self.today + timedelta(days=1))
+
+    def test_parallel_dispatchers_do_not_share_rows(self):
+        for number in range(5):
+            self.reminder(self.today, 'daily', title=f'Reminder {number}')
+        first_token, first = claim_due(3, 'default')
+        second_token, second = claim_due(3, 'default')
+        self.assertEqual((len(first), len(second)), (3, 2))
+        self.assertFalse({reminder.pk for reminder in first} & {reminder.pk for reminder in second})
+        self.assertEqual(claim_due(3, 'default'), (None, []))
+        fired = fire_reminders(first_token, first, 'default') + fire_reminders(second_token, second, 'default')
+        self.assertEqual(fired, 5)
+
+    def test_expired_lease_does_not_double_fire(self):
+        self.reminder(self.today, 'daily')
+        token, stale = claim_due(10, 'default')
+        # Аренда истекла, напоминание забрал второй диспетчер и уже сработал его
+        Reminder.objects.update(claimed_until=now() - timedelta(seconds=1))
+        other_token, fresh = claim_due(10, 'default', current=now())
+        self.assertEqual(fire_reminders(other_token, fresh, 'default'), 1)
+        self.assertEqual(fire_reminders(token, stale, 'default'), 0)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+    def test_api_hides_claim_fields(self):
+        reminder = self.reminder(self.today + timedelta(days=1), 'monthly')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = client.get(reverse('reminder-detail', args=[reminder.pk])).data
+        self.assertIn('next_fire_at', data)
+        self.assertNotIn('claimed_by', data)
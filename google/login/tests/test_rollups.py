@@ -0,0 +1,96 @@
+import json
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..cache import get_response_cache
+from ..models import Category, CustomUser, Expense, Income, TransactionRollup
+
+
+class TransactionRollupTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='rollup', email='rollup@example.com', password='password')
+        self.food = Category.objects.create(name='Rollup food', user=self.user)
+        self.salary = Category.objects.create(name='Rollup salary', user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_response_cache().clear()
+
+    def add(self, model, amount, day, category):
+        return model.objects.create(user=self.user, wallet=self.user.wallet, amount=amount, category=category, date=day)
+
+    def analytics(self, **params):
+        return self.client.get(reverse('expense-income-trends'), params).json()
+
+    def snapshot(self):
+        return sorted(TransactionRollup.objects.filter(count__gt=0).values_list(
+            'kind', 'granularity', 'period_start', 'category_id', 'total', 'count'))
+
+    def test_daily_and_coarse_buckets(self):
+        self.add(Expense, 10, date(2024, 5, 6), self.food)
+        self.add(Expense, 5, date(2024, 5, 6), self.food)
+        moved = self.add(Expense, 7, date(2024, 5, 8), self.food)
+        self.add(Income, 100, date(2024, 6, 1), self.salary)
+        moved.date = date(2024, 6, 3)
+        moved.save()
+
+        data = self.analytics(start_date='2024-05-01', end_date='2024-06-30')
+        self.assertEqual(data['expenses'], [
+            {'date': '2024-05-06', 'category__name': 'Rollup food', 'total': 15.0},
+            {'date': '2024-06-03', 'category__name': 'Rollup food', 'total': 7.0},
+        ])
+        self.assertEqual(data['incomes'], [{'date': '2024-06-01', 'category__name': 'Rollup salary', 'total': 100.0}])
+
+        monthly = self.analytics(start_date='2024-05-15', end_date='2024-06-30', granularity='month')
+        self.assertEqual([(row['date'], row['total']) for row in monthly['expenses']],
+                         [('2024-05-01', 15.0), ('2024-06-01', 7.0)])
+        weekly = self.analytics(start_date='2024-06-01', end_date='2024-06-30', granularity='week')
+        self.assertEqual([(row['date'], row['total']) for row in weekly['expenses']], [('2024-06-03', 7.0)])
+        self.assertEqual([row['date'] for row in weekly['incomes']], ['2024-05-27'])
+
+        self.assertEqual(self.client.get(reverse('expense-income-trends'), {'granularity': 'decade'}).status_code, 400)
+
+    def test_monthly_trends(self):
+        for month, amount in ((1, 100), (2, 110), (3, 90), (5, 1000)):
+            self.add(Expense, amount, date(2024, month, 10), self.food)
+        self.add(Income, 500, date(2024, 1, 20), self.salary)
+        rent = Category.objects.create(name='Rollup rent', user=self.user)
+        self.add(Expense, 700, date(2024, 5, 1), rent)
+
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('analytics-trends'), {'start_date': '2024-01-15', 'window': 3}).json()
+        months = {row['month']: row for row in data['months']}
+        self.assertEqual(list(months), ['2024-01-01', '2024-02-01', '2024-03-01', '2024-04-01', '2024-05-01'])
+        self.assertEqual((months['2024-01-01']['net'], months['2024-01-01']['net_change']), (400.0, None))
+        self.assertEqual(months['2024-02-01']['net_change'], -510.0)
+        self.assertEqual(months['2024-04-01']['expense'], 0.0)
+        self.assertEqual(months['2024-03-01']['net_rolling'], round((400 - 110 - 90) / 3, 2))
+        self.assertEqual([row['month'] for row in data['months'] if row['expense_anomaly']], ['2024-05-01'])
+        self.assertEqual([(row['category'], row['share']) for row in data['categories']],
+                         [('Rollup food', 0.65), ('Rollup rent', 0.35)])
+
+        self.assertEqual(self.client.get(reverse('analytics-trends'), {'window': 0}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('analytics-trends'), {'start_date': '2030-01-01'}).json()['months'], [])
+
+    def test_rebuild_matches_incremental_state(self):
+        self.add(Expense, 10, date(2024, 5, 6), self.food)
+        income = self.add(Income, 100, date(2023, 12, 31), self.salary)
+        self.add(Income, 50, date(2024, 1, 1), self.salary)
+        income.amount = Decimal('80')
+        income.save()
+        self.client.post(reverse('expense_import'), json.dumps([{'amount': 3, 'category': 'Rollup food',
+                                                                 'date': '2024-05-07'}]),
+                         content_type='application/json')
+        incremental = self.snapshot()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_category_delete_cascades(self):
+        self.add(Expense, 10, date(2024, 5, 6), self.food)
+        self.food.delete()
+        self.assertFalse(TransactionRollup.objects.filter(category_id=self.food.pk).exists())
@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connections, router as db_router, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from ..models import Category, CustomUser, Expense
+from ..routers import ReadReplicaRouter, read_from_replica
+
+
+# Чтения считаются на соединении реплики этого потока, поэтому аналитика читает по очереди в нём же
+@override_settings(READ_REPLICA_ENABLED=True, REPLICA_STICKY_SECONDS=10, RESPONSE_CACHE_ENABLED=False,
+                   ASYNC_CONCURRENT_READS=False)
+class ReadReplicaRoutingTestCase(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='replica', email='replica@example.com', password='password')
+        self.food = Category.objects.create(name='Replica food', user=self.user)
+        Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=10, category=self.food,
+                               date=date(2024, 5, 6))
+        self.client = APIClient()
+
+    def settle(self):
+        """Пользователь, чья последняя запись старше окна REPLICA_STICKY_SECONDS"""
+        CustomUser.objects.filter(pk=self.user.pk).update(data_changed_at=now() - timedelta(minutes=1))
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.client.force_authenticate(user)
+        return user
+
+    def replica_queries(self, url, params=None):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = self.client.get(url, params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_router_reads_from_replica_only_inside_the_context(self):
+        router, user = ReadReplicaRouter(), self.settle()
+        self.assertIsNone(router.db_for_read(Expense))
+        with read_from_replica(user):
+            self.assertEqual(router.db_for_read(Expense), 'replica')
+            self.assertEqual(db_router.db_for_write(Expense), 'default')
+            with transaction.atomic():
+                self.assertIsNone(router.db_for_read(Expense))
+        with self.settings(READ_REPLICA_ENABLED=False), read_from_replica(user):
+            self.assertIsNone(router.db_for_read(Expense))
+        self.assertFalse(router.allow_migrate('replica', 'login'))
+
+    def test_read_only_endpoints_use_replica(self):
+        self.settle()
+        for url, params in ((reverse('expense_list'), None), (reverse('expense_list'), {'fast': 1}),
+                            (reverse('expense-income-trends'), None), (reverse('analytics-trends'), None),
+                            (reverse('ledger-export'), None)):
+            with self.subTest(url=url, params=params):
+                self.assertTrue(self.replica_queries(url, params))
+        # Записи и чтения вне списков - только default
+        self.assertFalse(self.replica_queries(reverse('budget_list')))
+
+    def test_writer_reads_own_writes_from_default(self):
+        self.settle()
+        response = self.client.post(reverse('expense_list'), {'amount': '5.00', 'category': self.food.pk,
+                                                               'date': '2024-05-07'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        self.assertFalse(self.replica_queries(reverse('expense_list')))
+        with self.settings(REPLICA_STICKY_SECONDS=0):
+            self.assertTrue(self.replica_queries(reverse('expense_list')))
+
+    def test_sync_replica_needs_a_separate_file(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_replica', stdout=StringIO())
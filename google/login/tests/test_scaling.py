@@ -0,0 +1,221 @@
+"""Количество SQL-запросов каждого маршрута login/urls.py не должно зависеть от объёма истории.
+
+Уровни данных задаются LOGIN_SCALE_TIERS (по умолчанию 10 и 1000 операций). Уровень в 100 000
+операций слишком медленный для каждого прогона и проверяется отдельным тестом, который
+включает LOGIN_SCALE_LARGE=1; в CI перед релизом его запускают так:
+
+    LOGIN_SCALE_LARGE=1 python manage.py test login.tests.test_scaling
+
+Если задан LOGIN_PERF_BASELINE, задержки эндпоинтов
+пишутся в этот JSON-файл (при первом запуске или с LOGIN_PERF_UPDATE=1), а последующие
+запуски сравниваются с ним: замедление больше чем в LOGIN_PERF_TOLERANCE раз - ошибка.
+"""
+import json
+import os
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..cache import get_response_cache
+from ..models import Budget, Category, CustomUser, Expense, Finance, Income, Reminder, TransactionRollup
+from ..rollups import rebuild_rollups
+
+SCALE_TIERS = [int(size) for size in os.environ.get('LOGIN_SCALE_TIERS', '10,1000').split(',')]
+SCALE_LARGE = os.environ.get('LOGIN_SCALE_LARGE') == '1'
+LARGE_TIER = int(os.environ.get('LOGIN_SCALE_LARGE_TIER', 100000))
+PERF_BASELINE = os.environ.get('LOGIN_PERF_BASELINE')
+PERF_UPDATE = os.environ.get('LOGIN_PERF_UPDATE') == '1'
+PERF_TOLERANCE = float(os.environ.get('LOGIN_PERF_TOLERANCE', 3))
+# Абсолютный запас, чтобы быстрые эндпоинты не падали от шума таймера
+PERF_SLACK_MS = float(os.environ.get('LOGIN_PERF_SLACK_MS', 20))
+TIMING_RUNS = 3
+
+
+def seed_user(size):
+    """Пользователь с size операциями за ~3 года, категориями, бюджетами, целями и напоминаниями"""
+    user = CustomUser.objects.create_user(username=f'scale{size}', email=f'scale{size}@example.com',
+                                          password='password')
+    wallet = user.wallet
+    categories = [Category.objects.create(name=f'Scale {size} #{i}', user=user) for i in range(5)]
+    start = date(2022, 1, 1)
+    batch_size = 5000
+    for offset in range(0, size, batch_size):
+        expenses, incomes = [], []
+        for i in range(offset, min(size, offset + batch_size)):
+            day = start + timedelta(days=i % 1095)
+            category = categories[i % len(categories)]
+            if i % 4:
+                expenses.append(Expense(user=user, wallet=wallet, amount=Decimal(i % 50 + 1), category=category,
+                                        date=day))
+            else:
+                incomes.append(Income(user=user, wallet=wallet, amount=Decimal(100), category=category, date=day))
+        Expense.objects.bulk_create(expenses)
+        Income.objects.bulk_create(incomes)
+    rebuild_rollups(TransactionRollup, {'expense': Expense, 'income': Income}, user_ids=[user.pk])
+
+    budget = Budget.objects.create(user=user, category=categories[0], amount=10 ** 7,
+                                   start_date=date(2022, 1, 1), end_date=date(2026, 12, 31))
+    goal = Finance.objects.create(user=user, name='Scale goal', target_amount=10 ** 7, end_date=date(2030, 1, 1))
+    reminder = Reminder.objects.create(user=user, title='Scale reminder', description='', recurrence_interval='monthly')
+    # Пустая категория для удаления: удаление категории с операциями каскадом проходит по всей истории
+    spare = Category.objects.create(name=f'Scale {size} spare', user=user)
+    return {
+        'size': size, 'user': user, 'category': categories[0], 'spare_category': spare, 'budget': budget,
+        'goal': goal, 'reminder': reminder,
+        'expense': Expense.objects.filter(user=user).first(), 'income': Income.objects.filter(user=user).first(),
+    }
+
+
+def build_requests(data):
+    """(название, метод, url, тело/параметры) для каждого маршрута login/urls.py.
+
+    Не проверяются создание кошелька (он один на пользователя и создаётся при регистрации)
+    и его удаление: оно каскадом удаляет всю историю операций.
+    """
+    size, category, expense, income = data['size'], data['category'], data['expense'], data['income']
+    budget, goal, reminder = data['budget'], data['goal'], data['reminder']
+    row = {'amount': '1.00', 'category': category.pk, 'date': '2024-05-01'}
+    budget_row = {'category': category.pk, 'amount': '100.00', 'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+    goal_row = {'name': 'Scale goal', 'target_amount': '500.00', 'start_date': '2024-01-01', 'end_date': '2030-01-01'}
+    reminder_row = {'title': 'Scale reminder', 'description': 'Проверка', 'start_date': '2024-01-01',
+                    'recurrence_interval': 'weekly'}
+    reads = [
+        ('category_list', 'get', reverse('category_list'), None),
+        ('category_detail', 'get', reverse('category_detail', args=[category.pk]), None),
+        ('wallet_list', 'get', reverse('wallet_list'), None),
+        ('wallet_detail', 'get', reverse('wallet_detail', args=[data['user'].wallet.pk]), None),
+        ('expense_list', 'get', reverse('expense_list'), None),
+        ('expense_list_filtered', 'get', reverse('expense_list'),
+         {'category': category.pk, 'start_date': '2022-06-01', 'end_date': '2023-06-01'}),
+        ('expense_detail', 'get', reverse('expense_detail', args=[expense.pk]), None),
+        ('income_list', 'get', reverse('income_list'), None),
+        ('income_detail', 'get', reverse('income_detail', args=[income.pk]), None),
+        ('budget_list', 'get', reverse('budget_list'), None),
+        ('budget_status', 'get', reverse('budget_status'), None),
+        ('budget_detail', 'get', reverse('budget_detail', args=[data['budget'].pk]), None),
+        ('finances_list', 'get', reverse('finances_list'), None),
+        ('finances_detail', 'get', reverse('finances_detail', args=[data['goal'].pk]), None),
+        ('analytics_day', 'get', reverse('expense-income-trends'), {'start_date': '2022-01-01', 'end_date': '2024-12-31'}),
+        ('analytics_month', 'get', reverse('expense-income-trends'),
+         {'start_date': '2022-01-01', 'end_date': '2024-12-31', 'granularity': 'month'}),
+        ('analytics_trends', 'get', reverse('analytics-trends'), {'start_date': '2022-01-01', 'window': 6}),
+        ('dashboard', 'get', reverse('dashboard'), None),
+        ('ledger_export', 'get', reverse('ledger-export'), {'format': 'ndjson'}),
+        ('reminder_list', 'get', reverse('reminder-list'), None),
+        ('reminder_detail', 'get', reverse('reminder-detail', args=[data['reminder'].pk]), None),
+        ('metrics', 'get', reverse('metrics'), None),
+        ('auth_user_me', 'get', reverse('customuser-me'), None),
+        ('auth_user_detail', 'get', reverse('customuser-detail', args=[data['user'].pk]), None),
+    ]
+    writes = [
+        ('category_create', 'post', reverse('category_list'), {'name': f'Scale {size} new'}),
+        ('category_update', 'put', reverse('category_detail', args=[category.pk]), {'name': f'Scale {size} renamed'}),
+        ('wallet_update', 'put', reverse('wallet_detail', args=[data['user'].wallet.pk]), {'balance': '1000.00'}),
+        ('expense_create', 'post', reverse('expense_list'), row),
+        ('income_create', 'post', reverse('income_list'), row),
+        ('expense_update', 'put', reverse('expense_detail', args=[expense.pk]), row),
+        ('income_update', 'put', reverse('income_detail', args=[income.pk]), row),
+        ('expense_import', 'post', reverse('expense_import'), [row] * 3),
+        ('income_import', 'post', reverse('income_import'), [row] * 3),
+        ('budget_create', 'post', reverse('budget_list'), budget_row),
+        ('budget_update', 'put', reverse('budget_detail', args=[budget.pk]), budget_row),
+        ('finances_create', 'post', reverse('finances_list'), goal_row),
+        ('finances_update', 'put', reverse('finances_detail', args=[goal.pk]), goal_row),
+        ('reminder_create', 'post', reverse('reminder-list'), reminder_row),
+        ('reminder_update', 'put', reverse('reminder-detail', args=[reminder.pk]), reminder_row),
+        ('expense_delete', 'delete', reverse('expense_detail', args=[expense.pk]), None),
+        ('income_delete', 'delete', reverse('income_detail', args=[income.pk]), None),
+        ('budget_delete', 'delete', reverse('budget_detail', args=[budget.pk]), None),
+        ('finances_delete', 'delete', reverse('finances_detail', args=[goal.pk]), None),
+        ('reminder_delete', 'delete', reverse('reminder-detail', args=[reminder.pk]), None),
+        ('category_delete', 'delete', reverse('category_detail', args=[data['spare_category'].pk]), None),
+        ('auth_register', 'post', reverse('customuser-list'),
+         {'email': f'scale{size}-new@example.com', 'username': f'scale{size}new', 'password': 'Scale-password-1'}),
+        ('auth_token_login', 'post', reverse('login'), {'email': data['user'].email, 'password': 'password'}),
+        ('auth_set_password', 'post', reverse('customuser-set-password'),
+         {'current_password': 'password', 'new_password': 'Scale-password-2'}),
+        ('auth_token_logout', 'post', reverse('logout'), None),
+    ]
+    return reads, writes
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+class EndpointScalingTestCase(TestCase):
+    def request(self, client, user, method, url, payload):
+        get_response_cache().clear()
+        client.force_authenticate(CustomUser.objects.get(pk=user.pk))
+        if method == 'get':
+            response = client.get(url, payload)
+        else:
+            response = getattr(client, method)(url, json.dumps(payload), content_type='application/json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f"{method.upper()} {url}: {getattr(response, 'data', '')}")
+        return response
+
+    def measure(self, size):
+        data = seed_user(size)
+        client = APIClient()
+        reads, writes = build_requests(data)
+        counts, latencies = {}, {}
+        for name, method, url, payload in reads:
+            with CaptureQueriesContext(connection) as queries:
+                self.request(client, data['user'], method, url, payload)
+            counts[name] = len(queries)
+            timings = []
+            for _ in range(TIMING_RUNS):
+                started = time.perf_counter()
+                self.request(client, data['user'], method, url, payload)
+                timings.append((time.perf_counter() - started) * 1000)
+            latencies[name] = round(statistics.median(timings), 3)
+        for name, method, url, payload in writes:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                self.request(client, data['user'], method, url, payload)
+                latencies[name] = round((time.perf_counter() - started) * 1000, 3)
+            counts[name] = len(queries)
+        return counts, latencies
+
+    def test_query_counts_do_not_grow_with_history(self):
+        results = {size: self.measure(size) for size in SCALE_TIERS}
+        self.assert_counts_match(results)
+        if PERF_BASELINE:
+            self.compare_with_baseline({str(size): latencies for size, (_counts, latencies) in results.items()})
+
+    @skipUnless(SCALE_LARGE, "уровень в 100 000 операций включает LOGIN_SCALE_LARGE=1")
+    def test_query_counts_at_large_tier(self):
+        self.assert_counts_match({size: self.measure(size) for size in (min(SCALE_TIERS), LARGE_TIER)})
+
+    def assert_counts_match(self, results):
+        smallest = min(results)
+        baseline_counts = results[smallest][0]
+        for size in results:
+            for name, count in results[size][0].items():
+                with self.subTest(endpoint=name, transactions=size):
+                    self.assertEqual(count, baseline_counts[name],
+                                     f"{name}: {count} запросов при {size} операциях против "
+                                     f"{baseline_counts[name]} при {smallest}")
+
+    def compare_with_baseline(self, latencies):
+        path = Path(PERF_BASELINE)
+        if PERF_UPDATE or not path.exists():
+            path.write_text(json.dumps(latencies, indent=2, sort_keys=True))
+            return
+        baseline = json.loads(path.read_text())
+        for size, endpoints in latencies.items():
+            for name, elapsed in endpoints.items():
+                expected = baseline.get(size, {}).get(name)
+                if expected is None:
+                    continue
+                with self.subTest(endpoint=name, transactions=size):
+                    self.assertLessEqual(elapsed, expected * PERF_TOLERANCE + PERF_SLACK_MS,
+                                         f"{name} при {size} операциях: {elapsed} мс, в базовой линии {expected} мс")
@@ -0,0 +1,119 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import Budget, Category, CustomUser, Expense, TransactionRollup, Wallet
+from ..sharding import move_user, user_shard
+
+
+@override_settings(USER_SHARDS=['default', 'shard1'], RESPONSE_CACHE_ENABLED=False)
+class ShardingTestCase(TransactionTestCase):
+    databases = {'default', 'shard1'}
+
+    def setUp(self):
+        # Шард выбирается по хэшу id: создаём пользователей, пока один не попадёт на shard1
+        for number in range(20):
+            user = CustomUser.objects.create_user(username=f'shard{number}', email=f'shard{number}@example.com',
+                                                  password='password')
+            if user.shard == 'shard1':
+                break
+        self.user = CustomUser.objects.get(pk=user.pk)
+        self.assertEqual(self.user.shard, 'shard1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_expense(self, amount, category, day='2024-05-06'):
+        response = self.client.post(reverse('expense_list'), {'amount': amount, 'category': category.pk,
+                                                               'date': day}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response
+
+    def test_user_rows_live_on_their_shard(self):
+        with user_shard(self.user):
+            food = Category.objects.create(name='Shard food', user=self.user)
+            budget = Budget.objects.create(user=self.user, category=food, amount=100,
+                                           start_date=date(2024, 5, 1), end_date=date(2024, 5, 31))
+        self.post_expense('30.00', food)
+
+        self.assertFalse(Wallet.objects.using('default').filter(user=self.user).exists())
+        self.assertFalse(Expense.objects.using('default').exists())
+        self.assertEqual(Wallet.objects.using('shard1').get(user=self.user).balance, Decimal('-30'))
+        # Сигналы и счётчики бюджета отработали на шарде
+        self.assertEqual(Budget.objects.using('shard1').get(pk=budget.pk).spent, Decimal('30'))
+        self.assertTrue(TransactionRollup.objects.using('shard1').filter(user=self.user).exists())
+        # Версия данных растёт в каталоге (default) - по ней кэшируются ответы
+        self.assertGreater(CustomUser.objects.using('default').get(pk=self.user.pk).data_version,
+                           self.user.data_version)
+
+        response = self.client.get(reverse('expense_list'))
+        self.assertEqual([row['amount'] for row in response.data['results']], ['30.00'])
+        response = self.client.get(reverse('expense-income-trends'), {'start_date': '2024-05-01',
+                                                                       'end_date': '2024-05-31'})
+        self.assertEqual(response.status_code, 200)
+        with user_shard(self.user), self.assertRaises(ValidationError):
+            Expense.objects.create(user=self.user, wallet=self.user.wallet, amount=80, category=food,
+                                   date=date(2024, 5, 7))
+
+    def test_rebalance_moves_rows_between_shards(self):
+        with user_shard(self.user):
+            food = Category.objects.create(name='Moved food', user=self.user)
+        self.post_expense('12.50', food)
+
+        out = StringIO()
+        call_command('rebalance_shards', user_ids=[self.user.pk], target='default', stdout=out)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(user.shard, 'default')
+        self.assertFalse(Expense.objects.using('shard1').exists())
+        self.assertFalse(CustomUser.objects.using('shard1').filter(pk=user.pk).exists())
+        expense = Expense.objects.using('default').get(user=user)
+        self.assertEqual((expense.amount, expense.category.name), (Decimal('12.50'), 'Moved food'))
+        self.assertEqual(expense.wallet.balance, Decimal('-12.50'))
+
+        # Без --to пользователь возвращается на шард по хэшу
+        call_command('rebalance_shards', user_ids=[user.pk], stdout=out)
+        self.assertEqual(CustomUser.objects.get(pk=user.pk).shard, 'shard1')
+        self.assertEqual(Expense.objects.using('shard1').get(user=user).amount, Decimal('12.50'))
+
+    def test_moved_user_keeps_working(self):
+        with user_shard(self.user):
+            Category.objects.create(name='Kept food', user=self.user)
+        moved = move_user(self.user, 'default')
+        self.assertEqual((moved['Wallet'], moved['Category']), (1, 1))
+        # Экземпляр из кэша аутентификации, загруженный до переноса, не возвращает пользователя на shard1
+        self.user.first_name = 'Stale'
+        self.user.shard = 'shard1'
+        self.user.save()
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).shard, 'default')
+
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.user.pk))
+        self.post_expense('3.00', Category.objects.using('default').get(user=self.user))
+        self.assertEqual(Wallet.objects.using('default').get(user=self.user).balance, Decimal('-3'))
+
+    def test_deleting_user_removes_shard_rows(self):
+        with user_shard(self.user):
+            food = Category.objects.create(name='Deleted food', user=self.user)
+        self.post_expense('1.00', food)
+        CustomUser.objects.get(pk=self.user.pk).delete()
+        self.assertFalse(CustomUser.objects.using('shard1').exists())
+        self.assertFalse(Expense.objects.using('shard1').exists())
+        self.assertFalse(Wallet.objects.using('shard1').exists())
+
+    def test_rebuild_commands_cover_every_shard(self):
+        with user_shard(self.user):
+            food = Category.objects.create(name='Shard rebuild', user=self.user)
+            budget = Budget.objects.create(user=self.user, category=food, amount=100,
+                                           start_date=date(2024, 5, 1), end_date=date(2024, 5, 31))
+        self.post_expense('30.00', food)
+        Budget.objects.using('shard1').filter(pk=budget.pk).update(spent=0)
+        TransactionRollup.objects.using('shard1').all().delete()
+
+        call_command('rebuild_budget_spent', stdout=StringIO())
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(Budget.objects.using('shard1').get(pk=budget.pk).spent, Decimal('30'))
+        self.assertTrue(TransactionRollup.objects.using('shard1').filter(user=self.user).exists())
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase
+
+from ..sqlite.base import DatabaseWrapper
+
+
+class SQLiteProductionProfileTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix='sqlite-profile-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'profile.sqlite3')
+
+    def open(self, **options):
+        wrapper = DatabaseWrapper(dict(connection.settings_dict, NAME=self.path, OPTIONS=options), 'profile')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_init_command_applies_production_pragmas(self):
+        wrapper = self.open(**settings.SQLITE_PRODUCTION['OPTIONS'])
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'temp_store'), 2)
+        self.assertTrue(wrapper.is_usable())
+        wrapper.connection.close()
+        self.assertFalse(wrapper.is_usable())
+
+    def test_immediate_transactions_take_the_write_lock_at_begin(self):
+        # С обычным BEGIN второй писатель узнал бы о блокировке только при первой записи
+        for mode, blocked in ((None, False), ('IMMEDIATE', True)):
+            with self.subTest(mode=mode):
+                first = self.open(init_command='PRAGMA busy_timeout = 50', transaction_mode=mode)
+                second = self.open(init_command='PRAGMA busy_timeout = 50', transaction_mode=mode)
+                first.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                try:
+                    if blocked:
+                        with self.assertRaises(OperationalError):
+                            second.cursor().execute('BEGIN IMMEDIATE')
+                    else:
+                        second.cursor().execute('BEGIN IMMEDIATE')
+                        second.cursor().execute('ROLLBACK')
+                finally:
+                    first.rollback()
+                    first.set_autocommit(True)
@@ -0,0 +1,78 @@
+"""Помесячная аналитика денежного потока на numpy/pandas.
+
+Все суммы пользователя за период приходят одним запросом к помесячным
+TransactionRollup (kind, месяц, категория, сумма) и дальше считаются целиком
+на массивах, без циклов по строкам: чистый поток, скользящие средние, доли
+категорий, изменение к прошлому месяцу и флаги аномальных расходов.
+"""
+import numpy as np
+import pandas as pd
+
+from .models import TransactionRollup
+
+DEFAULT_WINDOW = 3
+DEFAULT_THRESHOLD = 2.0
+
+
+def load_monthly_totals(user, start_date=None, end_date=None):
+    """(kind, period_start, category__name, total) помесячных свёрток за период - один запрос"""
+    return list(TransactionRollup.totals(user, TransactionRollup.MONTH, start_date, end_date))
+
+
+def to_frame(rows):
+    if not rows:
+        return pd.DataFrame({'kind': pd.Series(dtype=object), 'month': pd.Series(dtype='datetime64[ns]'),
+                             'category': pd.Series(dtype=object), 'total': pd.Series(dtype=float)})
+    kinds, months, categories, totals = zip(*rows)
+    return pd.DataFrame({
+        'kind': np.array(kinds, dtype=object),
+        'month': pd.to_datetime(np.array(months, dtype='datetime64[D]')),
+        'category': np.array(categories, dtype=object),
+        'total': np.array(totals, dtype=float),
+    })
+
+
+def compute_trends(frame, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD):
+    """Месячные ряды и доли категорий по кадру (kind, month, category, total)"""
+    if frame.empty:
+        return {'window': window, 'threshold': threshold, 'months': [], 'categories': []}
+
+    monthly = frame.pivot_table(index='month', columns='kind', values='total', aggfunc='sum', fill_value=0.0)
+    # Месяцы без операций остаются в ряду нулями, иначе скользящие окна съезжают
+    monthly = monthly.reindex(pd.date_range(monthly.index.min(), monthly.index.max(), freq='MS'), fill_value=0.0)
+    income = monthly.get('income', pd.Series(0.0, index=monthly.index))
+    expense = monthly.get('expense', pd.Series(0.0, index=monthly.index))
+    net = income - expense
+    previous_net = net.shift(1)
+
+    # Аномалия - расход выше среднего за window предыдущих месяцев больше чем на threshold отклонений
+    history = expense.shift(1).rolling(window, min_periods=window)
+    baseline, spread = history.mean(), history.std(ddof=0)
+    anomaly = (spread > 0) & (expense - baseline > threshold * spread)
+
+    months = pd.DataFrame({
+        'month': monthly.index.strftime('%Y-%m-%d'),
+        'income': income.round(2),
+        'expense': expense.round(2),
+        'net': net.round(2),
+        'net_rolling': net.rolling(window, min_periods=1).mean().round(2),
+        'expense_rolling': expense.rolling(window, min_periods=1).mean().round(2),
+        'net_change': (net - previous_net).round(2),
+        'net_change_pct': ((net - previous_net) / previous_net.abs().replace(0.0, np.nan) * 100).round(2),
+        'expense_anomaly': anomaly,
+    })
+
+    expenses = frame[frame['kind'] == 'expense']
+    categories = expenses.groupby('category', sort=False)['total'].sum().sort_values(ascending=False)
+    total_expense = categories.sum()
+    shares = pd.DataFrame({
+        'category': categories.index,
+        'total': categories.round(2).to_numpy(),
+        'share': (categories / total_expense).round(4).to_numpy() if total_expense else 0.0,
+    })
+    return {
+        'window': window,
+        'threshold': threshold,
+        'months': months.astype(object).where(months.notna(), None).to_dict('records'),
+        'categories': shares.to_dict('records'),
+    }
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from .views import *
+from .metrics import metrics_view
 
 urlpatterns = [
     path('auth/', include('djoser.urls')),
@@ -17,16 +18,19 @@ urlpatterns = [
 
     # Расходы
     path('expenses/', ExpenseViewSet.as_view({'get': 'list', 'post': 'create'}), name='expense_list'),
+    path('expenses/import/', ExpenseViewSet.as_view({'post': 'import_rows'}), name='expense_import'),
     path('expenses/<int:pk>/', ExpenseViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}),
          name='expense_detail'),
 
     # Доходы
     path('incomes/', IncomeViewSet.as_view({'get': 'list', 'post': 'create'}), name='income_list'),
+    path('incomes/import/', IncomeViewSet.as_view({'post': 'import_rows'}), name='income_import'),
     path('incomes/<int:pk>/', IncomeViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}),
          name='income_detail'),
 
     # Бюджет
     path('budget/', BudgetViewSet.as_view({'get': 'list', 'post': 'create'}), name='budget_list'),
+    path('budget/status/', BudgetViewSet.as_view({'get': 'status_list'}), name='budget_status'),
     path('budget/<int:pk>/', BudgetViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}),
          name='budget_detail'),
 
@@ -37,6 +41,13 @@ urlpatterns = [
 
     # path('analytics/', VisualAnalyticsView.as_view()),
     path('analytics/', ExpenseIncomeAnalyticsView.as_view(), name='expense-income-trends'),
+    path('analytics/trends/', TrendAnalyticsView.as_view(), name='analytics-trends'),
+
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+
+    path('export/', LedgerExportView.as_view(), name='ledger-export'),
+
+    path('metrics', metrics_view, name='metrics'),
 
     path('reminders/', ReminderViewSet.as_view({'get': 'list', 'post': 'create'}), name='reminder-list'),
     path('reminders/<int:pk>/', ReminderViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='reminder-detail'),
@@ -7,43 +7,149 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.db.models import Sum
 from rest_framework.response import Response
-
-
-class ExpenseIncomeAnalyticsView(APIView):
+from .importers import TransactionImporter, iter_uploaded_rows
+from .asyncviews import AsyncAPIView, gather_reads
+from .cache import CachedListMixin, acached_response, cached_response
+from .conditional import ConditionalGetMixin
+from .pagination import KeysetPagination
+from .routers import read_from_replica, replica_for
+from .sharding import shard_for
+from .export import CSVRenderer, NDJSONRenderer, STREAMERS, aiter_chunks, iter_ledger
+from .dashboard import assemble_dashboard, dashboard_loaders
+from .fastread import FastListMixin
+from .trends import DEFAULT_THRESHOLD, DEFAULT_WINDOW, compute_trends, load_monthly_totals, to_frame
+from django.conf import settings
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.timezone import localdate
+
+
+def parse_query_param(request, name, field, default=None):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        return field.run_validation(value)
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({name: exc.detail})
+
+
+def parse_date_param(request, name):
+    return parse_query_param(request, name, serializers.DateField())
+
+
+def parse_analytics_params(request):
+    """(granularity, start_date, end_date) для /analytics/"""
+    start_date = parse_date_param(request, 'start_date')
+    end_date = parse_date_param(request, 'end_date')
+    granularity = request.query_params.get('granularity', TransactionRollup.DAY)
+    if granularity not in dict(TransactionRollup.GRANULARITIES):
+        raise serializers.ValidationError({'granularity': f"Неизвестная гранулярность: {granularity}."})
+    return granularity, start_date, end_date
+
+
+class ExpenseIncomeAnalyticsView(ConditionalGetMixin, AsyncAPIView):
+    """Суммы по категориям за периоды; расходы и доходы читаются одновременно"""
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter('start_date', openapi.IN_QUERY, description="Start date for the filter", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
             openapi.Parameter('end_date', openapi.IN_QUERY, description="End date for the filter", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('granularity', openapi.IN_QUERY, description="Bucket size: day (default), week, month or year. "
+                              "Buckets overlapping start_date or end_date are returned in full", type=openapi.TYPE_STRING,
+                              enum=[value for value, _label in TransactionRollup.GRANULARITIES]),
         ]
     )
-    def get(self, request, format=None):
-        user = request.user
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-
-        expenses = Expense.objects.filter(
-            user=user,
-            date__gte=start_date,
-            date__lte=end_date
-        ).values('date', 'category__name').annotate(total=Sum('amount')).order_by('date')
-
-        incomes = Income.objects.filter(
-            user=user,
-            date__gte=start_date,
-            date__lte=end_date
-        ).values('date', 'category__name').annotate(total=Sum('amount')).order_by('date')
-
-        data = {
-            'expenses': list(expenses),
-            'incomes': list(incomes)
-        }
+    async def get(self, request, format=None):
+        return await acached_response(request, self.build_response)
+
+    async def build_response(self):
+        user = self.request.user
+        params = parse_analytics_params(self.request)
+        with read_from_replica(user):
+            loaded = await gather_reads({
+                kind: lambda kind=kind: list(TransactionRollup.totals(user, *params, kind=kind))
+                for kind, _label in TransactionRollup.KINDS
+            })
+        data = {}
+        for kind, rows in loaded.items():
+            data[f'{kind}s'] = [{'date': period_start, 'category__name': category_name, 'total': total}
+                                for _kind, period_start, category_name, total in rows]
 
         return Response(data)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class TrendAnalyticsView(ConditionalGetMixin, APIView):
+    """Помесячный денежный поток: скользящие средние, доли категорий, изменения и аномалии"""
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Start date for the filter. Totals are monthly: "
+                              "the month containing start_date is included in full", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="End date for the filter. The month containing "
+                              "end_date is included in full", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('window', openapi.IN_QUERY, description="Rolling window in months (1-24)", type=openapi.TYPE_INTEGER, default=DEFAULT_WINDOW),
+            openapi.Parameter('threshold', openapi.IN_QUERY, description="Expense anomaly threshold in standard deviations", type=openapi.TYPE_NUMBER, default=DEFAULT_THRESHOLD),
+        ]
+    )
+    def get(self, request, format=None):
+        return cached_response(request, self.build_response)
+
+    def build_response(self):
+        start_date = parse_date_param(self.request, 'start_date')
+        end_date = parse_date_param(self.request, 'end_date')
+        window = parse_query_param(self.request, 'window', serializers.IntegerField(min_value=1, max_value=24),
+                                   DEFAULT_WINDOW)
+        threshold = parse_query_param(self.request, 'threshold', serializers.FloatField(min_value=0),
+                                      DEFAULT_THRESHOLD)
+        with read_from_replica(self.request.user):
+            rows = load_monthly_totals(self.request.user, start_date, end_date)
+        return Response(compute_trends(to_frame(rows), window, threshold))
+
+
+class DashboardView(ConditionalGetMixin, AsyncAPIView):
+    """Главный экран: баланс, активные бюджеты, цели, последние операции и итоги текущего месяца"""
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('recent', openapi.IN_QUERY, description="Number of recent transactions (1-50)", type=openapi.TYPE_INTEGER, default=10),
+        ]
+    )
+    async def get(self, request, format=None):
+        today = localdate()
+        return await acached_response(request, lambda: self.build_response(today), variant=str(today))
+
+    def depends_on_today(self, request):
+        return True
+
+    async def build_response(self, today):
+        recent = parse_query_param(self.request, 'recent', serializers.IntegerField(min_value=1, max_value=50), 10)
+        loaded = await gather_reads(dashboard_loaders(self.request.user, today, recent))
+        return Response(assemble_dashboard(today, recent, loaded))
+
+
+class LedgerExportView(APIView):
+    """Все расходы и доходы пользователя по дате: ?format=csv (по умолчанию) или ?format=ndjson"""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def get(self, request, format=None):
+        renderer = request.accepted_renderer
+        rows = iter_ledger(request.user, using=replica_for(request.user) or shard_for(request.user))
+        chunks = STREAMERS[renderer.format](rows)
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks,
+                                         content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = f'attachment; filename="ledger.{renderer.format}"'
+        return response
+
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -75,23 +181,52 @@ class WalletViewSet(viewsets.ModelViewSet):
 
 
 
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     queryset = Budget.objects.all()
     serializer_class = BudgetSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        return Budget.objects.filter(user=self.request.user)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
     def perform_update(self, serializer):
         serializer.save(user=self.request.user)
 
+    def get_serializer_class(self):
+        return BudgetStatusSerializer if self.action == 'status_list' else BudgetSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'status_list':
+            context['as_of'] = parse_date_param(self.request, 'as_of') or localdate()
+        return context
+
+    def depends_on_today(self, request):
+        return self.action == 'status_list'
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('as_of', openapi.IN_QUERY, description="Date to compute the status for (default today)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+        ]
+    )
+    def status_list(self, request, *args, **kwargs):
+        """Все бюджеты с потраченным, остатком, процентом, дневным темпом и прогнозом - одним запросом"""
+        budgets = self.get_queryset().order_by('start_date', 'pk')
+        return cached_response(request, lambda: Response(self.get_serializer(budgets, many=True).data),
+                               variant=str(localdate()))
+
 
-class ReminderViewSet(viewsets.ModelViewSet):
+class ReminderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Reminder.objects.all()
     serializer_class = ReminderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        return Reminder.objects.filter(user=self.request.user)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -99,7 +234,62 @@ class ReminderViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class TransactionImportMixin:
+    """Импорт выписки: CSV или JSON (массив / JSON Lines) файлом или в теле запроса"""
+
+    def import_rows(self, request, *args, **kwargs):
+        importer = TransactionImporter(self.queryset.model, request.user)
+        result = importer.run(iter_uploaded_rows(request))
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+
+class TransactionBatchCreateMixin:
+    """POST со списком операций создаёт их все в одной транзакции (или ни одной при ошибке)"""
+
+    def get_serializer(self, *args, **kwargs):
+        if isinstance(kwargs.get('data'), list):
+            kwargs['many'] = True
+            kwargs['max_length'] = getattr(settings, 'TRANSACTIONS_MAX_BATCH_SIZE', 500)
+        return super().get_serializer(*args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        with transaction.atomic(using=shard_for(request.user)):
+            return super().create(request, *args, **kwargs)
+
+
+def filter_transactions(queryset, request):
+    """Фильтры списка операций: start_date, end_date и category"""
+    start_date = parse_date_param(request, 'start_date')
+    end_date = parse_date_param(request, 'end_date')
+    category = request.query_params.get('category')
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    if category:
+        if not category.isdigit():
+            raise serializers.ValidationError({'category': "Ожидается идентификатор категории."})
+        queryset = queryset.filter(category_id=int(category))
+    return queryset
+
+
+class TransactionListMixin:
+    """Список операций постранично по курсору, с фильтрами start_date, end_date и category; читается с реплики"""
+    pagination_class = KeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        with read_from_replica(request.user):
+            return super().list(request, *args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+        return filter_transactions(queryset, self.request)
+
+
+class ExpenseViewSet(ConditionalGetMixin, CachedListMixin, TransactionListMixin, FastListMixin,
+                     TransactionImportMixin, TransactionBatchCreateMixin, viewsets.ModelViewSet):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -114,7 +304,8 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user, wallet=self.request.user.wallet)
 
 
-class IncomeViewSet(viewsets.ModelViewSet):
+class IncomeViewSet(ConditionalGetMixin, CachedListMixin, TransactionListMixin, FastListMixin,
+                    TransactionImportMixin, TransactionBatchCreateMixin, viewsets.ModelViewSet):
     queryset = Income.objects.all()
     serializer_class = IncomeSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -129,7 +320,7 @@ class IncomeViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user, wallet=self.request.user.wallet)
 
 
-class FinanceViewSet(viewsets.ModelViewSet):
+class FinanceViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Finance.objects.all()
     serializer_class = FinanceSerializer
     permission_classes = [permissions.IsAuthenticated]